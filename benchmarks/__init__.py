@@ -0,0 +1,5 @@
+"""效能基準測試：以本機替身（暫存目錄、暫存 SQLite、假 WebSocket）量測各熱點路徑
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --compare results.json   # 與先前的結果比較
+"""
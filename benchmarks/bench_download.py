@@ -0,0 +1,31 @@
+"""/api/batch 打包 ZIP 下載的時間與記憶體"""
+from typing import Any, Dict, List
+import io
+import zipfile
+
+from benchmarks.harness import completed_tasks, local_app, measure, result
+
+FILE_SIZE = 1024 * 1024
+FILE_COUNTS = (5, 20)
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    results = []
+    repeat = 3 if quick else 8
+    with local_app() as client:
+        for count in FILE_COUNTS:
+            task_ids = completed_tasks(client.bench_root, client.bench_session, count, FILE_SIZE, prefix=f"out_{count}")
+            sizes = []
+
+            def download():
+                response = client.get("/api/batch", params={"task_ids": task_ids})
+                assert response.status_code == 200, response.text
+                assert len(zipfile.ZipFile(io.BytesIO(response.content)).namelist()) == count, "ZIP is missing files"
+                sizes.append(len(response.content))
+
+            stats = measure(download, repeat)
+            memory = measure(download, 1, warmup=0, trace_memory=True)
+            results.append(result(
+                "batch_download_zip", {"files": count, "file_bytes": FILE_SIZE}, stats,
+                zip_bytes=sizes[-1], peak_bytes=memory["peak_bytes"]
+            ))
+    return results
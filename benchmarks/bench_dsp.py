@@ -0,0 +1,190 @@
+"""src/core/voice 與 src/core/analysis 各階段在合成語料上的吞吐量與峰值記憶體
+
+每個（階段, 語料）組合都在新的子行程中執行：語料先寫入暫存 .npy，子行程
+載入後的 RSS 作為基準，階段執行後的峰值 RSS 減去基準即為該階段的記憶體
+用量。吞吐量以「每 CPU 秒處理的音訊秒數」表示。
+
+階段函式依下列名稱從 src.core 取得，尚未實作時改用 benchmarks.reference_dsp：
+
+    src.core.voice.preprocessor.preprocess(audio, sample_rate)
+    src.core.voice.denoiser.denoise(audio, sample_rate)
+    src.core.voice.feature_extractor.extract_features(audio, sample_rate)
+    src.core.analysis.quality.assess_quality(reference, candidate, sample_rate)
+    src.core.analysis.similarity.similarity(reference, candidate, sample_rate)
+
+    python -m benchmarks.bench_dsp --max-duration 600 --check
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import result, summarize
+
+# (階段, 模組, 函式, 是否需要參考音訊)
+STAGES: Tuple[Tuple[str, str, str, bool], ...] = (
+    ("preprocess", "src.core.voice.preprocessor", "preprocess", False),
+    ("denoise", "src.core.voice.denoiser", "denoise", False),
+    ("extract_features", "src.core.voice.feature_extractor", "extract_features", False),
+    ("assess_quality", "src.core.analysis.quality", "assess_quality", True),
+    ("similarity", "src.core.analysis.similarity", "similarity", True),
+)
+
+# SRS 4.1 性能需求：特徵提取 < 30 秒/分鐘語音，質量評估 < 10 秒/對比
+BUDGETS = {
+    "extract_features": {"realtime_factor": 0.5},
+    "assess_quality": {"cpu_seconds": 10.0},
+}
+
+# 比對類階段的候選音訊：在參考音訊上加入 20 dB 的雜訊
+CANDIDATE_SNR_DB = 20
+
+def resolve(module_name: str, function: str) -> Tuple[Callable, str]:
+    """src.core 中的實作，沒有時回傳參考實作"""
+    try:
+        implementation = getattr(importlib.import_module(module_name), function)
+        return implementation, module_name
+    except (ImportError, AttributeError):
+        from benchmarks import reference_dsp
+        return getattr(reference_dsp, function), "benchmarks.reference_dsp"
+
+def _reset_peak_rss() -> None:
+    """Linux 可重設峰值 RSS（VmHWM），其他平台則沿用行程至今的峰值"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _peak_rss() -> Optional[int]:
+    """峰值 RSS（位元組）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _run_stage(stage: str, module_name: str, function: str, pair: bool, audio_path: str,
+               candidate_path: Optional[str], sample_rate: int, repeat: int) -> Dict[str, Any]:
+    """在子行程中執行：載入語料、量測 CPU 時間與峰值 RSS"""
+    import numpy as np
+    func, implementation = resolve(module_name, function)
+    audio = np.load(audio_path)
+    args = (audio, np.load(candidate_path), sample_rate) if pair else (audio, sample_rate)
+    _reset_peak_rss()
+    baseline = _peak_rss()
+    cpu, wall = [], []
+    for _ in range(repeat):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        func(*args)
+        cpu.append(time.process_time() - cpu_start)
+        wall.append(time.perf_counter() - wall_start)
+    peak = _peak_rss()
+    return {
+        "implementation": implementation,
+        "cpu": cpu,
+        "wall": wall,
+        "peak_rss_bytes": peak,
+        "stage_rss_bytes": peak - baseline if peak is not None and baseline is not None else None
+    }
+
+def _check_budget(stage: str, cpu_seconds: float, audio_seconds: float) -> Optional[Dict[str, Any]]:
+    budget = BUDGETS.get(stage)
+    if budget is None:
+        return None
+    if "realtime_factor" in budget:
+        actual = cpu_seconds / audio_seconds
+        return {"metric": "realtime_factor", "limit": budget["realtime_factor"], "actual": actual,
+                "ok": actual <= budget["realtime_factor"]}
+    return {"metric": "cpu_seconds", "limit": budget["cpu_seconds"], "actual": cpu_seconds,
+            "ok": cpu_seconds <= budget["cpu_seconds"]}
+
+def run(quick: bool = False, max_duration: Optional[float] = None, stages: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    import numpy as np
+    from benchmarks.corpus import CorpusItem, default_corpus, generate, mix
+
+    corpus = default_corpus(max_duration if max_duration is not None else (10 if quick else 3600))
+    selected = [entry for entry in STAGES if not stages or entry[0] in stages]
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="bench-dsp-") as root:
+        for item in corpus:
+            audio = generate(item)
+            audio_path = os.path.join(root, f"{item.name}.npy")
+            np.save(audio_path, audio)
+            candidate_path = None
+            if any(pair for *_, pair in selected):
+                noise = generate(CorpusItem("noise", item.sample_rate, item.duration, item.seed + 7))
+                candidate_path = os.path.join(root, f"{item.name}.candidate.npy")
+                np.save(candidate_path, mix(audio, noise, CANDIDATE_SNR_DB))
+                del noise
+            del audio
+
+            repeat = 1 if quick or item.duration >= 600 else 3
+            for stage, module_name, function, pair in selected:
+                # 每個組合一個全新行程，峰值 RSS 才不會沿用前一個階段
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    measured = pool.submit(
+                        _run_stage, stage, module_name, function, pair,
+                        audio_path, candidate_path, item.sample_rate, repeat
+                    ).result()
+                cpu = summarize(measured["cpu"])
+                results.append(result(
+                    "dsp_stage",
+                    {"stage": stage, "corpus": item.name, "kind": item.kind,
+                     "sample_rate": item.sample_rate, "duration_seconds": item.duration},
+                    cpu,
+                    unit="cpu_seconds",
+                    implementation=measured["implementation"],
+                    wall_median=summarize(measured["wall"])["median"],
+                    audio_seconds_per_cpu_second=item.duration / max(cpu["median"], 1e-9),
+                    realtime_factor=cpu["median"] / item.duration,
+                    peak_rss_bytes=measured["peak_rss_bytes"],
+                    stage_rss_bytes=measured["stage_rss_bytes"],
+                    budget=_check_budget(stage, cpu["median"], item.duration)
+                ))
+            for path in (audio_path, candidate_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="DSP 階段基準測試")
+    parser.add_argument("--max-duration", type=float, default=3600, help="語料最長秒數（預設 3600，即 60 分鐘）")
+    parser.add_argument("--stages", nargs="+", choices=[entry[0] for entry in STAGES], help="只量測指定階段")
+    parser.add_argument("--output", help="JSON 結果檔")
+    parser.add_argument("--check", action="store_true", help="有階段超出 SRS 預算時以狀態 1 結束")
+    args = parser.parse_args()
+
+    results = run(max_duration=args.max_duration, stages=args.stages)
+    for entry in results:
+        params = entry["params"]
+        rss = entry["stage_rss_bytes"]
+        print(
+            f"{params['stage']:<17} {params['corpus']:<28} "
+            f"{entry['audio_seconds_per_cpu_second']:10.1f} s/cpu-s  "
+            f"{(rss or 0) / 2**20:8.1f} MiB"
+            + ("" if not entry["budget"] else "  budget " + ("ok" if entry["budget"]["ok"] else "EXCEEDED"))
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+    if args.check and any(entry["budget"] and not entry["budget"]["ok"] for entry in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
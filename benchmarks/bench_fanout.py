@@ -0,0 +1,95 @@
+"""進度訊息經 ProgressBus 扇出給 N 個 WebSocket 連線的延遲"""
+from typing import Any, Dict, List
+import asyncio
+
+from benchmarks.harness import measure_async, result
+
+CLIENT_COUNTS = (10, 100, 1000)
+
+class StandInSocket:
+    """只計數的假 WebSocket；收齊預期數量時通知量測端"""
+
+    def __init__(self, tracker: "Arrivals", compact: bool):
+        self.tracker = tracker
+        self.scope = {"subprotocols": ["progress.compact.v1"] if compact else []}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text):
+        self.tracker.arrived()
+
+    async def send_bytes(self, data):
+        self.tracker.arrived()
+
+    async def close(self, code=1000):
+        pass
+
+class Arrivals:
+    def __init__(self):
+        self.expected = 0
+        self.count = 0
+        self.done = asyncio.Event()
+
+    def expect(self, count: int) -> None:
+        self.expected, self.count = count, 0
+        self.done.clear()
+
+    def arrived(self) -> None:
+        self.count += 1
+        if self.count >= self.expected:
+            self.done.set()
+
+def _fanout(clients: int, compact: bool, repeat: int) -> Dict[str, Any]:
+    from src.api.websocket import WebSocketManager
+    from src.utils.progress_bus import ProgressBus, task_topic
+    from src.utils.shared_state import InMemorySharedState
+
+    bus = ProgressBus()
+    state = {}
+
+    async def setup():
+        manager = WebSocketManager(InMemorySharedState())
+        arrivals = Arrivals()
+        for i in range(clients):
+            connection = await manager.connect(StandInSocket(arrivals, compact), f"c{i}")
+            bus.subscribe(task_topic("bench"), connection)
+        state.update(manager=manager, arrivals=arrivals, seq=0)
+
+    async def publish_once():
+        if not state:
+            await setup()
+        state["seq"] += 1
+        state["arrivals"].expect(clients)
+        await bus.publish(
+            {"type": "progress", "task_id": "bench", "seq": state["seq"], "full": False,
+             "progress": 50.0, "current_step": 5, "status": "in_progress"},
+            task_topic("bench")
+        )
+        # 連線由各自的寫入任務送出，等到最後一個客戶端收到為止
+        await state["arrivals"].done.wait()
+
+    return measure_async(publish_once, repeat, warmup=2)
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    from src.core.config import settings
+    results = []
+    repeat = 10 if quick else 50
+    saved_cap = settings.WS_MAX_CONNECTIONS
+    settings.WS_MAX_CONNECTIONS = max(saved_cap, max(CLIENT_COUNTS) + 1)
+    try:
+        results.extend(_run_counts(repeat))
+    finally:
+        settings.WS_MAX_CONNECTIONS = saved_cap
+    return results
+
+def _run_counts(repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for clients in CLIENT_COUNTS:
+        for compact in (False, True):
+            stats = _fanout(clients, compact, repeat)
+            results.append(result(
+                "websocket_fanout", {"clients": clients, "encoding": "compact" if compact else "json"}, stats,
+                per_client_us=stats["median"] / clients * 1e6
+            ))
+    return results
@@ -0,0 +1,59 @@
+"""大型任務表下 /api/tasks 的列表延遲（第一頁與以游標翻到深處）"""
+from typing import Any, Dict, List
+from datetime import datetime, timedelta
+
+from benchmarks.harness import local_app, measure, result
+
+ROW_COUNTS = (10_000, 100_000)
+PAGE_SIZE = 50
+
+def _fill(client, rows: int) -> None:
+    """以批次插入大量任務，分散在數個使用者與狀態"""
+    from src.models.task import Task
+    statuses = ("pending", "processing", "completed", "failed")
+    start = datetime(2024, 1, 1)
+    session = client.bench_session()
+    try:
+        session.query(Task).delete()
+        session.bulk_insert_mappings(Task, [
+            {
+                "user_id": 1 + i % 4,
+                "status": statuses[i % len(statuses)],
+                "input_file": f"in_{i}.wav",
+                "created_at": start + timedelta(seconds=i),
+                "updated_at": start + timedelta(seconds=i)
+            }
+            for i in range(rows)
+        ])
+        session.commit()
+    finally:
+        session.close()
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    results = []
+    repeat = 5 if quick else 20
+    counts = ROW_COUNTS[:1] if quick else ROW_COUNTS
+    with local_app() as client:
+        for rows in counts:
+            _fill(client, rows)
+
+            def first_page():
+                response = client.get("/api/tasks", params={"limit": PAGE_SIZE})
+                assert response.status_code == 200, response.text
+
+            cursor = None
+            for _ in range(20):
+                response = client.get("/api/tasks", params={"limit": PAGE_SIZE, **({"cursor": cursor} if cursor else {})})
+                cursor = response.headers.get("X-Next-Cursor")
+
+            def deep_page():
+                response = client.get("/api/tasks", params={"limit": PAGE_SIZE, "cursor": cursor})
+                assert response.status_code == 200, response.text
+
+            def filtered_page():
+                response = client.get("/api/tasks", params={"limit": PAGE_SIZE, "status": "completed"})
+                assert response.status_code == 200, response.text
+
+            for name, func in (("first", first_page), ("deep_cursor", deep_page), ("status_filter", filtered_page)):
+                results.append(result("task_listing", {"rows": rows, "page": name, "limit": PAGE_SIZE}, measure(func, repeat)))
+    return results
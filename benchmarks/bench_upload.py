@@ -0,0 +1,51 @@
+"""/api/upload 在不同檔案大小下的吞吐量，以及 /api/upload/batch 一次上傳大量短片段的耗時"""
+from typing import Any, Dict, List
+from unittest import mock
+import itertools
+
+from benchmarks.harness import local_app, measure, payload, result
+
+SIZES = (64 * 1024, 1024 * 1024, 8 * 1024 * 1024)
+# 使用者一次上傳 50–200 個片段
+BATCH_FILES = (50, 200)
+BATCH_FILE_BYTES = 256 * 1024
+
+async def _skip_processing(*args, **kwargs):
+    return None
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    results = []
+    repeat = 3 if quick else 10
+    with local_app() as client:
+        for size in SIZES:
+            data = payload(size)
+            names = itertools.count()
+
+            def upload():
+                response = client.post(
+                    "/api/upload",
+                    files={"file": (f"bench_{next(names)}.wav", data, "audio/wav")}
+                )
+                assert response.json()["success"], response.text
+
+            stats = measure(upload, repeat)
+            results.append(result(
+                "upload", {"size_bytes": size}, stats,
+                throughput_mb_s=size / stats["median"] / (1024 * 1024)
+            ))
+
+        # 只量測接收、驗證、儲存與寫入任務；TestClient 會同步執行背景處理，故略過
+        with mock.patch("src.api.routes.upload.voice_service.process_audio", _skip_processing):
+            for count in BATCH_FILES:
+                files = [("files", (f"clip_{i}.wav", payload(BATCH_FILE_BYTES, seed=i), "audio/wav")) for i in range(count)]
+
+                def upload_batch():
+                    response = client.post("/api/upload/batch", files=files)
+                    assert response.status_code == 200, response.text
+
+                stats = measure(upload_batch, 1 if quick else 3)
+                results.append(result(
+                    "upload_batch", {"files": count, "file_bytes": BATCH_FILE_BYTES}, stats,
+                    files_per_second=count / stats["median"]
+                ))
+    return results
@@ -0,0 +1,111 @@
+"""可重現的合成音訊語料：類語音訊號、雜訊與含噪語音，涵蓋不同取樣率與長度
+
+同一個 CorpusItem 每次產生的樣本都相同。長音訊以 1 秒為單位分塊產生，
+暫存記憶體不隨長度增加。
+"""
+from typing import Iterator, List, NamedTuple
+import numpy as np
+
+SAMPLE_RATES = (8000, 16000, 22050, 44100, 48000)
+DURATIONS = (1, 10, 60, 600, 3600)  # 1 秒到 60 分鐘
+KINDS = ("speech", "noisy_speech", "noise")
+
+# 母音共振峰（Hz），每個區塊輪流使用以模擬音節變化
+VOWEL_FORMANTS = ((730, 1090, 2440), (270, 2290, 3010), (300, 870, 2240), (530, 1840, 2480), (570, 840, 2410))
+
+class CorpusItem(NamedTuple):
+    kind: str
+    sample_rate: int
+    duration: float
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}_{self.sample_rate}hz_{self.duration:g}s"
+
+    @property
+    def samples(self) -> int:
+        return int(round(self.sample_rate * self.duration))
+
+def default_corpus(max_duration: float = max(DURATIONS)) -> List[CorpusItem]:
+    """長度掃描（16 kHz 語音）、取樣率掃描（10 秒語音）與訊號種類（16 kHz 10 秒）"""
+    items = [CorpusItem("speech", 16000, duration) for duration in DURATIONS]
+    items += [CorpusItem("speech", rate, 10) for rate in SAMPLE_RATES if rate != 16000]
+    items += [CorpusItem(kind, 16000, 10) for kind in KINDS if kind != "speech"]
+    return [item for item in items if item.duration <= max_duration]
+
+def _formant_envelope(freqs: np.ndarray, formants, bandwidth: float = 120.0) -> np.ndarray:
+    """共振峰頻譜包絡，並帶有每八度約 -6 dB 的整體衰減"""
+    envelope = np.zeros_like(freqs)
+    for rank, formant in enumerate(formants):
+        envelope += np.exp(-0.5 * ((freqs - formant) / (bandwidth * (rank + 1))) ** 2) / (rank + 1)
+    return envelope / np.maximum(1.0, freqs / 500.0) + 1e-3
+
+def _speech_blocks(item: CorpusItem, rng: np.random.Generator) -> Iterator[np.ndarray]:
+    """以鋸齒波聲門源、共振峰濾波與音節包絡組成的類語音訊號"""
+    sr = item.sample_rate
+    base_f0 = rng.uniform(100, 220)
+    phase = 0.0
+    position = 0
+    while position < item.samples:
+        count = min(sr, item.samples - position)
+        t = (position + np.arange(count)) / sr
+        # 語調：慢速起伏加上輕微顫音
+        f0 = base_f0 * (1 + 0.12 * np.sin(2 * np.pi * 0.3 * t) + 0.03 * np.sin(2 * np.pi * 5.5 * t))
+        phases = phase + np.cumsum(2 * np.pi * f0 / sr)
+        phase = float(phases[-1] % (2 * np.pi))
+        source = 2 * ((phases / (2 * np.pi)) % 1.0) - 1
+        source += 0.05 * rng.standard_normal(count)  # 氣音
+
+        spectrum = np.fft.rfft(source)
+        formants = VOWEL_FORMANTS[(position // sr) % len(VOWEL_FORMANTS)]
+        voiced = np.fft.irfft(spectrum * _formant_envelope(np.fft.rfftfreq(count, 1 / sr), formants), count)
+
+        # 每秒約四個音節，每三秒有一段停頓
+        syllables = np.sqrt(np.clip(np.sin(2 * np.pi * 4 * t), 0, None))
+        pauses = (t % 3.0) < 2.5
+        yield (voiced * syllables * pauses).astype(np.float32)
+        position += count
+
+def _noise_blocks(item: CorpusItem, rng: np.random.Generator) -> Iterator[np.ndarray]:
+    """粉紅雜訊（功率約與頻率成反比）"""
+    sr = item.sample_rate
+    position = 0
+    while position < item.samples:
+        count = min(sr, item.samples - position)
+        spectrum = np.fft.rfft(rng.standard_normal(count))
+        freqs = np.fft.rfftfreq(count, 1 / sr)
+        spectrum /= np.sqrt(np.maximum(freqs, 20.0))
+        yield np.fft.irfft(spectrum, count).astype(np.float32)
+        position += count
+
+def _normalize(audio: np.ndarray, peak: float = 0.9) -> np.ndarray:
+    top = float(np.max(np.abs(audio))) if audio.size else 0.0
+    if top > 0:
+        audio *= peak / top
+    return audio
+
+def generate(item: CorpusItem) -> np.ndarray:
+    """產生語料項目的 float32 單聲道樣本"""
+    audio = np.empty(item.samples, dtype=np.float32)
+    if item.kind == "speech":
+        blocks = _speech_blocks(item, np.random.default_rng(item.seed))
+    elif item.kind == "noise":
+        blocks = _noise_blocks(item, np.random.default_rng(item.seed))
+    elif item.kind == "noisy_speech":
+        return mix(generate(item._replace(kind="speech")), generate(item._replace(kind="noise", seed=item.seed + 1)), snr_db=10)
+    else:
+        raise ValueError(f"Unknown corpus kind: {item.kind}")
+
+    position = 0
+    for block in blocks:
+        audio[position:position + len(block)] = block
+        position += len(block)
+    return _normalize(audio)
+
+def mix(signal: np.ndarray, noise: np.ndarray, snr_db: float) -> np.ndarray:
+    """以指定訊噪比將雜訊加到訊號上"""
+    signal_power = float(np.mean(signal.astype(np.float64) ** 2))
+    noise_power = float(np.mean(noise.astype(np.float64) ** 2)) or 1.0
+    scale = np.sqrt(signal_power / (noise_power * 10 ** (snr_db / 10)))
+    return _normalize(signal + (scale * noise).astype(np.float32))
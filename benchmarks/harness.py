@@ -0,0 +1,175 @@
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from contextlib import contextmanager
+from datetime import datetime
+import asyncio
+import os
+import random
+import statistics
+import struct
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Timing statistics of repeated runs, in seconds"""
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0
+    }
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1, trace_memory: bool = False) -> Dict[str, Any]:
+    """Run ``func`` ``warmup`` + ``repeat`` times and summarize the timed runs
+
+    With ``trace_memory`` the highest peak of Python allocations over the
+    runs is reported as ``peak_bytes`` (tracemalloc slows the runs down, so
+    timings taken with it are not comparable to those without).
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    peak = 0
+    for _ in range(repeat):
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+        if trace_memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    result = summarize(samples)
+    if trace_memory:
+        result["peak_bytes"] = peak
+    return result
+
+def measure_async(func: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    """``measure`` for a coroutine function, on one event loop"""
+    async def timed() -> List[float]:
+        for _ in range(warmup):
+            await func()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await func()
+            samples.append(time.perf_counter() - start)
+        return samples
+    return summarize(asyncio.run(timed()))
+
+def result(name: str, params: Dict[str, Any], stats: Dict[str, Any], **extra: Any) -> Dict[str, Any]:
+    """One benchmark result as written to the JSON report"""
+    return {"name": name, "params": params, "unit": "seconds", **stats, **extra}
+
+@contextmanager
+def isolated_app() -> Iterator[Tuple[Any, str, Any]]:
+    """The FastAPI app wired to throwaway stand-ins, as ``(app, root, Session)``
+
+    Uploads, previews and downloads go to a temporary directory ``root``,
+    and both the task database (``Session``) and the error history database
+    are fresh SQLite files in it, so runs neither depend on nor touch the
+    working tree. Startup events are not run: they would create databases
+    and directories in the working directory.
+    """
+    from src.core.config import settings
+    from src.main import app
+    from src.models.base import Base, ensure_indexes, get_db
+    import src.models.task  # noqa: F401  register the tasks table
+    import src.models.user  # noqa: F401
+    from src.utils import error_handler
+    from src.utils.file_manager import file_manager
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as root:
+        saved_settings = {name: getattr(settings, name) for name in ("UPLOAD_DIR", "PREVIEW_DIR", "DOWNLOAD_DIR")}
+        saved_dirs = (file_manager.upload_dir, file_manager.preview_dir, file_manager.download_dir)
+        saved_history = error_handler._history_engine
+        for name in saved_settings:
+            path = os.path.join(root, name.lower())
+            os.makedirs(path)
+            setattr(settings, name, path)
+        file_manager.upload_dir, file_manager.preview_dir, file_manager.download_dir = (
+            settings.UPLOAD_DIR, settings.PREVIEW_DIR, settings.DOWNLOAD_DIR
+        )
+
+        engine = create_engine(f"sqlite:///{os.path.join(root, 'tasks.db')}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        ensure_indexes(engine)
+        Session = sessionmaker(bind=engine)
+
+        def get_bench_db():
+            db = Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        history = create_engine(f"sqlite:///{os.path.join(root, 'history.db')}", connect_args={"check_same_thread": False})
+        error_handler._history_engine = _with_history_tables(history)
+        app.dependency_overrides[get_db] = get_bench_db
+        try:
+            yield app, root, Session
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            error_handler._history_engine = saved_history
+            for name, value in saved_settings.items():
+                setattr(settings, name, value)
+            file_manager.upload_dir, file_manager.preview_dir, file_manager.download_dir = saved_dirs
+            engine.dispose()
+            history.dispose()
+
+@contextmanager
+def local_app() -> Iterator[Any]:
+    """A TestClient for ``isolated_app``, with ``bench_root`` and ``bench_session`` attached"""
+    from fastapi.testclient import TestClient
+
+    with isolated_app() as (app, root, Session):
+        client = TestClient(app)
+        client.bench_root = root
+        client.bench_session = Session
+        yield client
+
+def _with_history_tables(engine):
+    """Create the error history tables on ``engine`` as get_history_engine would"""
+    from src.models.base import ensure_indexes
+    from src.models.error_history import CorrectionHistory, ErrorHistory, ErrorStatsRollup
+    tables = [ErrorHistory.__table__, CorrectionHistory.__table__, ErrorStatsRollup.__table__]
+    ErrorHistory.metadata.create_all(engine, tables=tables)
+    ensure_indexes(engine, tables=tables)
+    return engine
+
+def payload(size: int, seed: int = 0) -> bytes:
+    """A deterministic WAV file of ``size`` bytes with incompressible sample data
+
+    16-bit mono 16 kHz PCM, so uploads pass header probing like real audio.
+    """
+    data_size = max(0, size - 44)
+    header = b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16)
+    header += b"data" + struct.pack("<I", data_size)
+    return header + random.Random(seed).randbytes(data_size)
+
+def completed_tasks(root: str, Session: Any, count: int, size: int, prefix: str = "out") -> List[int]:
+    """Completed tasks with an output file of ``size`` bytes each, for download paths"""
+    from src.models.task import Task
+    session = Session()
+    try:
+        tasks = []
+        for i in range(count):
+            path = os.path.join(root, "download_dir", f"{prefix}_{i}.wav")
+            with open(path, "wb") as f:
+                f.write(payload(size, seed=i))
+            task = Task(user_id=1, status="completed", input_file=path, output_file=path,
+                        created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+            session.add(task)
+            tasks.append(task)
+        session.commit()
+        return [task.id for task in tasks]
+    finally:
+        session.close()
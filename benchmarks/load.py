@@ -0,0 +1,291 @@
+"""以 asyncio 模擬多位同時使用者的負載測試
+
+每位虛擬使用者不停地依權重挑選情境執行（上傳、邊看進度邊上傳、批次上傳、
+輪詢、批次下載），並逐步提高使用者數量。每一級回報各情境的延遲百分位數、
+錯誤率與吞吐量，並找出服務開始飽和的那一級：p95 超過 SLO、錯誤率超過
+上限，或吞吐量不再隨使用者增加而成長。
+
+預設在本行程內以 uvicorn 於本機埠啟動應用程式（暫存目錄與資料庫，見
+benchmarks.harness.isolated_app），所有請求都走真正的 HTTP 與 WebSocket；
+--url 則改測已在執行的伺服器。行程內模式下負載產生器與伺服器共用同一個
+事件迴圈，量到的是偏保守的上限。
+
+    python -m benchmarks.load                                  # 1, 3, 5, 10, 20, 50 位使用者，每級 10 秒
+    python -m benchmarks.load --users 1 3 10 50 --step-seconds 30 --output load.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --mix poll=5,upload=1
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+import httpx
+import websockets
+
+from benchmarks.harness import completed_tasks, payload
+
+# SRS 4.1：支援最多 3 個並發任務
+SRS_CONCURRENT_TASKS = 3
+
+DEFAULT_MIX = {"upload": 2, "upload_watch": 2, "batch_upload": 1, "poll": 4, "download": 1}
+UPLOAD_BYTES = 256 * 1024
+DOWNLOAD_FILES = 3
+
+class LoadContext:
+    """所有虛擬使用者共用的連線與測試資料"""
+
+    def __init__(self, http: httpx.AsyncClient, ws_url: str, download_ids: List[int]):
+        self.http = http
+        self.ws_url = ws_url
+        self.download_ids = download_ids
+        self.data = payload(UPLOAD_BYTES)
+        self._ids = itertools.count()
+        self.run_id = f"load{os.getpid()}x{int(time.time())}"
+
+    def next_id(self) -> str:
+        return f"{self.run_id}-{next(self._ids)}"
+
+class ScenarioError(Exception):
+    """The response was received but reports a failure"""
+    pass
+
+def _check(response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 400:
+        raise ScenarioError(f"HTTP {response.status_code}")
+    return response
+
+async def _upload(ctx: LoadContext, name: str) -> None:
+    response = _check(await ctx.http.post(
+        "/api/upload", files={"file": (f"{name}.wav", ctx.data, "audio/wav")}, data={"task_id": name}
+    ))
+    if not response.json().get("success"):
+        raise ScenarioError(response.json().get("message", "upload failed"))
+
+async def upload(ctx: LoadContext) -> None:
+    """單檔上傳"""
+    await _upload(ctx, ctx.next_id())
+
+async def upload_watch(ctx: LoadContext) -> None:
+    """前端的上傳流程：先以 WebSocket 訂閱進度，上傳後等到任務結束的訊息
+
+    所有虛擬使用者都是同一位已驗證使用者，同時開啟的連線超過
+    WS_MAX_CONNECTIONS_PER_USER 時握手會被拒絕並計為錯誤。
+    """
+    name = ctx.next_id()
+    async with websockets.connect(f"{ctx.ws_url}/ws/{name}") as ws:
+        await ws.send(json.dumps({"type": "subscribe_task", "task_id": name}))
+        await _upload(ctx, name)
+        async with asyncio.timeout(ctx.http.timeout.read):
+            while True:
+                message = json.loads(await ws.recv())
+                if message.get("type") == "ping":
+                    await ws.send(json.dumps({"type": "pong"}))
+                elif message.get("task_id") == name and message.get("status") in ("completed", "failed"):
+                    if message["status"] == "failed":
+                        raise ScenarioError("task failed")
+                    return
+
+async def batch_upload(ctx: LoadContext) -> None:
+    """一次上傳三個檔案並建立處理任務"""
+    files = [("files", (f"{ctx.next_id()}.wav", ctx.data, "audio/wav")) for _ in range(3)]
+    _check(await ctx.http.post("/api/upload/batch", files=files))
+
+async def poll(ctx: LoadContext) -> None:
+    """舊版客戶端的輪詢：任務列表與上傳狀態"""
+    _check(await ctx.http.get("/api/tasks", params={"limit": 20}))
+    _check(await ctx.http.get("/api/upload_status", params={"task_id": ctx.next_id()}))
+
+async def download(ctx: LoadContext) -> None:
+    """批次下載已完成的任務"""
+    if not ctx.download_ids:
+        raise ScenarioError("no completed tasks to download (pass --download-ids)")
+    _check(await ctx.http.get("/api/batch", params={"task_ids": ctx.download_ids}))
+
+SCENARIOS: Dict[str, Callable[[LoadContext], Awaitable[None]]] = {
+    "upload": upload,
+    "upload_watch": upload_watch,
+    "batch_upload": batch_upload,
+    "poll": poll,
+    "download": download,
+}
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def _summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    total = len(ordered) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": len(ordered) / seconds,
+        "p50_ms": _ms(percentile(ordered, 0.50)),
+        "p90_ms": _ms(percentile(ordered, 0.90)),
+        "p95_ms": _ms(percentile(ordered, 0.95)),
+        "p99_ms": _ms(percentile(ordered, 0.99)),
+        "max_ms": _ms(ordered[-1] if ordered else None)
+    }
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+async def _virtual_user(ctx: LoadContext, deadline: float, weights: Dict[str, float], rng: random.Random,
+                        think: float, records: Dict[str, Tuple[List[float], List[str]]]) -> None:
+    names, chances = list(weights), list(weights.values())
+    while time.monotonic() < deadline:
+        name = rng.choices(names, chances)[0]
+        latencies, errors = records[name]
+        start = time.perf_counter()
+        try:
+            await SCENARIOS[name](ctx)
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+async def run_level(ctx: LoadContext, users: int, seconds: float, weights: Dict[str, float],
+                    think: float, seed: int) -> Dict[str, Any]:
+    """以固定的使用者數量執行 seconds 秒"""
+    records = {name: ([], []) for name in weights}
+    deadline = time.monotonic() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _virtual_user(ctx, deadline, weights, random.Random(seed * 1000 + i), think, records)
+        for i in range(users)
+    ))
+    elapsed = time.perf_counter() - started
+    all_latencies = [latency for latencies, _ in records.values() for latency in latencies]
+    all_errors = sum(len(errors) for _, errors in records.values())
+    return {
+        "users": users,
+        "seconds": round(elapsed, 3),
+        **_summarize(all_latencies, all_errors, elapsed),
+        "scenarios": {name: _summarize(latencies, len(errors), elapsed) for name, (latencies, errors) in records.items()},
+        "sample_errors": sorted({error for _, errors in records.values() for error in errors})[:5]
+    }
+
+def find_saturation(levels: List[Dict[str, Any]], slo_ms: float, max_error_rate: float,
+                    min_gain: float = 0.05) -> Optional[Dict[str, Any]]:
+    """第一個出現飽和跡象的等級與原因"""
+    previous = None
+    for level in levels:
+        if level["error_rate"] > max_error_rate:
+            return {"users": level["users"], "reason": f"error rate {level['error_rate']:.1%} > {max_error_rate:.1%}"}
+        if level["p95_ms"] is not None and level["p95_ms"] > slo_ms:
+            return {"users": level["users"], "reason": f"p95 {level['p95_ms']:.0f} ms > {slo_ms:.0f} ms"}
+        if previous and level["throughput_rps"] < previous["throughput_rps"] * (1 + min_gain):
+            return {"users": level["users"], "reason": "throughput stopped growing"}
+        previous = level
+    return None
+
+async def _serve_locally(app: Any) -> Tuple[Any, asyncio.Task, str]:
+    """在本機的臨時埠啟動 uvicorn，回傳伺服器、其任務與位址"""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    return server, task, f"http://{host}:{port}"
+
+async def run_load(levels: List[int], step_seconds: float, weights: Dict[str, float], think: float = 0.0,
+                   timeout: float = 30, url: Optional[str] = None, download_ids: Optional[List[int]] = None, seed: int = 0,
+                   app_context: Optional[Tuple[Any, str, Any]] = None) -> List[Dict[str, Any]]:
+    """對 url（或 app_context 的行程內伺服器）依序執行各使用者等級"""
+    server = serve_task = None
+    if url is None:
+        app, root, Session = app_context
+        if "download" in weights and not download_ids:
+            download_ids = completed_tasks(root, Session, DOWNLOAD_FILES, UPLOAD_BYTES, prefix="load")
+        server, serve_task, url = await _serve_locally(app)
+
+    results = []
+    limits = httpx.Limits(max_connections=max(levels) * 2, max_keepalive_connections=max(levels) * 2)
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as http:
+            ctx = LoadContext(http, url.replace("http", "ws", 1), download_ids or [])
+            for users in levels:
+                level = await run_level(ctx, users, step_seconds, weights, think, seed)
+                results.append(level)
+                print(
+                    f"[load] {users:4d} users  {level['throughput_rps']:8.1f} req/s  "
+                    f"p50 {level['p50_ms']} ms  p95 {level['p95_ms']} ms  p99 {level['p99_ms']} ms  "
+                    f"errors {level['error_rate']:.1%}",
+                    flush=True
+                )
+    finally:
+        if server is not None:
+            server.should_exit = True
+            await serve_task
+    return results
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def main():
+    parser = argparse.ArgumentParser(description="模擬多位同時使用者的負載測試")
+    parser.add_argument("--url", help="受測伺服器（預設在本行程內啟動）")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, SRS_CONCURRENT_TASKS, 5, 10, 20, 50], help="依序測試的使用者數量")
+    parser.add_argument("--step-seconds", type=float, default=10, help="每一級的持續秒數")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX, help="情境權重，如 poll=5,upload=1")
+    parser.add_argument("--think", type=float, default=0.5, help="兩次操作間的平均思考時間（秒），0 表示不停歇")
+    parser.add_argument("--timeout", type=float, default=30, help="單一請求的逾時秒數")
+    parser.add_argument("--download-ids", type=int, nargs="+", help="--url 模式下可下載的已完成任務 ID")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="p95 延遲上限（毫秒）")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="錯誤率上限")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON 結果檔")
+    args = parser.parse_args()
+
+    levels = sorted(set(args.users))
+    if args.url is None:
+        from benchmarks.harness import isolated_app
+        with isolated_app() as app_context:
+            results = asyncio.run(run_load(levels, args.step_seconds, args.mix, args.think, args.timeout, None, args.download_ids, args.seed, app_context))
+    else:
+        results = asyncio.run(run_load(levels, args.step_seconds, args.mix, args.think, args.timeout, args.url, args.download_ids, args.seed))
+
+    saturation = find_saturation(results, args.slo_ms, args.max_error_rate)
+    srs_level = next((level for level in results if level["users"] == SRS_CONCURRENT_TASKS), None)
+    srs_ok = (
+        srs_level is not None
+        and srs_level["error_rate"] <= args.max_error_rate
+        and (srs_level["p95_ms"] or 0) <= args.slo_ms
+    )
+    print(f"[load] saturation: {saturation or 'not reached'}")
+    if srs_level is not None:
+        print(f"[load] SRS {SRS_CONCURRENT_TASKS} concurrent users: {'ok' if srs_ok else 'NOT MET'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "target": args.url or "in-process",
+                "mix": args.mix,
+                "slo_ms": args.slo_ms,
+                "max_error_rate": args.max_error_rate,
+                "levels": results,
+                "saturation": saturation,
+                "srs_concurrent_tasks": {"users": SRS_CONCURRENT_TASKS, "ok": srs_ok if srs_level else None}
+            }, f, indent=2)
+    if srs_level is not None and not srs_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""各 DSP 階段的 numpy 參考實作
+
+src/core/voice 與 src/core/analysis 尚未提供實作時，基準測試改量測這些
+參考版本，讓量測流程與預算檢查先就位；真正的實作出現後即自動取代。
+長音訊以固定數量的音框分塊處理，記憶體用量不隨長度增加。
+"""
+from typing import Dict
+import numpy as np
+
+FRAME_LENGTH = 512
+HOP_LENGTH = 256
+N_MELS = 40
+N_MFCC = 13
+BLOCK_FRAMES = 4096
+TARGET_RATE = 16000
+
+def _frames(audio: np.ndarray, start: int, count: int) -> np.ndarray:
+    """第 start 個音框起的 count 個音框（不複製資料）"""
+    view = np.lib.stride_tricks.sliding_window_view(audio, FRAME_LENGTH)[::HOP_LENGTH]
+    return view[start:start + count]
+
+def _frame_count(audio: np.ndarray) -> int:
+    return max(0, (len(audio) - FRAME_LENGTH) // HOP_LENGTH + 1)
+
+_WINDOW = np.hanning(FRAME_LENGTH).astype(np.float32)
+
+def _mel_filterbank(sample_rate: int) -> np.ndarray:
+    def hz_to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+    mels = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), N_MELS + 2)
+    hz = 700 * (10 ** (mels / 2595) - 1)
+    bins = np.floor((FRAME_LENGTH + 1) * hz / sample_rate).astype(int)
+    bank = np.zeros((N_MELS, FRAME_LENGTH // 2 + 1), dtype=np.float32)
+    for m in range(1, N_MELS + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            bank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            bank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return bank
+
+def _dct_matrix() -> np.ndarray:
+    n = np.arange(N_MELS)
+    k = np.arange(N_MFCC)[:, None]
+    return (np.cos(np.pi * k * (2 * n + 1) / (2 * N_MELS)) * np.sqrt(2 / N_MELS)).astype(np.float32)
+
+def preprocess(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """去除直流、預強調、重取樣到 16 kHz 並正規化峰值"""
+    audio = audio - np.mean(audio, dtype=np.float64).astype(np.float32)
+    audio = np.append(audio[:1], audio[1:] - 0.97 * audio[:-1])
+    if sample_rate != TARGET_RATE and len(audio):
+        positions = np.arange(0, len(audio), sample_rate / TARGET_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    peak = float(np.max(np.abs(audio))) if len(audio) else 0.0
+    return audio / peak if peak > 0 else audio
+
+def denoise(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """頻譜閘門：以各頻帶的低分位數估計雜訊底，軟遮罩後重疊相加"""
+    total = _frame_count(audio)
+    output = np.zeros(len(audio), dtype=np.float32)
+    if total == 0:
+        return audio.copy()
+    # 以前段音框估計雜訊底
+    head = np.abs(np.fft.rfft(_frames(audio, 0, min(total, BLOCK_FRAMES)) * _WINDOW, axis=1))
+    noise_floor = np.percentile(head, 10, axis=0)
+    for start in range(0, total, BLOCK_FRAMES):
+        frames = _frames(audio, start, BLOCK_FRAMES)
+        spectrum = np.fft.rfft(frames * _WINDOW, axis=1)
+        magnitude = np.abs(spectrum)
+        mask = np.clip((magnitude - 1.5 * noise_floor) / np.maximum(magnitude, 1e-9), 0, 1)
+        cleaned = np.fft.irfft(spectrum * mask, FRAME_LENGTH, axis=1).astype(np.float32) * _WINDOW
+        for i, frame in enumerate(cleaned):
+            offset = (start + i) * HOP_LENGTH
+            output[offset:offset + FRAME_LENGTH] += frame
+    return output
+
+def extract_features(audio: np.ndarray, sample_rate: int) -> Dict[str, np.ndarray]:
+    """每個音框的對數梅爾頻譜、MFCC、能量與過零率"""
+    bank = _mel_filterbank(sample_rate)
+    dct = _dct_matrix()
+    total = _frame_count(audio)
+    mfcc = np.empty((total, N_MFCC), dtype=np.float32)
+    energy = np.empty(total, dtype=np.float32)
+    zcr = np.empty(total, dtype=np.float32)
+    for start in range(0, total, BLOCK_FRAMES):
+        frames = _frames(audio, start, BLOCK_FRAMES)
+        end = start + len(frames)
+        power = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2
+        log_mel = np.log(power @ bank.T + 1e-10)
+        mfcc[start:end] = log_mel @ dct.T
+        energy[start:end] = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+        zcr[start:end] = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)
+    return {"mfcc": mfcc, "energy": energy, "zcr": zcr}
+
+def assess_quality(reference: np.ndarray, candidate: np.ndarray, sample_rate: int) -> Dict[str, float]:
+    """分段訊噪比與對數頻譜距離"""
+    length = min(len(reference), len(candidate))
+    reference, candidate = reference[:length], candidate[:length]
+    total = _frame_count(reference)
+    snrs, distances = [], []
+    for start in range(0, total, BLOCK_FRAMES):
+        ref = _frames(reference, start, BLOCK_FRAMES).astype(np.float64)
+        cand = _frames(candidate, start, BLOCK_FRAMES).astype(np.float64)
+        signal = np.sum(ref ** 2, axis=1)
+        noise = np.sum((ref - cand) ** 2, axis=1) + 1e-10
+        snrs.append(np.clip(10 * np.log10(signal / noise + 1e-10), -10, 35))
+        ref_spec = np.log(np.abs(np.fft.rfft(ref * _WINDOW, axis=1)) ** 2 + 1e-10)
+        cand_spec = np.log(np.abs(np.fft.rfft(cand * _WINDOW, axis=1)) ** 2 + 1e-10)
+        distances.append(np.sqrt(np.mean((ref_spec - cand_spec) ** 2, axis=1)))
+    if not snrs:
+        return {"segmental_snr_db": 0.0, "log_spectral_distance": 0.0}
+    return {
+        "segmental_snr_db": float(np.mean(np.concatenate(snrs))),
+        "log_spectral_distance": float(np.mean(np.concatenate(distances)))
+    }
+
+def similarity(reference: np.ndarray, candidate: np.ndarray, sample_rate: int) -> float:
+    """兩段音訊平均 MFCC 的餘弦相似度"""
+    a = extract_features(reference, sample_rate)["mfcc"].mean(axis=0)
+    b = extract_features(candidate, sample_rate)["mfcc"].mean(axis=0)
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-10))
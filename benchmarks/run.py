@@ -0,0 +1,99 @@
+"""執行基準測試並輸出 JSON 結果
+
+    python -m benchmarks.run                          # 全部，結果寫到 benchmarks/results/<commit>.json
+    python -m benchmarks.run --only upload fanout     # 只跑部分項目
+    python -m benchmarks.run --quick                  # 較少重複次數，用於快速檢查
+    python -m benchmarks.run --compare old.json       # 與先前的結果比較中位數
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 名稱對應到 benchmarks.bench_<名稱> 模組，各模組提供 run(quick) -> 結果清單
+SUITES = ("upload", "download", "tasks", "fanout", "dsp")
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _key(entry: Dict[str, Any]) -> str:
+    return entry["name"] + json.dumps(entry["params"], sort_keys=True)
+
+def compare(current: List[Dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """印出與基準結果的中位數比例，回傳是否有項目變慢超過門檻"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {_key(entry): entry for entry in json.load(f)["results"]}
+    regressed = False
+    print(f"\n與 {baseline_path} 比較（中位數，>1 表示變慢）:")
+    for entry in current:
+        old = baseline.get(_key(entry))
+        if old is None:
+            continue
+        ratio = entry["median"] / old["median"]
+        flag = "  <-- 變慢" if ratio > 1 + threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"  {ratio:6.2f}x  {entry['name']} {entry['params']}{flag}")
+    return regressed
+
+def _quiet_logging() -> None:
+    """量測期間只保留警告，避免日誌輸出與寫日誌的執行緒影響結果"""
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("src", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+def main():
+    parser = argparse.ArgumentParser(description="執行效能基準測試")
+    parser.add_argument("--only", nargs="+", choices=SUITES, help="只執行指定的項目")
+    parser.add_argument("--quick", action="store_true", help="減少重複次數")
+    parser.add_argument("--output", help="JSON 結果檔（預設 benchmarks/results/<commit>.json）")
+    parser.add_argument("--compare", help="與先前的 JSON 結果比較")
+    parser.add_argument("--threshold", type=float, default=0.2, help="視為變慢的比例（預設 0.2 即 20%%）")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    results = []
+    for suite in args.only or SUITES:
+        print(f"[benchmark] {suite} ...", flush=True)
+        module = importlib.import_module(f"benchmarks.bench_{suite}")
+        # 匯入後才設定，受測模組在匯入時設定的日誌等級不會蓋過它
+        _quiet_logging()
+        for entry in module.run(quick=args.quick):
+            results.append(entry)
+            print(f"  {entry['name']} {entry['params']}: median {entry['median'] * 1000:.2f} ms")
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick
+        },
+        "results": results
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[benchmark] 結果已寫入 {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
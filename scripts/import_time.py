@@ -0,0 +1,76 @@
+# scripts/import_time.py
+"""量測匯入應用程式的時間，列出各模組的匯入成本
+
+    python scripts/import_time.py                     # 匯入 src.main 最慢的 20 個模組
+    python scripts/import_time.py --json import.json  # 另存 JSON 以便比較不同版本
+    python scripts/import_time.py --max-seconds 1.5   # 超過預算時以非零狀態結束（CI 使用）
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(module: str) -> List[Dict]:
+    """在新的直譯器中以 -X importtime 匯入模組，回傳每個模組的成本（微秒）"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us)
+        })
+    return entries
+
+def summarize(entries: List[Dict]) -> Dict[str, int]:
+    """各頂層套件的自身匯入時間總和（微秒）"""
+    packages: Dict[str, int] = {}
+    for entry in entries:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+def main():
+    parser = argparse.ArgumentParser(description="量測應用程式的匯入時間")
+    parser.add_argument("--module", default="src.main", help="要匯入的模組")
+    parser.add_argument("--top", type=int, default=20, help="列出最慢的模組數量")
+    parser.add_argument("--json", help="將結果寫入 JSON 檔")
+    parser.add_argument("--max-seconds", type=float, help="總匯入時間上限，超過時以狀態 1 結束")
+    args = parser.parse_args()
+
+    entries = measure(args.module)
+    total_us = sum(entry["self_us"] for entry in entries)
+    packages = summarize(entries)
+
+    print(f"[import_time] {args.module}: {total_us / 1e6:.3f}s, {len(entries)} modules")
+    print("\n依套件（自身時間）:")
+    for package, us in list(packages.items())[:args.top]:
+        print(f"  {us / 1000:9.1f} ms  {package}")
+    print("\n依模組（累計時間）:")
+    for entry in sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:args.top]:
+        print(f"  {entry['cumulative_us'] / 1000:9.1f} ms  {entry['module']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"module": args.module, "total_us": total_us, "packages": packages, "modules": entries}, f, indent=2)
+
+    if args.max_seconds is not None and total_us / 1e6 > args.max_seconds:
+        print(f"[import_time] 超過預算 {args.max_seconds}s")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from typing import Any, Callable, Dict
+import time
+
+from src.config.logging import dropped_records, queue_depth
+from src.api.websocket import websocket_manager
+from src.utils.metrics import metrics
+from src.utils.progress_tracker import progress_tracker
+from src.utils.shared_state import shared_state
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+REQUESTS_IN_PROGRESS = metrics.gauge("http_requests_in_progress", "HTTP requests being handled by this worker")
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request per route template
+
+    Requests are labelled with the matched route path (``/api/tasks/{task_id}``),
+    not the raw URL, so that label cardinality stays bounded. Unmatched paths
+    share the ``unmatched`` label.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
+
+def _gauge(name: str, documentation: str, function: Callable[[], float]) -> None:
+    metrics.gauge(name, documentation).set_function(function)
+
+# 於擷取時計算的 worker 狀態
+_gauge("websocket_connections", "Open WebSocket connections on this worker",
+       lambda: len(websocket_manager.active_connections))
+_gauge("websocket_send_queue_depth", "Messages queued for WebSocket clients",
+       lambda: websocket_manager.metrics()["queued_messages"])
+_gauge("websocket_dropped_messages", "Messages dropped for slow WebSocket clients",
+       lambda: websocket_manager.metrics()["dropped_messages"])
+_gauge("progress_tasks", "Tasks tracked by the progress tracker", progress_tracker.task_count)
+_gauge("log_queue_depth", "Log records waiting for the listener thread", queue_depth)
+metrics.counter("log_dropped_records_total", "Log records dropped because the queue was full").set_function(dropped_records)
+metrics.gauge("worker_info", "Identity of this worker", ("worker_id",)).set(1, worker_id=shared_state.worker_id)
+
+def render_metrics() -> str:
+    """All metrics of this worker in the Prometheus text format"""
+    return metrics.render()
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Request
+from typing import Optional
+from fastapi import APIRouter, Request, HTTPException, Query
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from src.utils.error_handler import ErrorHandler
@@ -7,15 +8,43 @@ router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 error_handler = ErrorHandler()
 
+def _get_page(cursor: Optional[str], limit: int):
+    """取得一頁修正歷史，游標無效時回傳 400"""
+    try:
+        return error_handler.get_correction_history_page(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/correction-history", response_class=HTMLResponse)
-async def correction_history_page(request: Request):
+async def correction_history_page(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
     """顯示修正歷史頁面"""
-    corrections = error_handler.get_correction_history()
-    print('[correction_history] 查詢結果:', corrections)
+    corrections, next_cursor = _get_page(cursor, limit)
     return templates.TemplateResponse(
         "correction_history.html",
         {
             "request": request,
-            "corrections": corrections
+            "corrections": corrections,
+            "next_cursor": next_cursor
         }
-    ) 
\ No newline at end of file
+    )
+
+@router.get("/api/correction-history")
+async def list_correction_history(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
+    """分頁列出修正歷史（JSON 欄位只含摘要）"""
+    corrections, next_cursor = _get_page(cursor, limit)
+    return {"corrections": corrections, "next_cursor": next_cursor}
+
+@router.get("/api/correction-history/{correction_id}")
+async def get_correction_detail(correction_id: int):
+    """獲取單筆修正的完整 JSON 內容"""
+    detail = error_handler.get_correction_detail(correction_id)
+    if not detail:
+        raise HTTPException(status_code=404, detail="Correction record not found")
+    return detail
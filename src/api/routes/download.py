@@ -65,8 +65,7 @@ async def download_batch(task_ids: List[int] = Query(..., min_items=1), current_
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
             for task in tasks:
                 try:
-                    file_path = file_manager.get_file(task.output_file)
-                    zip_file.write(file_path, f"{task.id}_{os.path.basename(task.output_file)}")
+                    zip_file.write(task.output_file, f"{task.id}_{os.path.basename(task.output_file)}")
                 except Exception as e:
                     logger.error(f"Error adding file to zip: {str(e)}")
                     continue
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Request
+from typing import Optional
+from fastapi import APIRouter, Request, HTTPException, Query
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from src.utils.error_handler import ErrorHandler
@@ -7,15 +8,43 @@ router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 error_handler = ErrorHandler()
 
+def _get_page(cursor: Optional[str], limit: int):
+    """取得一頁錯誤歷史，游標無效時回傳 400"""
+    try:
+        return error_handler.get_error_history_page(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/error-history", response_class=HTMLResponse)
-async def error_history_page(request: Request):
+async def error_history_page(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
     """顯示錯誤歷史頁面"""
-    errors = error_handler.get_error_history()
-    print('[error_history] 查詢結果:', errors)
+    errors, next_cursor = _get_page(cursor, limit)
     return templates.TemplateResponse(
         "error_history.html",
         {
             "request": request,
-            "errors": errors
+            "errors": errors,
+            "next_cursor": next_cursor
         }
-    ) 
\ No newline at end of file
+    )
+
+@router.get("/api/error-history")
+async def list_error_history(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
+    """分頁列出錯誤歷史（不含堆疊追蹤）"""
+    errors, next_cursor = _get_page(cursor, limit)
+    return {"errors": errors, "next_cursor": next_cursor}
+
+@router.get("/api/error-history/{error_id}")
+async def get_error_detail(error_id: int):
+    """獲取單筆錯誤的堆疊追蹤與額外資訊"""
+    detail = error_handler.get_error_detail(error_id)
+    if not detail:
+        raise HTTPException(status_code=404, detail="Error record not found")
+    return detail
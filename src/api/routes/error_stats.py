@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Query
+from src.utils.error_handler import ErrorHandler
+
+router = APIRouter()
+error_handler = ErrorHandler()
+
+@router.get("/api/error-stats")
+async def get_error_stats(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    error_type: Optional[str] = None
+):
+    """獲取錯誤統計（每小時各類型錯誤數與修正成功率），由彙總表提供"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    return error_handler.get_error_stats(since, error_type=error_type)
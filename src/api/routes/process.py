@@ -1,5 +1,6 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from src.config.logging import logger
@@ -8,23 +9,43 @@ from src.models.task import Task, TaskResponse
 from src.models.user import User
 from src.models.base import get_db
 from src.api.routes.upload import get_current_user
-from src.services.voice_service import voice_service
+from src.services.voice_service import PROCESSING_KIND, voice_service
 from src.services.analysis_service import analysis_service
 from src.services.optimization_service import optimization_service
 from src.utils.file_manager import file_manager
+from src.utils.pagination import keyset_paginate
+from src.api.sse import progress_event_stream, task_exists
+from src.utils.progress_tracker import progress_tracker, TERMINAL_STATUSES
+from src.utils.tracing import tracer
 
 router = APIRouter()
 
+async def _attach_estimates(tasks: List[Task]) -> List[Task]:
+    """Fill in ETA and throughput from the progress tracker for unfinished tasks"""
+    for task in tasks:
+        if task.status in TERMINAL_STATUSES:
+            continue
+        estimate = await progress_tracker.estimate(str(task.id), kind=PROCESSING_KIND)
+        task.eta_seconds = estimate["eta_seconds"]
+        task.throughput = estimate["throughput"]
+    return tasks
+
 @router.get("/tasks", response_model=List[TaskResponse])
 async def get_tasks(
+    response: Response,
     status: Optional[str] = None,
     task_type: Optional[str] = None,
+    cursor: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> List[Task]:
-    """Get list of tasks with optional filtering"""
+    """Get list of tasks with optional filtering
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` to fetch the
+    next page; ``skip`` is kept for offset paging by older clients.
+    """
     try:
         query = db.query(Task).filter(Task.user_id == current_user.id)
         
@@ -32,9 +53,14 @@ async def get_tasks(
             query = query.filter(Task.status == status)
         if task_type:
             query = query.filter(Task.task_type == task_type)
-            
-        return query.offset(skip).limit(limit).all()
         
+        tasks, next_cursor = keyset_paginate(query, Task, limit, cursor, offset=skip)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return await _attach_estimates(tasks)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         handle_error(e, "Error getting tasks")
 
@@ -57,13 +83,70 @@ async def get_task(
         if task.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to access this task")
             
-        return task
+        return (await _attach_estimates([task]))[0]
         
     except HTTPException:
         raise
     except Exception as e:
         handle_error(e, "Error getting task")
 
+async def _owns_task(task_id: str, user: User, db: Session) -> bool:
+    """Whether a tracked or stored task belongs to ``user``
+
+    The progress tracker records the owner of the tasks it follows; tasks it
+    does not know, or tracked without an owner, are looked up in the database.
+    """
+    try:
+        owner = (await progress_tracker.get_task_status(task_id)).get("user_id")
+    except KeyError:
+        owner = None
+    if owner is not None:
+        return str(owner) == str(user.id)
+    if not task_id.isdigit():
+        return False
+    return db.query(Task.id).filter(Task.id == int(task_id), Task.user_id == user.id).first() is not None
+
+@router.get("/tasks/{task_id}/events")
+async def get_task_events(
+    task_id: str,
+    last_event_id: Optional[int] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> StreamingResponse:
+    """Stream task progress as Server-Sent Events
+
+    Reconnecting clients send ``Last-Event-ID`` (browsers' EventSource does
+    this automatically) and receive only the updates they missed. Tasks the
+    progress tracker does not know (never created or already cleared) and
+    tasks of other users get 404.
+    """
+    if not await task_exists(task_id) or not await _owns_task(task_id, current_user, db):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return StreamingResponse(
+        progress_event_stream(task_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/tasks/{task_id}/trace")
+async def get_task_trace(
+    task_id: str,
+    format: str = Query("timeline", pattern="^(timeline|chrome)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stage timeline of a task
+
+    ``format=chrome`` returns the Trace Event Format instead, which opens in
+    chrome://tracing or Perfetto. Traces of other users' tasks get 404.
+    """
+    timeline = tracer.timeline(task_id)
+    if timeline is None or not await _owns_task(task_id, current_user, db):
+        raise HTTPException(status_code=404, detail="No trace recorded for this task")
+    if format == "chrome":
+        return tracer.trace_events(task_id)
+    return timeline
+
 @router.post("/tasks/{task_id}/cancel")
 async def cancel_task(
     task_id: int,
@@ -0,0 +1,100 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from src.core.config import settings
+from src.utils.profiler import ProfilerBusyError, memory_profiler, sampling_profiler
+from src.utils.shared_state import shared_state
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """只允許持有 ADMIN_TOKEN 的請求；未設定 ADMIN_TOKEN 時整組介面停用"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# 每個請求只會剖析處理它的那一個 worker，回應中附上 worker_id 以便辨識
+# 擷取快照、比較快照、等待取樣執行緒結束都可能耗時數秒，這些介面以一般函式宣告，
+# 由執行緒池執行，不阻塞正在被剖析的事件迴圈
+router = APIRouter(prefix="/api/admin/profile", dependencies=[Depends(require_admin)], include_in_schema=False)
+
+@router.post("/cpu/start")
+async def start_cpu_profile(
+    seconds: float = Query(30, gt=0),
+    interval: Optional[float] = Query(None, gt=0, le=1)
+):
+    """在本 worker 上啟動取樣剖析，seconds 秒後自動停止"""
+    try:
+        sampling_profiler.start(seconds, interval)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"worker_id": shared_state.worker_id, **sampling_profiler.status()}
+
+@router.post("/cpu/stop")
+def stop_cpu_profile():
+    """提前停止取樣剖析"""
+    sampling_profiler.stop()
+    return {"worker_id": shared_state.worker_id, **sampling_profiler.status()}
+
+@router.get("/cpu")
+async def get_cpu_profile(top: int = Query(20, ge=1, le=200)):
+    """取樣狀態與最常出現的函式"""
+    return {"worker_id": shared_state.worker_id, **sampling_profiler.status(top)}
+
+@router.get("/cpu/flamegraph", response_class=PlainTextResponse)
+def download_flamegraph():
+    """下載 folded stack 格式的取樣結果（flamegraph.pl、speedscope 可讀取）"""
+    filename = f"profile-{shared_state.worker_id}.folded"
+    return PlainTextResponse(
+        sampling_profiler.folded(),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/memory/start")
+async def start_memory_profile(frames: Optional[int] = Query(None, ge=1, le=100)):
+    """啟動 tracemalloc（追蹤期間每次配置記憶體都有額外成本）"""
+    try:
+        memory_profiler.start(frames)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"worker_id": shared_state.worker_id, "tracing": True}
+
+@router.post("/memory/stop")
+def stop_memory_profile():
+    """停止 tracemalloc 並清除快照"""
+    memory_profiler.stop()
+    return {"worker_id": shared_state.worker_id, "tracing": False}
+
+@router.post("/memory/snapshot")
+def take_memory_snapshot():
+    """擷取記憶體快照"""
+    try:
+        return {"worker_id": shared_state.worker_id, **memory_profiler.snapshot()}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/memory/snapshots/{snapshot_id}")
+def get_memory_snapshot(
+    snapshot_id: int,
+    limit: int = Query(20, ge=1, le=500),
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """單一快照中配置最多記憶體的位置"""
+    try:
+        return memory_profiler.top(snapshot_id, limit, key_type)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+@router.get("/memory/diff")
+def diff_memory_snapshots(
+    from_id: int = Query(..., alias="from"),
+    to_id: int = Query(..., alias="to"),
+    limit: int = Query(20, ge=1, le=500),
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """兩個快照之間增加最多的配置位置"""
+    try:
+        return memory_profiler.diff(from_id, to_id, limit, key_type)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
@@ -1,25 +1,38 @@
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Request
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 import os
 from pydantic import BaseModel, Field, field_validator
 import json
 from datetime import datetime
 import uuid
+import time
+import asyncio
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from fastapi import Query
 
-from src.config.logging import logger
+from src.config.logging import get_logger
+from src.utils.audio_probe import AudioInfo, probe_stream
 from src.utils.file_manager import file_manager
 from src.utils.error_handler import handle_error, ErrorHandler, FileValidationError
 from src.models.task import Task, TaskResponse, TaskStatus
 from src.models.user import User
-from src.services.voice_service import voice_service
+from src.services.voice_service import PROCESSING_KIND, PROCESSING_STEPS, voice_service
+from src.utils.progress_tracker import progress_tracker
 from src.models.base import get_db
 from src.core.config import settings
+from src.utils.metrics import metrics
+from src.utils.tracing import propagate, stage, tracer
 
 from src.models.error_history import CorrectionHistory
 
+logger = get_logger(__name__)
+
+# 以 rate(upload_bytes_total[1m]) 取得每秒上傳位元組數
+UPLOAD_BYTES = metrics.counter("upload_bytes_total", "Bytes received by upload endpoints", ("endpoint",))
+
 router = APIRouter()
 
 class DummyUser:
@@ -62,8 +75,22 @@ class ProcessingParams(BaseModel):
 class BatchDownloadRequest(BaseModel):
     task_ids: List[str]
 
-# 假設有一個全域 dict 儲存進度（實際可用資料庫或 redis）
-UPLOAD_PROGRESS = {}
+class BatchUploadFailure(BaseModel):
+    """批次上傳中未能建立任務的檔案"""
+    filename: str
+    error: str
+
+class BatchUploadResult(BaseModel):
+    """批次上傳部分成功時的回應"""
+    tasks: List[TaskResponse]
+    failed: List[BatchUploadFailure]
+
+async def _set_upload_progress(task_id: str, progress: int, message: str, final_status: Optional[str] = None) -> None:
+    """透過進度追蹤器發佈上傳進度，訂閱該任務的 WebSocket 會即時收到"""
+    if final_status:
+        await progress_tracker.complete_task(task_id, status=final_status, details={"message": message})
+    else:
+        await progress_tracker.update_progress(task_id, progress, details={"message": message})
 
 @router.post("/upload/preview", response_model=dict)
 async def preview_file(
@@ -98,33 +125,44 @@ async def preview_file(
         handle_error(e, "Error during file preview")
 
 @router.post("/upload")
-async def upload_file(request: Request, file: UploadFile = File(...)):
+async def upload_file(request: Request, file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
     form = await request.form()
     task_id = form.get('task_id')
+    if not task_id:
+        return await _receive_upload(file, task_id, current_user.id)
+    # 以任務 ID 追蹤此次上傳各階段的耗時
+    with tracer.trace(task_id, "upload", filename=file.filename):
+        return await _receive_upload(file, task_id, current_user.id)
+
+async def _receive_upload(file: UploadFile, task_id: Optional[str], user_id: Any):
+    """接收並儲存上傳的檔案，同時推送進度；進度紀錄屬於上傳的使用者"""
     if task_id:
-        UPLOAD_PROGRESS[task_id] = {"progress": 0, "status": "開始上傳…"}
+        await progress_tracker.create_task(task_id, total_steps=100, user_id=user_id, kind="upload")
+        await _set_upload_progress(task_id, 0, "開始上傳…")
     try:
         # 檢查檔案大小
         file_size = 0
         chunk_size = 1024 * 1024  # 1MB
-        while chunk := await file.read(chunk_size):
-            file_size += len(chunk)
-            if task_id:
-                UPLOAD_PROGRESS[task_id] = {"progress": min(90, int(file_size / (1024*1024*10) * 90)), "status": "處理中…"}
-            if file_size > settings.MAX_FILE_SIZE:
-                error_handler = ErrorHandler()
-                error_handler.record_error(
-                    file_path=file.filename if file else None,
-                    error_type="upload",
-                    error_message="檔案大小超過限制",
-                    correction_status="failed"
-                )
+        with stage("upload.receive"):
+            while chunk := await file.read(chunk_size):
+                file_size += len(chunk)
+                UPLOAD_BYTES.inc(len(chunk), endpoint="upload")
                 if task_id:
-                    UPLOAD_PROGRESS[task_id] = {"progress": 100, "status": "檔案過大，失敗"}
-                return {
-                    "success": False,
-                    "message": "檔案大小超過限制"
-                }
+                    await _set_upload_progress(task_id, min(90, int(file_size / (1024*1024*10) * 90)), "處理中…")
+                if file_size > settings.MAX_FILE_SIZE:
+                    error_handler = ErrorHandler()
+                    error_handler.record_error(
+                        file_path=file.filename if file else None,
+                        error_type="upload",
+                        error_message="檔案大小超過限制",
+                        correction_status="failed"
+                    )
+                    if task_id:
+                        await _set_upload_progress(task_id, 100, "檔案過大，失敗", final_status="failed")
+                    return {
+                        "success": False,
+                        "message": "檔案大小超過限制"
+                    }
         # 檢查檔案類型
         if not file.content_type.startswith('audio/'):
             error_handler = ErrorHandler()
@@ -135,32 +173,51 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
                 correction_status="failed"
             )
             if task_id:
-                UPLOAD_PROGRESS[task_id] = {"progress": 100, "status": "檔案類型錯誤"}
+                await _set_upload_progress(task_id, 100, "檔案類型錯誤", final_status="failed")
             return {
                 "success": False,
                 "message": "只接受音訊檔案"
             }
+        # 由檔頭確認內容真的是音訊，改副檔名的檔案在這裡就被拒絕
+        await file.seek(0)  # 重置檔案指標
+        try:
+            with stage("upload.probe"):
+                audio_info = await asyncio.to_thread(probe_stream, file.file)
+        except FileValidationError as e:
+            error_handler = ErrorHandler()
+            error_handler.record_error(
+                file_path=file.filename if file else None,
+                error_type="upload",
+                error_message=f"無法辨識的音訊格式：{e.message}",
+                correction_status="failed"
+            )
+            if task_id:
+                await _set_upload_progress(task_id, 100, "檔案格式錯誤", final_status="failed")
+            return {
+                "success": False,
+                "message": "無法辨識的音訊格式"
+            }
         # 儲存檔案
         file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
-        await file.seek(0)  # 重置檔案指標
-        with open(file_path, "wb") as f:
-            while chunk := await file.read(chunk_size):
-                f.write(chunk)
+        with stage("upload.save"):
+            await file_manager.save_upload_to(file, file_path)
         # 只記錄成功的 error history，不寫 correction history
-        error_handler = ErrorHandler()
-        error_handler.record_error(
-            file_path=file_path,
-            error_type="upload",
-            error_message="檔案上傳成功",
-            correction_status="成功"
-        )
+        with stage("upload.record"):
+            error_handler = ErrorHandler()
+            error_handler.record_error(
+                file_path=file_path,
+                error_type="upload",
+                error_message="檔案上傳成功",
+                correction_status="成功"
+            )
         if task_id:
-            UPLOAD_PROGRESS[task_id] = {"progress": 100, "status": "處理完成！"}
+            await _set_upload_progress(task_id, 100, "處理完成！", final_status="completed")
         print('[API 回傳]', {"success": True, "message": "上傳成功！", "correction_message": "處理中..."})
         return {
             "success": True,
             "message": "上傳成功！",
-            "correction_message": "處理中..."
+            "correction_message": "處理中...",
+            "audio_info": audio_info.to_dict()
         }
     except HTTPException as e:
         error_handler = ErrorHandler()
@@ -171,7 +228,7 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
             correction_status="failed"
         )
         if task_id:
-            UPLOAD_PROGRESS[task_id] = {"progress": 100, "status": "處理失敗"}
+            await _set_upload_progress(task_id, 100, "處理失敗", final_status="failed")
         raise HTTPException(
             status_code=e.status_code,
             detail=str(e.detail)
@@ -185,7 +242,7 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
             correction_status="failed"
         )
         if task_id:
-            UPLOAD_PROGRESS[task_id] = {"progress": 100, "status": "處理失敗"}
+            await _set_upload_progress(task_id, 100, "處理失敗", final_status="failed")
         raise HTTPException(
             status_code=500,
             detail="處理失敗"
@@ -219,7 +276,21 @@ async def batch_download(
     except Exception as e:
         handle_error(e, "Error during batch download")
 
-@router.post("/upload/batch", response_model=List[TaskResponse])
+async def _ingest_batch_file(file: UploadFile, semaphore: asyncio.Semaphore) -> Tuple[str, AudioInfo, float, float]:
+    """驗證並儲存批次中的一個檔案，回傳路徑、格式與上傳階段的起點及耗時"""
+    async with semaphore:
+        started, start_clock = time.time(), time.perf_counter()
+        # 大小、副檔名與檔頭檢查及寫檔都是阻塞 I/O，交給執行緒以便多個檔案同時進行
+        audio_info = await asyncio.to_thread(file_manager.validate_file, file)
+        file_path = await file_manager.save_upload_file(file)
+        UPLOAD_BYTES.inc(os.path.getsize(file_path), endpoint="batch")
+        return file_path, audio_info, started, time.perf_counter() - start_clock
+
+@router.post(
+    "/upload/batch",
+    response_model=List[TaskResponse],
+    responses={207: {"model": BatchUploadResult, "description": "部分檔案失敗"}}
+)
 async def upload_batch(
     files: List[UploadFile] = File(...),
     parameters: Optional[str] = None,
@@ -227,7 +298,12 @@ async def upload_batch(
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """批次上傳多個檔案進行處理"""
+    """批次上傳多個檔案進行處理
+
+    各檔案以 ``UPLOAD_BATCH_CONCURRENCY`` 為上限同時驗證與儲存，所有任務以一個
+    INSERT 寫入。全部成功時回傳任務列表；部分失敗時回傳 207 與
+    ``{"tasks": [...], "failed": [...]}``；全部失敗時回傳 400。
+    """
     try:
         # 解析處理參數
         try:
@@ -237,53 +313,79 @@ async def upload_batch(
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         
-        tasks = []
-        for file in files:
-            # 驗證檔案類型
-            if not file.filename.lower().endswith(('.wav', '.mp3')):
-                raise HTTPException(status_code=400, detail=f"File {file.filename} is not a valid audio file")
-            
-            # 驗證檔案大小
-            file_size = 0
-            chunk_size = 1024 * 1024  # 1MB
-            while chunk := await file.read(chunk_size):
-                file_size += len(chunk)
-                if file_size > settings.MAX_FILE_SIZE:
-                    raise HTTPException(status_code=400, detail=f"File {file.filename} exceeds {settings.MAX_FILE_SIZE/1024/1024}MB limit")
-            
-            # 重置檔案指針
-            await file.seek(0)
-            
-            # 保存檔案
-            file_path = await file_manager.save_upload_file(file)
-            
-            # 創建任務
-            task = Task(
-                user_id=current_user.id,
-                status=TaskStatus.PENDING,
-                input_file=file_path,
-                processing_params=params.model_dump(),
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
-                completed_at=None
+        semaphore = asyncio.Semaphore(settings.UPLOAD_BATCH_CONCURRENCY)
+        results = await asyncio.gather(
+            *(_ingest_batch_file(file, semaphore) for file in files), return_exceptions=True
+        )
+        
+        rows = []
+        upload_spans = []
+        failed = []
+        processing_params = params.model_dump()
+        for file, result in zip(files, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, FileValidationError):
+                    logger.error(f"Error saving batch file {file.filename}: {str(result)}")
+                failed.append(BatchUploadFailure(filename=file.filename, error=str(result)))
+                continue
+            file_path, audio_info, started, duration = result
+            now = datetime.utcnow()
+            rows.append({
+                "user_id": current_user.id,
+                "status": TaskStatus.PENDING.value,
+                "input_file": file_path,
+                "processing_params": processing_params,
+                "audio_info": audio_info.to_dict(),
+                "progress": 0.0,
+                "created_at": now,
+                "updated_at": now
+            })
+            upload_spans.append((file.filename, started, duration))
+        if not rows:
+            raise HTTPException(status_code=400, detail=[failure.model_dump() for failure in failed])
+        
+        # 所有任務以一個多列 INSERT 寫入；RETURNING 的順序不保證，以唯一的儲存路徑對回 ID
+        try:
+            inserted = db.execute(insert(Task).returning(Task.id, Task.input_file), rows)
+            ids = {input_file: task_id for task_id, input_file in inserted}
+            db.commit()
+        except Exception:
+            db.rollback()
+            # 任務沒有建立，已儲存的檔案不再有人引用
+            for row in rows:
+                file_manager.delete_file(row["input_file"])
+            raise
+        responses = [TaskResponse.model_validate({**row, "id": ids[row["input_file"]]}) for row in rows]
+        for response, (filename, started, duration) in zip(responses, upload_spans):
+            # 任務 ID 在寫入後才確定，上傳階段於此補記
+            tracer.record(response.id, "upload", started, duration, filename=filename)
+            # 排隊中的任務也有進度紀錄，ETA 取自同類任務的歷史耗時
+            await progress_tracker.create_task(
+                str(response.id), PROCESSING_STEPS, user_id=current_user.id, kind=PROCESSING_KIND
             )
-            db.add(task)
-            tasks.append(task)
-            # 在背景處理檔案
+            # 在背景處理檔案，追蹤延續到背景工作
             if background_tasks:
-                background_tasks.add_task(voice_service.process_audio, file_path, params.model_dump())
-        db.commit()
-        for task in tasks:
-            db.refresh(task)
-        # 修正回傳格式
-        return [TaskResponse.model_validate(task) for task in tasks]
+                background_tasks.add_task(
+                    propagate(voice_service.process_audio, response.id),
+                    response.input_file, processing_params, response.audio_info,
+                    task_id=response.id, user_id=current_user.id
+                )
+        if failed:
+            return JSONResponse(
+                status_code=207,
+                content=jsonable_encoder(BatchUploadResult(tasks=responses, failed=failed))
+            )
+        return responses
     except HTTPException:
         raise
     except Exception as e:
         handle_error(e, "Error during batch upload")
 
 @router.get("/upload_status")
-def upload_status(task_id: str = Query(...)):
-    # 這裡僅為範例，實際應根據 task_id 查詢進度
-    progress = UPLOAD_PROGRESS.get(task_id, {"progress": 0, "status": "處理中…"})
-    return JSONResponse(content=progress)
+async def upload_status(task_id: str = Query(...)):
+    """舊版輪詢介面；新客戶端請透過 /ws/{client_id} 訂閱 subscribe_task"""
+    try:
+        task = await progress_tracker.get_task_status(task_id)
+    except KeyError:
+        return JSONResponse(content={"progress": 0, "status": "處理中…"})
+    return JSONResponse(content={"progress": task["progress"], "status": task["details"].get("message", task["status"])})
@@ -0,0 +1,106 @@
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import json
+
+from src.core.config import settings
+from src.config.logging import logger
+from src.utils.progress_bus import progress_bus, task_topic
+from src.utils.progress_tracker import progress_tracker, TERMINAL_STATUSES
+
+class EventStreamSubscriber:
+    """Progress bus subscriber that buffers messages for one SSE response
+
+    If the client falls so far behind that the buffer fills up, further
+    messages are dropped and the stream resynchronizes with a full snapshot.
+    """
+
+    def __init__(self, max_queue: Optional[int] = None):
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue or settings.WS_SEND_QUEUE_SIZE)
+        self.lagged = False
+
+    async def send_text(self, text: str) -> None:
+        """Buffer a message published on the bus"""
+        if self._queue.full():
+            self.lagged = True
+            return
+        self._queue.put_nowait(text)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next buffered message, or None if none arrived within ``timeout``"""
+        try:
+            return json.loads(await asyncio.wait_for(self._queue.get(), timeout))
+        except asyncio.TimeoutError:
+            return None
+
+    def clear(self) -> None:
+        """Drop buffered messages after falling behind"""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self.lagged = False
+
+def format_event(payload: Dict[str, Any]) -> str:
+    """Encode a progress message as an SSE event whose id is its ``seq``"""
+    return f"id: {payload['seq']}\nevent: progress\ndata: {json.dumps(payload)}\n\n"
+
+async def _snapshot_events(task_id: str) -> list:
+    """Full state of a task as a one-event list, or nothing if it does not exist yet"""
+    try:
+        return [await progress_tracker.full_payload(task_id)]
+    except KeyError:
+        return []
+
+async def task_exists(task_id: str) -> bool:
+    """Whether the tracker (on any worker) still has the task and its buffered events"""
+    return bool(await _snapshot_events(task_id))
+
+async def _published_status(task_id: str) -> Optional[str]:
+    """Status of a task as of its latest published message"""
+    snapshot = await _snapshot_events(task_id)
+    return snapshot[0]["status"] if snapshot else None
+
+async def progress_event_stream(task_id: str, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+    """Stream a task's progress as SSE events until it reaches a terminal status
+
+    A client resuming with ``Last-Event-ID`` gets the buffered messages it
+    missed; if they are no longer buffered it gets a full snapshot instead.
+    The stream also ends if the task is cleared from the tracker.
+    """
+    subscriber = EventStreamSubscriber()
+    # Subscribe before reading the backlog so no message falls in between
+    progress_bus.subscribe(task_topic(task_id), subscriber)
+    try:
+        backlog = None
+        if last_event_id is not None:
+            backlog = progress_tracker.events_since(task_id, last_event_id)
+        if backlog is None:
+            backlog = await _snapshot_events(task_id)
+
+        last_seq = last_event_id or 0
+        for payload in backlog:
+            yield format_event(payload)
+            last_seq = payload["seq"]
+        status = await _published_status(task_id)
+
+        while status not in TERMINAL_STATUSES:
+            payload = await subscriber.get(settings.SSE_KEEPALIVE_SECONDS)
+            if subscriber.lagged:
+                subscriber.clear()
+                snapshot = await _snapshot_events(task_id)
+                if not snapshot:
+                    break
+                payload = snapshot[0]
+            if payload is None:
+                if not await task_exists(task_id):
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if payload["seq"] <= last_seq and not payload.get("full"):
+                # Already sent as part of the backlog
+                continue
+            yield format_event(payload)
+            last_seq = payload["seq"]
+            status = payload.get("status", status)
+
+    finally:
+        progress_bus.unsubscribe_all(subscriber)
+        logger.debug(f"Closed progress event stream for task {task_id}")
@@ -1,94 +1,501 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set, Tuple, Union
+from collections import defaultdict
 from fastapi import WebSocket, WebSocketDisconnect
 import json
+import struct
+import time
 import asyncio
 
-from src.config.logging import logger
+from src.core.config import settings
+from src.config.logging import get_logger
 from src.utils.progress_tracker import progress_tracker
+from src.utils.progress_bus import progress_bus, user_topic
+from src.utils.shared_state import SharedStateBackend, shared_state
+from src.utils.progress_codec import (
+    COMPACT_SUBPROTOCOL, MAX_INTERNED, define_record, encode_progress, progress_record, reset_record
+)
 from src.utils.error_handler import VoiceCloneError
+from src.api.routes.upload import get_current_user
+
+logger = get_logger(__name__)
+
+class ConnectionClosedError(Exception):
+    """Raised when sending to a connection that has been closed"""
+    pass
+
+class ConnectionLimitError(Exception):
+    """Raised when a new connection would exceed a connection cap"""
+    pass
+
+class ClientConnection:
+    """A WebSocket client with a bounded outbound queue drained by its own writer task
+
+    Senders only enqueue, so a slow client never delays anyone else. When the
+    queue is full the slow-consumer policy either drops the oldest queued
+    message or disconnects the client.
+
+    Progress messages after the first only carry changed fields, so losing
+    one would leave the client with a wrong view of its task. When a dropped
+    message was progress, the task is marked for resync: before writing
+    anything else the writer sends the task's full current state, and skips
+    queued messages for it that the full state already covers.
+
+    Connections that negotiated the compact subprotocol receive progress as
+    binary records; task ids are interned per connection when the record is
+    written, so dropping queued messages never loses a definition.
+    """
+    
+    def __init__(
+        self,
+        websocket: WebSocket,
+        client_id: str,
+        max_queue: Optional[int] = None,
+        policy: Optional[str] = None,
+        user_id: Optional[Any] = None,
+        compact: bool = False,
+        host: Optional[str] = None
+    ):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.user_id = user_id
+        self.host = host
+        self.compact = compact
+        self._interned: Dict[str, int] = {}
+        self.last_seen = time.monotonic()
+        self.policy = policy or settings.WS_SLOW_CONSUMER_POLICY
+        self.closed = False
+        self.dropped = 0
+        # Tasks whose dropped progress must be replaced by a full state, and
+        # the seq each resync covered
+        self._resync: Set[str] = set()
+        self._synced: Dict[str, int] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue or settings.WS_SEND_QUEUE_SIZE)
+        self._writer = asyncio.create_task(self._write_loop())
+    
+    async def send_text(self, text: str) -> None:
+        """Queue a pre-serialized message without waiting for the client"""
+        await self._enqueue(text)
+    
+    async def send_progress(self, task_id: str, body: bytes) -> None:
+        """Queue a compact-encoded progress message for a task"""
+        await self._enqueue((task_id, body))
+    
+    async def _enqueue(self, item: Union[str, Tuple[str, bytes]]) -> None:
+        """Queue an outbound item, applying the slow-consumer policy when full"""
+        if self.closed:
+            raise ConnectionClosedError(f"Connection {self.client_id} is closed")
+        
+        if self._queue.full():
+            if self.policy == "disconnect":
+                logger.warning(f"Disconnecting slow WebSocket client: {self.client_id}")
+                await self.close(code=1008)
+                raise ConnectionClosedError(f"Connection {self.client_id} is too slow")
+            # drop_oldest: the newest state is worth more than a stale one
+            dropped = _progress_key(self._queue.get_nowait())
+            self.dropped += 1
+            if dropped is not None:
+                self._resync.add(dropped[0])
+        
+        self._queue.put_nowait(item)
+    
+    async def send_json(self, message: Dict[str, Any]) -> None:
+        """Serialize and queue a message"""
+        await self.send_text(json.dumps(message))
+    
+    def _progress_frame(self, task_id: str, body: bytes) -> bytes:
+        """Binary message for a progress body, defining the task's index on first use"""
+        prefix = b""
+        index = self._interned.get(task_id)
+        if index is None:
+            if len(self._interned) >= MAX_INTERNED:
+                self._interned.clear()
+                prefix = reset_record()
+            index = len(self._interned)
+            self._interned[task_id] = index
+            prefix += define_record(index, task_id)
+        return prefix + progress_record(index, body)
+    
+    def touch(self) -> None:
+        """Record that the client is alive"""
+        self.last_seen = time.monotonic()
+    
+    @property
+    def idle_seconds(self) -> float:
+        """Seconds since the client was last heard from"""
+        return time.monotonic() - self.last_seen
+    
+    @property
+    def pending(self) -> int:
+        """Messages queued but not yet written"""
+        return self._queue.qsize()
+    
+    async def _write_loop(self) -> None:
+        """Drain the queue to the socket in order, resyncing tasks that lost messages"""
+        try:
+            while True:
+                item = await self._queue.get()
+                while self._resync:
+                    await self._send_full(self._resync.pop())
+                if self._synced and self._covered(item):
+                    continue
+                await self._write(item)
+                if self._queue.empty():
+                    # Anything published from now on is newer than every resync
+                    self._synced.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending message to client {self.client_id}: {str(e)}")
+            self.closed = True
+            progress_bus.unsubscribe_all(self)
+    
+    async def _write(self, item: Union[str, Tuple[str, bytes]]) -> None:
+        """Write one queued item to the socket"""
+        if isinstance(item, str):
+            await self.websocket.send_text(item)
+        else:
+            await self.websocket.send_bytes(self._progress_frame(*item))
+    
+    async def _send_full(self, task_id: str) -> None:
+        """Write a task's full published state after some of its messages were dropped"""
+        try:
+            payload = await progress_tracker.full_payload(task_id)
+        except KeyError:
+            # Cleared meanwhile; nothing left to resync
+            return
+        self._synced[task_id] = payload["seq"]
+        if self.compact:
+            await self._write((task_id, encode_progress(payload)))
+        else:
+            await self._write(json.dumps(payload))
+    
+    def _covered(self, item: Union[str, Tuple[str, bytes]]) -> bool:
+        """Whether a queued progress message is older than its task's last resync"""
+        key = _progress_key(item)
+        return key is not None and key[0] in self._synced and key[1] <= self._synced[key[0]]
+    
+    async def close(self, code: int = 1000) -> None:
+        """Stop the writer and close the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        progress_bus.unsubscribe_all(self)
+        self._writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            # Socket already gone
+            pass
+
+def _progress_key(item: Union[str, Tuple[str, bytes]]) -> Optional[Tuple[str, int]]:
+    """Task id and seq of a queued progress message, or None for other messages"""
+    if not isinstance(item, str):
+        task_id, body = item
+        return task_id, struct.unpack_from("<I", body)[0]
+    try:
+        message = json.loads(item)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get("type") != "progress" or "task_id" not in message:
+        return None
+    return message["task_id"], message.get("seq", 0)
+
+def _remote_host(websocket: WebSocket) -> str:
+    """Peer address of a socket as seen by the server"""
+    client = getattr(websocket, "client", None)
+    return client.host if client else "unknown"
+
+CONNECTION_NAMESPACE = "connections"
+BROADCAST_CHANNEL = "ws.broadcast"
+DIRECT_CHANNEL = "ws.direct"
 
 class WebSocketManager:
-    """Manager for WebSocket connections"""
+    """Manager for WebSocket connections
+
+    Sockets only exist in the worker that accepted them. With a shared state
+    backend, every worker records which worker holds each client, and
+    broadcasts and messages for clients held elsewhere are forwarded through
+    the backend.
+
+    The manager also enforces global and per-user connection caps, plus an
+    optional per-host cap, and a heartbeat task pings clients and reaps
+    connections that went quiet or whose writer failed.
+    """
     
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+    def __init__(self, state: Optional[SharedStateBackend] = None):
+        self.active_connections: Dict[str, ClientConnection] = {}
+        self._user_connections: Dict[Any, Set[str]] = defaultdict(set)
+        self._host_connections: Dict[str, Set[str]] = defaultdict(set)
+        self._stats = {"accepted": 0, "rejected": 0, "reaped": 0, "peak": 0}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._state = state if state is not None else shared_state
+        self._state.subscribe(BROADCAST_CHANNEL, self._deliver_broadcast)
+        self._state.subscribe(DIRECT_CHANNEL, self._deliver_direct)
     
-    async def connect(self, websocket: WebSocket, client_id: str) -> None:
-        """Connect a new WebSocket client"""
-        await websocket.accept()
-        self.active_connections[client_id] = websocket
+    async def connect(self, websocket: WebSocket, client_id: str, user_id: Optional[Any] = None) -> ClientConnection:
+        """Connect a new WebSocket client
+
+        ``user_id`` is the authenticated user, whose task progress the client
+        may subscribe to and whose cap the connection counts against. Raises
+        ConnectionLimitError, after refusing the handshake, if the global, the
+        user's or (when enabled) the remote host's cap is reached. A reconnect
+        with the same ``client_id`` closes and replaces the old connection,
+        and does not count twice against a cap it already holds. Clients
+        requesting the ``progress.compact.v1`` subprotocol get binary progress
+        frames; everything else stays JSON.
+        """
+        host = _remote_host(websocket)
+        reason = self._limit_reason(client_id, user_id, host)
+        if reason:
+            self._stats["rejected"] += 1
+            await websocket.close(code=1013)
+            raise ConnectionLimitError(f"Rejected WebSocket client {client_id}: {reason}")
+        
+        replaced = self.active_connections.get(client_id)
+        if replaced is not None:
+            self.disconnect(client_id, replaced)
+            await replaced.close(code=1000)
+        
+        compact = COMPACT_SUBPROTOCOL in websocket.scope.get("subprotocols", ())
+        if compact:
+            await websocket.accept(subprotocol=COMPACT_SUBPROTOCOL)
+        else:
+            await websocket.accept()
+        connection = ClientConnection(websocket, client_id, user_id=user_id, compact=compact, host=host)
+        self.active_connections[client_id] = connection
+        if user_id is not None:
+            self._user_connections[user_id].add(client_id)
+        self._host_connections[host].add(client_id)
+        self._stats["accepted"] += 1
+        self._stats["peak"] = max(self._stats["peak"], len(self.active_connections))
+        if self._state.shared:
+            self._state.set(CONNECTION_NAMESPACE, client_id, {
+                "worker_id": self._state.worker_id,
+                "connected_at": time.time()
+            })
         logger.info(f"WebSocket client connected: {client_id}")
+        return connection
     
-    def disconnect(self, client_id: str) -> None:
-        """Disconnect a WebSocket client"""
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-            logger.info(f"WebSocket client disconnected: {client_id}")
+    def disconnect(self, client_id: str, connection: Optional[ClientConnection] = None) -> None:
+        """Disconnect a WebSocket client
+
+        When ``connection`` is given, only remove it if it is still the active
+        connection for ``client_id`` (a reconnect may have replaced it).
+        """
+        current = self.active_connections.get(client_id)
+        if current is None or (connection is not None and current is not connection):
+            return
+        del self.active_connections[client_id]
+        progress_bus.unsubscribe_all(current)
+        for index, key in ((self._user_connections, current.user_id), (self._host_connections, current.host)):
+            clients = index.get(key)
+            if clients is not None:
+                clients.discard(client_id)
+                if not clients:
+                    del index[key]
+        if self._state.shared:
+            self._state.delete(CONNECTION_NAMESPACE, client_id)
+        logger.info(f"WebSocket client disconnected: {client_id}")
     
     async def send_message(self, client_id: str, message: Dict[str, Any]) -> None:
-        """Send message to a specific client"""
-        if client_id in self.active_connections:
+        """Send message to a specific client, wherever it is connected"""
+        connection = self.active_connections.get(client_id)
+        if connection:
             try:
-                await self.active_connections[client_id].send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending message to client {client_id}: {str(e)}")
-                self.disconnect(client_id)
+                await connection.send_json(message)
+            except ConnectionClosedError:
+                self.disconnect(client_id, connection)
+        elif self._state.shared and await self._state.aget(CONNECTION_NAMESPACE, client_id) is not None:
+            self._state.publish(DIRECT_CHANNEL, {"client_id": client_id, "message": message})
     
     async def broadcast(self, message: Dict[str, Any]) -> None:
-        """Broadcast message to all connected clients"""
-        disconnected_clients = []
+        """Broadcast message to all connected clients
+
+        The payload is serialized once and queued on every connection; each
+        connection's writer task delivers it independently.
+        """
+        if self._state.shared:
+            self._state.publish(BROADCAST_CHANNEL, message)
+        await self._deliver_broadcast(message)
+    
+    async def _deliver_broadcast(self, message: Dict[str, Any]) -> None:
+        """Queue a broadcast message on every connection held by this worker"""
+        text = json.dumps(message)
+        for client_id, connection in list(self.active_connections.items()):
+            try:
+                await connection.send_text(text)
+            except ConnectionClosedError:
+                self.disconnect(client_id, connection)
+    
+    async def _deliver_direct(self, message: Dict[str, Any]) -> None:
+        """Deliver a message another worker forwarded to a client held here"""
+        if message["client_id"] in self.active_connections:
+            await self.send_message(message["client_id"], message["message"])
+    
+    def _limit_reason(self, client_id: str, user_id: Optional[Any], host: str) -> Optional[str]:
+        """Why a new connection would exceed a cap, or None if it fits
+
+        A connection replacing ``client_id`` frees that client's slot, so it
+        only counts against the caps it does not already hold. The host cap
+        is off when ``WS_MAX_CONNECTIONS_PER_HOST`` is 0, since every client
+        behind a reverse proxy or NAT shares one address.
+        """
+        replaced = self.active_connections.get(client_id)
+        if replaced is None and len(self.active_connections) >= settings.WS_MAX_CONNECTIONS:
+            return "server connection limit reached"
+        if user_id is not None and not (replaced is not None and replaced.user_id == user_id):
+            if len(self._user_connections.get(user_id, ())) >= settings.WS_MAX_CONNECTIONS_PER_USER:
+                return f"connection limit reached for user {user_id}"
+        host_cap = settings.WS_MAX_CONNECTIONS_PER_HOST
+        if host_cap and not (replaced is not None and replaced.host == host):
+            if len(self._host_connections.get(host, ())) >= host_cap:
+                return f"connection limit reached for host {host}"
+        return None
+    
+    async def check_connections(self) -> int:
+        """Reap idle or broken connections and ping the rest; returns the number reaped"""
+        reaped = 0
+        ping = json.dumps({"type": "ping"})
+        for client_id, connection in list(self.active_connections.items()):
+            if not connection.closed and connection.idle_seconds <= settings.WS_IDLE_TIMEOUT:
+                try:
+                    await connection.send_text(ping)
+                    continue
+                except ConnectionClosedError:
+                    pass
+            await self.reap(client_id, connection)
+            reaped += 1
         
-        for client_id, websocket in self.active_connections.items():
+        if reaped:
+            logger.info(f"Reaped {reaped} idle WebSocket connections")
+        return reaped
+    
+    async def reap(self, client_id: str, connection: ClientConnection) -> None:
+        """Drop an idle or broken connection"""
+        self.disconnect(client_id, connection)
+        await connection.close(code=1001)
+        self._stats["reaped"] += 1
+    
+    async def _heartbeat_loop(self) -> None:
+        """Periodically ping clients and reap dead connections"""
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
             try:
-                await websocket.send_json(message)
+                await self.check_connections()
             except Exception as e:
-                logger.error(f"Error broadcasting to client {client_id}: {str(e)}")
-                disconnected_clients.append(client_id)
-        
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
+                logger.error(f"Error during WebSocket heartbeat: {str(e)}")
+    
+    def start(self) -> None:
+        """Start the heartbeat task"""
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+    
+    async def stop(self) -> None:
+        """Stop the heartbeat task"""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+    
+    def metrics(self) -> Dict[str, int]:
+        """Counters for open sockets on this worker"""
+        connections = list(self.active_connections.values())
+        return {
+            "open": len(connections),
+            "users": len(self._user_connections),
+            "hosts": len(self._host_connections),
+            "queued_messages": sum(connection.pending for connection in connections),
+            "dropped_messages": sum(connection.dropped for connection in connections),
+            **self._stats
+        }
+    
+    async def connected_clients(self) -> Dict[str, Any]:
+        """Connected client ids across all workers, with the worker holding each"""
+        if self._state.shared:
+            return await self._state.aitems(CONNECTION_NAMESPACE)
+        return {client_id: {"worker_id": self._state.worker_id} for client_id in self.active_connections}
 
 # Create global instance
 websocket_manager = WebSocketManager()
 
 async def handle_websocket(websocket: WebSocket, client_id: str) -> None:
-    """Handle WebSocket connection"""
+    """Handle WebSocket connection
+
+    The connection belongs to the user the request authenticates as, the
+    same as for HTTP routes, and may only subscribe to that user's tasks,
+    one at a time with ``subscribe_task`` or all at once with
+    ``subscribe_user``. Any message, including a ``pong`` answer to the
+    server's ``ping``, keeps the connection alive.
+    """
+    connection = None
     try:
-        await websocket_manager.connect(websocket, client_id)
-        
-        # Register for task progress updates
-        await progress_tracker.register_websocket(client_id, websocket)
+        connection = await websocket_manager.connect(websocket, client_id, user_id=get_current_user().id)
         
         while True:
             try:
-                # Wait for messages from client
-                data = await websocket.receive_text()
+                # Wait for messages from client; silence past the idle timeout means a dead peer
+                data = await asyncio.wait_for(websocket.receive_text(), settings.WS_IDLE_TIMEOUT)
+                connection.touch()
                 message = json.loads(data)
                 
                 # Handle different message types
                 if message["type"] == "subscribe_task":
+                    # Only tasks of the connection's own user; a task that does
+                    # not exist yet may be followed until it is created for
+                    # someone else
                     task_id = message["task_id"]
-                    await progress_tracker.register_websocket(task_id, websocket)
+                    if not progress_tracker.may_follow(await progress_tracker.owner(task_id), connection.user_id):
+                        await connection.send_json({
+                            "type": "error",
+                            "message": f"Not allowed to subscribe to task {task_id}"
+                        })
+                        continue
+                    await progress_tracker.register_websocket(task_id, connection)
                 
                 elif message["type"] == "unsubscribe_task":
                     task_id = message["task_id"]
-                    await progress_tracker.unregister_websocket(task_id)
+                    await progress_tracker.unregister_websocket(task_id, connection)
+                
+                elif message["type"] == "subscribe_user":
+                    # Only the connection's own user's tasks
+                    if str(message["user_id"]) != str(connection.user_id):
+                        await connection.send_json({
+                            "type": "error",
+                            "message": f"Not allowed to subscribe to user {message['user_id']}"
+                        })
+                        continue
+                    await progress_tracker.register_user_websocket(connection.user_id, connection)
+                
+                elif message["type"] == "unsubscribe_user":
+                    progress_bus.unsubscribe(user_topic(connection.user_id), connection)
                 
                 elif message["type"] == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    await connection.send_json({"type": "pong"})
                 
+            except asyncio.TimeoutError:
+                logger.info(f"Closing idle WebSocket client: {client_id}")
+                await websocket_manager.reap(client_id, connection)
+                break
             except WebSocketDisconnect:
                 break
+            except ConnectionClosedError:
+                break
             except Exception as e:
                 logger.error(f"Error handling WebSocket message: {str(e)}")
-                await websocket.send_json({
+                await connection.send_json({
                     "type": "error",
                     "message": str(e)
                 })
     
+    except ConnectionLimitError as e:
+        logger.warning(str(e))
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
     
     finally:
-        websocket_manager.disconnect(client_id)
-        await progress_tracker.unregister_websocket(client_id)
+        if connection:
+            websocket_manager.disconnect(client_id, connection)
+            await connection.close()
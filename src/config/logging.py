@@ -1,37 +1,133 @@
+import atexit
+import json
 import logging
 import logging.handlers
-import os
+import queue
 from pathlib import Path
+from typing import Dict, Optional
 
 from src.core.config import settings
 
-def setup_logging():
-    """Setup logging configuration"""
-    # Create logs directory if it doesn't exist
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every N records below WARNING from configured loggers
+
+    ``rates`` maps a logger name to the fraction of records to keep; it also
+    applies to the logger's children. Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self._intervals = {name: round(1 / rate) if rate > 0 else 0 for name, rate in rates.items()}
+        self._resolved: Dict[str, Optional[str]] = {}
+        self._counters: Dict[str, int] = {}
+
+    def _configured_name(self, name: str) -> Optional[str]:
+        """Closest configured ancestor of a logger name (cached)"""
+        if name not in self._resolved:
+            candidate = name
+            while candidate and candidate not in self._intervals:
+                candidate = candidate.rpartition(".")[0]
+            self._resolved[name] = candidate or None
+        return self._resolved[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self._intervals:
+            return True
+        name = self._configured_name(record.name)
+        if name is None:
+            return True
+        interval = self._intervals[name]
+        if interval <= 1:
+            return interval == 1
+        count = self._counters.get(name, 0)
+        self._counters[name] = count + 1
+        return count % interval == 0
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def _output_handlers() -> list:
+    """File and console handlers run by the listener thread"""
     log_dir = Path(settings.LOG_FILE).parent
     log_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Create formatters
-    formatter = logging.Formatter(settings.LOG_FORMAT)
-    
-    # Create handlers
+
+    formatter = JsonFormatter() if settings.LOG_JSON else logging.Formatter(settings.LOG_FORMAT)
+
     file_handler = logging.handlers.RotatingFileHandler(
         settings.LOG_FILE,
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5
     )
     file_handler.setFormatter(formatter)
-    
+
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    
-    # Setup root logger
+    return [file_handler, console_handler]
+
+def stop_logging() -> None:
+    """Detach the queue handler, flush queued records and stop the listener thread"""
+    global _listener
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def setup_logging():
+    """Setup logging configuration
+
+    Loggers only enqueue records through a single QueueHandler on the root
+    logger; a listener thread formats and writes them, so the event loop
+    never waits on disk or console I/O. Calling it again replaces the
+    previous pipeline. Importing this module does not call it: the
+    application does at startup, so imports create no log directory, file
+    or thread.
+    """
+    global _queue_handler, _listener
+
     root_logger = logging.getLogger()
+    stop_logging()
+
+    log_queue: queue.Queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+    _listener = logging.handlers.QueueListener(log_queue, *_output_handlers(), respect_handler_level=True)
+    _listener.start()
+
+    # Setup root logger
     root_logger.setLevel(settings.LOG_LEVEL)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    
-    # Setup specific loggers
+    root_logger.addHandler(_queue_handler)
+
+    # Named loggers propagate to the root handler instead of writing themselves
     loggers = [
         "uvicorn",
         "uvicorn.access",
@@ -39,14 +135,27 @@ def setup_logging():
         "fastapi",
         "src"
     ]
-    
+
     for logger_name in loggers:
         logger = logging.getLogger(logger_name)
         logger.setLevel(settings.LOG_LEVEL)
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-    
+        logger.handlers.clear()
+        logger.propagate = True
+
     return root_logger
 
-# Create logger instance
-logger = setup_logging()
+def get_logger(name: str) -> logging.Logger:
+    """Named logger, so that LOG_SAMPLE_RATES can target a module"""
+    return logging.getLogger(name)
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+def queue_depth() -> int:
+    """Records waiting for the listener thread"""
+    return _queue_handler.queue.qsize() if _queue_handler is not None else 0
+
+# Root logger; handlers are attached by setup_logging()
+logger = logging.getLogger()
+atexit.register(stop_logging)
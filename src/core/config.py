@@ -1,5 +1,7 @@
+from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Dict, List, Literal
 import os
 
 class Settings(BaseSettings):
@@ -14,11 +16,23 @@ class Settings(BaseSettings):
     PREVIEW_DIR: str = "previews"
     DOWNLOAD_DIR: str = "downloads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    ALLOWED_EXTENSIONS: List[str] = [".wav", ".mp3", ".ogg"]
+    AUDIO_PROBE_BYTES: int = 8192  # 上傳時讀取檔頭的位元組數，用來判斷格式、取樣率、聲道與長度
+    AUDIO_PROBE_MAX_CHUNKS: int = 64  # WAV 在找到 data 區塊前最多走訪的區塊數，超過即拒絕
+    # 儲存上傳與預覽檔案時每次寫入的位元組數（4 KiB 的倍數）；舊名 UPLOAD_WRITE_BUFFER_SIZE 仍可使用
+    FILE_WRITE_BUFFER_SIZE: int = Field(
+        1024 * 1024, validation_alias=AliasChoices("FILE_WRITE_BUFFER_SIZE", "UPLOAD_WRITE_BUFFER_SIZE")
+    )
+    FILE_FSYNC_POLICY: Literal["none", "file", "dir"] = "none"  # none（交給作業系統）、file（檔案寫完即 fsync）或 dir（連同所在目錄一起 fsync）
+    UPLOAD_BATCH_CONCURRENCY: int = 8  # 批次上傳同時驗證與儲存的檔案數
     
     # 日誌設置
     LOG_FILE: str = "logs/app.log"
     LOG_FORMAT: str = "%(asctime)s %(levelname)s %(name)s %(message)s"
     LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False  # 以 JSON 逐行輸出日誌
+    LOG_QUEUE_SIZE: int = 10000  # 日誌佇列上限，滿時丟棄新紀錄而非阻塞
+    LOG_SAMPLE_RATES: Dict[str, float] = {}  # 各 logger 低於 WARNING 的保留比例，如 {"src.utils.progress_tracker": 0.1}
     
     # 數據庫設置
     DATABASE_URL: str = "sqlite:///./voice_clone.db"
@@ -38,12 +52,65 @@ class Settings(BaseSettings):
     CLEANUP_INTERVAL_HOURS: int = 24
     MAX_FILE_AGE_HOURS: int = 24
     
+    # WebSocket 設置
+    WS_SEND_QUEUE_SIZE: int = 100
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"  # drop_oldest 或 disconnect
+    WS_HEARTBEAT_INTERVAL: float = 20.0  # 伺服器送出 ping 的間隔（秒）
+    WS_IDLE_TIMEOUT: float = 60.0  # 超過此時間未收到客戶端任何訊息即中斷（秒）
+    WS_MAX_CONNECTIONS: int = 1000
+    WS_MAX_CONNECTIONS_PER_USER: int = 10  # 每個已驗證使用者的連線上限
+    WS_MAX_CONNECTIONS_PER_HOST: int = 0  # 每個遠端主機的連線上限，0 表示不限制（反向代理後方所有連線共用代理位址）
+    PROGRESS_MIN_INTERVAL: float = 0.25  # 每個任務進度推送的最小間隔（秒）
+    PROGRESS_LOG_INTERVAL: float = 5.0  # 每個任務進度 INFO 日誌的最小間隔（秒）
+    PROGRESS_EVENT_BUFFER_SIZE: int = 32  # 每個任務保留供斷線續傳的進度訊息數
+    PROGRESS_HISTORY_SIZE: int = 16  # 每個任務保留用於估算速率與 ETA 的步驟事件數
+    PROGRESS_MAX_DETAILS: int = 32  # 每個任務 details 保留的最大欄位數
+    PROGRESS_EWMA_ALPHA: float = 0.3  # 步驟耗時指數加權平均的權重
+    PROGRESS_HISTORY_ALPHA: float = 0.2  # 同類已完成任務耗時加權平均的權重
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+    
+    # 多 worker 共享狀態設置
+    SHARED_STATE_BACKEND: str = "memory"  # memory（單一 worker）或 sqlite（同一主機多個 worker）
+    SHARED_STATE_PATH: str = "shared_state.db"
+    SHARED_STATE_POLL_INTERVAL: float = 0.1  # 輪詢其他 worker 訊息的間隔（秒）
+    SHARED_STATE_EVENT_TTL_SECONDS: int = 60
+    
+    # 監控設置
+    METRICS_ENABLED: bool = True  # 記錄每個路由的請求延遲並於 /metrics 輸出
+    
+    # 追蹤設置
+    TRACING_ENABLED: bool = True  # 記錄每個任務各階段的 span
+    TRACE_MAX_TASKS: int = 1000  # 保留最近幾個任務的追蹤
+    TRACE_MAX_SPANS_PER_TASK: int = 256
+    TRACE_EXPORT_DIR: str = ""  # 設定後，任務的追蹤會以 Trace Event Format 寫入此目錄
+    
+    # 剖析設置（/api/admin/profile，需帶 X-Admin-Token；未設定 ADMIN_TOKEN 時停用）
+    ADMIN_TOKEN: str = ""
+    PROFILE_SAMPLE_INTERVAL: float = 0.005  # 取樣間隔（秒）
+    PROFILE_MAX_SECONDS: float = 300  # 單次取樣剖析的最長時間
+    PROFILE_TRACEMALLOC_FRAMES: int = 10  # tracemalloc 每次配置保留的堆疊層數
+    PROFILE_MAX_SNAPSHOTS: int = 10
+    
+    # 啟動設置
+    PRELOAD_MODULES: List[str] = []  # worker 啟動時預先載入的重量級模組，如 ["librosa", "torch"]；未列出者於第一次使用時載入
+    
+    # 資料保留設置（天數為 0 表示不清理該表）
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    ERROR_HISTORY_RETENTION_DAYS: int = 30
+    CORRECTION_HISTORY_RETENTION_DAYS: int = 90
+    ERROR_STATS_RETENTION_DAYS: int = 365
+    TASK_PROGRESS_RETENTION_HOURS: int = 24
+    RETENTION_CHUNK_SIZE: int = 500
+    RETENTION_ARCHIVE_DIR: str = ""  # 設定後刪除前先將資料壓縮封存到此目錄
+    VACUUM_INTERVAL_HOURS: int = 24
+    
     class Config:
         case_sensitive = True
         env_file = ".env"
 
 settings = Settings()
 
-# 確保必要的目錄存在
-for directory in [settings.UPLOAD_DIR, settings.PREVIEW_DIR, settings.DOWNLOAD_DIR, os.path.dirname(settings.LOG_FILE)]:
-    os.makedirs(directory, exist_ok=True) 
\ No newline at end of file
+def ensure_directories() -> None:
+    """確保必要的目錄存在（於應用程式啟動時呼叫，匯入設定不產生副作用）"""
+    for directory in [settings.UPLOAD_DIR, settings.PREVIEW_DIR, settings.DOWNLOAD_DIR, os.path.dirname(settings.LOG_FILE)]:
+        os.makedirs(directory, exist_ok=True)
@@ -2,23 +2,29 @@ from fastapi import FastAPI, WebSocket, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from starlette.responses import HTMLResponse, JSONResponse
+from starlette.responses import HTMLResponse, JSONResponse, Response
 import uvicorn
 import os
-from src.core.config import settings
-from src.config.logging import logger
+from src.core.config import settings, ensure_directories
+from src.config.logging import logger, setup_logging, stop_logging
 from src.api.routes import (
     upload_router,
     process_router,
     download_router,
     error_history_router,
-    correction_history_router
+    correction_history_router,
+    error_stats_router,
+    profiling_router
 )
-from src.api.websocket import handle_websocket
-from src.models.base import Base, engine
+from src.api.websocket import handle_websocket, websocket_manager
+from src.models.base import Base, engine, ensure_columns, ensure_indexes
 from src.models.error_history import ErrorHistory, CorrectionHistory
-from src.utils.error_handler import ErrorHandler, ErrorType, setup_error_handlers
+from src.utils.error_handler import ErrorHandler, ErrorType, setup_error_handlers, get_history_engine
 from src.models.error_history import init_db
+from src.services.retention_service import retention_service
+from src.utils.shared_state import shared_state
+from src.utils.lazy_import import warm_up
+from src.api.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
 
 # Create FastAPI application
 app = FastAPI(
@@ -29,7 +35,46 @@ app = FastAPI(
 
 @app.on_event("startup")
 def on_startup():
+    # 匯入時不做 I/O：日誌、目錄、資料表與索引都在啟動時才建立
+    setup_logging()
+    ensure_directories()
     Base.metadata.create_all(engine)
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    get_history_engine()
+
+@app.on_event("startup")
+def preload_modules():
+    warm_up(settings.PRELOAD_MODULES)
+
+@app.on_event("startup")
+async def start_retention():
+    retention_service.start()
+
+@app.on_event("shutdown")
+async def stop_retention():
+    await retention_service.stop()
+
+@app.on_event("startup")
+async def start_shared_state():
+    await shared_state.start()
+
+@app.on_event("shutdown")
+async def stop_shared_state():
+    await shared_state.stop()
+
+@app.on_event("startup")
+async def start_websocket_heartbeat():
+    websocket_manager.start()
+
+@app.on_event("shutdown")
+async def stop_websocket_heartbeat():
+    await websocket_manager.stop()
+
+@app.on_event("shutdown")
+def stop_log_listener():
+    # 最後才停止，讓其他關閉步驟的日誌仍能寫出
+    stop_logging()
 
 # Setup CORS
 app.add_middleware(
@@ -40,6 +85,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 記錄每個路由的請求延遲
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -52,12 +101,24 @@ app.include_router(process_router, prefix="/api")
 app.include_router(download_router, prefix="/api")
 app.include_router(error_history_router)
 app.include_router(correction_history_router)
+app.include_router(error_stats_router)
+app.include_router(profiling_router)
 
 # WebSocket 路由
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     await handle_websocket(websocket, client_id)
 
+@app.get("/api/ws/metrics")
+async def websocket_metrics():
+    """本 worker 的 WebSocket 連線統計"""
+    return websocket_manager.metrics()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """本 worker 的 Prometheus 指標"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
 # 首頁（可選，展示前端頁面）
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -77,16 +138,6 @@ async def root(request: Request):
 async def upload_page(request: Request):
     return templates.TemplateResponse("upload.html", {"request": request})
 
-@app.get("/error-history")
-async def error_history_page(request: Request):
-    errors = error_handler.get_error_history()
-    return templates.TemplateResponse("error_history.html", {"request": request, "errors": errors})
-
-@app.get("/correction-history")
-async def correction_history_page(request: Request):
-    corrections = error_handler.get_correction_history()
-    return templates.TemplateResponse("correction_history.html", {"request": request, "corrections": corrections})
-
 @app.post("/api/upload")
 async def upload_file(file: UploadFile = File(...)):
     try:
@@ -113,18 +164,6 @@ async def upload_file(file: UploadFile = File(...)):
         print("[DEBUG] upload_file error response:", error_response)
         return JSONResponse(status_code=400, content=error_response)
 
-@app.get("/api/error-history")
-async def get_error_history():
-    return {
-        "errors": error_handler.get_error_history()
-    }
-
-@app.get("/api/correction-history")
-async def get_correction_history():
-    return {
-        "corrections": error_handler.get_correction_history()
-    }
-
 if __name__ == "__main__":
     uvicorn.run(
         "src.main:app",
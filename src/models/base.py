@@ -1,9 +1,12 @@
 import os
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session
+import time
 
 from src.core.config import settings
+from src.utils.metrics import metrics
 
 # Create SQLAlchemy engine
 engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
@@ -22,6 +25,51 @@ def get_db():
     finally:
         db.close()
 
+def ensure_indexes(bind=None, tables=None):
+    """Create indexes declared on models that are missing from existing tables
+
+    ``create_all`` skips tables that already exist, so indexes added to a model
+    after its table was created have to be created separately.
+    """
+    bind = bind or engine
+    for table in tables or Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+def ensure_columns(bind=None, tables=None):
+    """Add nullable columns declared on models that are missing from existing tables
+
+    Like indexes, columns added to a model after its table was created are not
+    picked up by ``create_all``; only nullable columns can be added this way.
+    """
+    bind = bind or engine
+    existing_tables = set(inspect(bind).get_table_names())
+    for table in tables or Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=bind.dialect)
+                with bind.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
 def init_db():
     """Initialize database"""
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes() 
+
+COMMIT_SECONDS = metrics.histogram("db_commit_duration_seconds", "Latency of session commits")
+
+@event.listens_for(Session, "before_commit")
+def _start_commit_timer(session):
+    """Remember when a commit starts"""
+    session.info["commit_started"] = time.perf_counter()
+
+@event.listens_for(Session, "after_commit")
+def _observe_commit(session):
+    """Record how long the commit took"""
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        COMMIT_SECONDS.observe(time.perf_counter() - started)
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
-from datetime import datetime
-from src.models.base import Base, engine
+from datetime import datetime, timedelta
+from src.models.base import Base, engine, ensure_indexes
 
 class ErrorHistory(Base):
     """錯誤歷史記錄"""
@@ -16,7 +16,7 @@ class ErrorHistory(Base):
     error_code = Column(String)
     stack_trace = Column(String)
     additional_info = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     # 關聯到修正歷史
     corrections = relationship("CorrectionHistory", back_populates="error")
@@ -31,11 +31,34 @@ class CorrectionHistory(Base):
     applied_fixes = Column(JSON)
     remaining_issues = Column(JSON)
     verification_result = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     # 關聯到錯誤歷史
     error = relationship("ErrorHistory", back_populates="corrections")
 
+# 統計彙總的時間桶長度（秒）
+STATS_BUCKET_SECONDS = 3600
+
+def stats_bucket(timestamp: datetime) -> datetime:
+    """將時間對齊到所屬統計時間桶的起點（桶長度需能整除一天）"""
+    seconds = timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + timedelta(seconds=seconds - seconds % STATS_BUCKET_SECONDS)
+
+class ErrorStatsRollup(Base):
+    """錯誤統計彙總（每個時間桶、錯誤類型、修正狀態一筆），由錯誤寫入時增量維護"""
+    __tablename__ = "error_stats_rollup"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "error_type", "correction_status", name="uq_error_stats_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    error_type = Column(String, nullable=False)
+    correction_status = Column(String, nullable=False, default="")
+    error_count = Column(Integer, nullable=False, default=0)
+
 # 建立所有表格
 def init_db():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes() 
\ No newline at end of file
@@ -1,7 +1,7 @@
 from enum import Enum
 from datetime import datetime
 from typing import Optional, Dict, Any
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field
 from src.models.base import Base
@@ -21,6 +21,7 @@ class TaskBase(BaseModel):
     processing_params: Optional[Dict[str, Any]] = None
     progress: Optional[float] = 0.0
     error_message: Optional[str] = None
+    audio_info: Optional[Dict[str, Any]] = None
 
 class TaskCreate(TaskBase):
     """Pydantic model for creating a Task"""
@@ -33,12 +34,19 @@ class TaskResponse(TaskBase):
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
+    eta_seconds: Optional[float] = None
+    throughput: Optional[float] = None
 
     model_config = {"from_attributes": True}
 
 class Task(Base):
     """SQLAlchemy model for Task"""
     __tablename__ = "tasks"
+    __table_args__ = (
+        # 任務列表依使用者／狀態過濾並依建立時間排序
+        Index("ix_tasks_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_tasks_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -54,6 +62,7 @@ class Task(Base):
     progress = Column(Float, default=0.0)
     error_message = Column(String, nullable=True)
     processing_params = Column(JSON, nullable=True)
+    audio_info = Column(JSON, nullable=True)  # 上傳時由檔頭判斷的格式、取樣率、聲道與長度
 
     user = relationship("User", back_populates="tasks")
 
@@ -67,6 +76,7 @@ class Task(Base):
             "progress": self.progress,
             "error_message": self.error_message,
             "processing_params": self.processing_params,
+            "audio_info": self.audio_info,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
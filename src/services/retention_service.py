@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from src.core.config import settings
+from src.config.logging import logger
+from src.models.error_history import ErrorHistory, CorrectionHistory, ErrorStatsRollup
+from src.utils.progress_tracker import progress_tracker
+
+class RetentionService:
+    """Service for expiring old history rows and in-memory progress state"""
+
+    def __init__(self, engine: Optional[Engine] = None):
+        self._engine = engine
+        self._task: Optional[asyncio.Task] = None
+        self._last_vacuum = time.monotonic()
+
+    @property
+    def engine(self) -> Engine:
+        """歷史資料表所在的資料庫（預設與 ErrorHandler 相同）"""
+        if self._engine is None:
+            from src.utils.error_handler import ErrorHandler
+            self._engine = ErrorHandler().engine
+        return self._engine
+
+    def _policies(self):
+        """(模型, 時間欄位, 保留天數, 參照它的 (模型, 外鍵欄位)) 清單
+
+        修正歷史透過 error_id 參照錯誤歷史，保留期限可能較長；錯誤被清除時，
+        參照它的修正在同一批中一併刪除，不留下懸空的外鍵。
+        """
+        return [
+            (CorrectionHistory, CorrectionHistory.created_at, settings.CORRECTION_HISTORY_RETENTION_DAYS, []),
+            (ErrorHistory, ErrorHistory.created_at, settings.ERROR_HISTORY_RETENTION_DAYS,
+             [(CorrectionHistory, CorrectionHistory.error_id)]),
+            (ErrorStatsRollup, ErrorStatsRollup.bucket_start, settings.ERROR_STATS_RETENTION_DAYS, []),
+        ]
+
+    def purge_table(self, model: Any, time_column: Any, cutoff: datetime, dependents: list = ()) -> Dict[str, int]:
+        """分批刪除早於 cutoff 的資料，每批各自提交以避免長時間持有寫入鎖
+
+        ``dependents`` 中以外鍵參照這些資料的列在同一批中先刪除。回傳各表刪除的列數。
+        """
+        Session = sessionmaker(bind=self.engine)
+        table = model.__table__
+        columns = [column.name for column in table.columns]
+        deleted = {table.name: 0, **{dependent.__tablename__: 0 for dependent, _ in dependents}}
+
+        while True:
+            session = Session()
+            try:
+                # 不封存時只查詢 id，避免載入整列資料
+                entity = model if settings.RETENTION_ARCHIVE_DIR else model.id
+                rows = session.query(entity).filter(time_column < cutoff).order_by(model.id).limit(settings.RETENTION_CHUNK_SIZE).all()
+                if not rows:
+                    break
+                ids = [row.id for row in rows]
+                for dependent, foreign_key in dependents:
+                    deleted[dependent.__tablename__] += self._delete_rows(session, dependent, foreign_key.in_(ids))
+                if settings.RETENTION_ARCHIVE_DIR:
+                    self._archive(table.name, [{name: getattr(row, name) for name in columns} for row in rows])
+                session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+                session.commit()
+                deleted[table.name] += len(rows)
+            finally:
+                session.close()
+
+            if len(rows) < settings.RETENTION_CHUNK_SIZE:
+                break
+            # 批次之間讓出 CPU，讓其他寫入者有機會取得鎖
+            time.sleep(0.01)
+
+        return deleted
+
+    def _delete_rows(self, session: Any, model: Any, condition: Any) -> int:
+        """在目前的交易中刪除符合條件的列，需要時先封存"""
+        query = session.query(model).filter(condition)
+        if settings.RETENTION_ARCHIVE_DIR:
+            columns = [column.name for column in model.__table__.columns]
+            rows = query.all()
+            if rows:
+                self._archive(model.__tablename__, [{name: getattr(row, name) for name in columns} for row in rows])
+        return query.delete(synchronize_session=False)
+
+    def _archive(self, table_name: str, rows: list) -> None:
+        """將即將刪除的資料附加到當日的 gzip JSONL 封存檔"""
+        os.makedirs(settings.RETENTION_ARCHIVE_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.RETENTION_ARCHIVE_DIR,
+            f"{table_name}-{datetime.utcnow().strftime('%Y%m%d')}.jsonl.gz"
+        )
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    async def compact_progress(self) -> Dict[str, int]:
+        """清除記憶體中已結束且過期的任務進度（上傳進度也由進度追蹤器管理）"""
+        cleared = await progress_tracker.clear_completed_tasks(max_age_hours=settings.TASK_PROGRESS_RETENTION_HOURS)
+        return {"task_progress": cleared}
+
+    def maintain_database(self, deleted_rows: int) -> None:
+        """有資料被刪除時更新統計資訊，並定期 VACUUM 回收空間"""
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if deleted_rows:
+                conn.exec_driver_sql("ANALYZE")
+            if time.monotonic() - self._last_vacuum >= settings.VACUUM_INTERVAL_HOURS * 3600:
+                conn.exec_driver_sql("VACUUM")
+                self._last_vacuum = time.monotonic()
+                logger.info("Vacuumed history database")
+
+    def purge_history(self) -> Dict[str, int]:
+        """依各表保留天數清除過期資料並維護資料庫"""
+        now = datetime.utcnow()
+        result: Dict[str, int] = {}
+
+        for model, time_column, days, dependents in self._policies():
+            if days > 0:
+                for table_name, deleted in self.purge_table(model, time_column, now - timedelta(days=days), dependents).items():
+                    result[table_name] = result.get(table_name, 0) + deleted
+
+        self.maintain_database(sum(result.values()))
+        return result
+
+    async def run_once(self) -> Dict[str, int]:
+        """執行一次完整的保留清理；資料庫清理在執行緒中進行，避免阻塞事件迴圈"""
+        result = await asyncio.to_thread(self.purge_history)
+        # 記憶體中的進度狀態只在事件迴圈中修改
+        result.update(await self.compact_progress())
+        logger.info(f"Retention run finished: {result}")
+        return result
+
+    async def _run_loop(self) -> None:
+        """定期清理"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error during retention run: {str(e)}")
+            await asyncio.sleep(settings.RETENTION_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        """啟動背景清理排程"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        """停止背景清理排程"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Create a singleton instance
+retention_service = RetentionService()
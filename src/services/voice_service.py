@@ -1,9 +1,21 @@
+import asyncio
+
 from src.config.logging import logger
+from src.utils.audio_probe import probe_file
 from src.utils.error_handler import VoiceCloneError
+from src.utils.progress_tracker import progress_tracker
+from src.utils.tracing import stage
+
+# Progress tracker kind and step count of audio processing tasks
+PROCESSING_KIND = "process_audio"
+PROCESSING_STEPS = 4
 
 class VoiceService:
     """Service for handling voice processing operations"""
     
+    # Seconds per simulated processing step
+    step_seconds = 0.5
+    
     def __init__(self):
         self.settings = {
             "noise_reduction": 0.5,
@@ -11,30 +23,53 @@ class VoiceService:
             "output_format": "wav"
         }
     
-    async def process_audio(self, file_path: str, params: dict = None):
-        """Process audio file with given parameters"""
+    async def process_audio(self, file_path: str, params: dict = None, audio_info: dict = None,
+                            task_id: int = None, user_id: int = None):
+        """Process audio file with given parameters
+
+        ``audio_info`` is the format probed at upload time; files without one are probed here.
+        With ``task_id``, progress is tracked under ``str(task_id)`` as a
+        ``PROCESSING_KIND`` task, which is what ETAs on the task list read.
+        """
+        progress_id = str(task_id) if task_id is not None else None
         try:
+            if progress_id is not None:
+                # Restart the record created at upload so queue time does not count as processing time
+                await progress_tracker.create_task(progress_id, PROCESSING_STEPS, user_id=user_id, kind=PROCESSING_KIND)
             # Update settings with provided parameters
             if params:
                 self.settings.update(params)
+            if audio_info is None:
+                audio_info = probe_file(file_path).to_dict()
             
             logger.info(f"Processing audio file: {file_path}")
             logger.info(f"Using parameters: {self.settings}")
+            logger.info(f"Audio format: {audio_info}")
             
             # TODO: Implement actual audio processing logic here
             # For now, just simulate processing
-            await self._simulate_processing()
+            with stage("voice.process_audio"):
+                await self._simulate_processing(progress_id)
             
+            if progress_id is not None:
+                await progress_tracker.complete_task(progress_id)
             return "Audio processing completed successfully"
             
         except Exception as e:
             logger.error(f"Error processing audio: {str(e)}")
+            if progress_id is not None:
+                try:
+                    await progress_tracker.complete_task(progress_id, status="failed", details={"error": str(e)})
+                except KeyError:
+                    pass
             raise VoiceCloneError(f"Failed to process audio: {str(e)}")
     
-    async def _simulate_processing(self):
+    async def _simulate_processing(self, progress_id: str = None):
         """Simulate audio processing for testing"""
-        import asyncio
-        await asyncio.sleep(2)  # Simulate processing time
+        for step in range(1, PROCESSING_STEPS + 1):
+            await asyncio.sleep(self.step_seconds)  # Simulate processing time
+            if progress_id is not None:
+                await progress_tracker.update_progress(progress_id, step)
 
 # Create a singleton instance
 voice_service = VoiceService()
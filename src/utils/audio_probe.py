@@ -0,0 +1,253 @@
+from typing import Any, BinaryIO, Dict, Optional
+from dataclasses import asdict, dataclass
+import os
+import struct
+
+from src.core.config import settings
+from src.utils.error_handler import FileValidationError
+
+@dataclass
+class AudioInfo:
+    """只讀檔頭得到的音訊格式資訊"""
+    container: str  # wav、mp3 或 ogg
+    codec: str
+    sample_rate: int
+    channels: int
+    duration: Optional[float]  # 秒；無法由檔頭推得時為 None
+    bitrate: Optional[int] = None  # bit/s
+    bits_per_sample: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class _Reader:
+    """以檔頭快取回應讀取，超出檔頭的範圍才 seek 到檔案中讀取"""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        f.seek(0, os.SEEK_END)
+        self.size = f.tell()
+        f.seek(0)
+        self.head = f.read(settings.AUDIO_PROBE_BYTES)
+
+    def read(self, offset: int, length: int) -> bytes:
+        if offset + length <= len(self.head):
+            return self.head[offset:offset + length]
+        self.f.seek(offset)
+        return self.f.read(length)
+
+def _invalid(message: str, **context: Any) -> FileValidationError:
+    return FileValidationError(message, context=context)
+
+# WAVE fmt 區塊的格式代碼
+WAV_CODECS = {1: "pcm", 3: "pcm_float", 6: "alaw", 7: "mulaw"}
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def _probe_wav(reader: _Reader) -> AudioInfo:
+    if reader.read(8, 4) != b"WAVE":
+        raise _invalid("RIFF file is not WAVE")
+    offset = 12
+    fmt = None
+    # 限制走訪的區塊數，避免大量極小區塊讓檢查變成逐區塊 seek 整個檔案
+    for _ in range(settings.AUDIO_PROBE_MAX_CHUNKS):
+        if offset + 8 > reader.size:
+            break
+        chunk_id, chunk_size = struct.unpack("<4sI", reader.read(offset, 8))
+        if chunk_id == b"fmt ":
+            fmt = reader.read(offset + 8, min(chunk_size, 40))
+            if len(fmt) < 16:
+                raise _invalid("Truncated WAVE fmt chunk")
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise _invalid("WAVE data chunk precedes fmt chunk")
+            tag, channels, sample_rate, byte_rate, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                # 實際格式是子格式 GUID 的前兩個位元組
+                tag = struct.unpack("<H", fmt[24:26])[0]
+            if not channels or not sample_rate:
+                raise _invalid("WAVE fmt chunk has no channels or sample rate")
+            # 串流寫入的檔案常把大小留成 0 或 0xFFFFFFFF，改以檔案實際長度計算
+            data_size = min(chunk_size, reader.size - offset - 8) if chunk_size else reader.size - offset - 8
+            return AudioInfo(
+                container="wav",
+                codec=WAV_CODECS.get(tag, f"wav_0x{tag:04x}"),
+                sample_rate=sample_rate,
+                channels=channels,
+                duration=data_size / byte_rate if byte_rate else None,
+                bitrate=byte_rate * 8,
+                bits_per_sample=bits
+            )
+        # 區塊長度為奇數時補一個位元組
+        offset += 8 + chunk_size + (chunk_size & 1)
+    else:
+        raise _invalid("Too many WAVE chunks before data chunk", max_chunks=settings.AUDIO_PROBE_MAX_CHUNKS)
+    raise _invalid("WAVE file has no fmt or data chunk")
+
+# MPEG 音訊：版本 -> 取樣率表；(版本為 1, 層) -> 位元率表（kbit/s）
+MPEG_VERSIONS = {3: 1, 2: 2, 0: 2.5}
+MPEG_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+MPEG_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+def _mpeg_frame(header: bytes) -> Optional[Dict[str, Any]]:
+    """解析 4 位元組的 MPEG 音訊框標頭，不合法時回傳 None"""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = MPEG_VERSIONS.get((header[1] >> 3) & 3)
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version is None or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    sample_rate = MPEG_SAMPLE_RATES[version][rate_index]
+    bitrate = MPEG_BITRATES[(version == 1, layer)][bitrate_index] * 1000
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if layer == 3 and version != 1 else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        "version": version,
+        "layer": layer,
+        "sample_rate": sample_rate,
+        "bitrate": bitrate,
+        "channels": 1 if header[3] >> 6 == 3 else 2,
+        "samples": samples,
+        "length": length
+    }
+
+def _probe_mp3(reader: _Reader) -> AudioInfo:
+    start = 0
+    if reader.read(0, 3) == b"ID3":
+        # ID3v2 標籤長度為 synchsafe 整數，有頁尾時再加 10 位元組
+        tag = reader.read(0, 10)
+        start = 10 + ((tag[6] << 21) | (tag[7] << 14) | (tag[8] << 7) | tag[9]) + (10 if tag[5] & 0x10 else 0)
+
+    window = reader.read(start, settings.AUDIO_PROBE_BYTES)
+    index = window.find(b"\xff")
+    while 0 <= index < len(window) - 3:
+        frame = _mpeg_frame(window[index:index + 4])
+        if frame is None:
+            index = window.find(b"\xff", index + 1)
+            continue
+        # 下一個框也要能對上，避免把任意資料中的 0xFFE 誤判為框同步
+        following = reader.read(start + index + frame["length"], 4)
+        if len(following) == 4 and _mpeg_frame(following) is None:
+            index = window.find(b"\xff", index + 1)
+            continue
+        offset = start + index
+        break
+    else:
+        raise _invalid("No MPEG audio frame found")
+
+    bitrate = frame["bitrate"]
+    first = reader.read(offset, min(frame["length"], 200))
+    # VBR 檔案的第一個框是 Xing/Info 或 VBRI 標頭，記錄總框數
+    side_info = (32 if frame["channels"] == 2 else 17) if frame["version"] == 1 else (17 if frame["channels"] == 2 else 9)
+    xing = 4 + side_info
+    frames = None
+    if first[xing:xing + 4] in (b"Xing", b"Info") and len(first) >= xing + 12:
+        if struct.unpack(">I", first[xing + 4:xing + 8])[0] & 1:
+            frames = struct.unpack(">I", first[xing + 8:xing + 12])[0]
+    elif first[36:40] == b"VBRI" and len(first) >= 54:
+        frames = struct.unpack(">I", first[50:54])[0]
+    audio_bytes = reader.size - offset
+    if reader.size >= 128 and reader.read(reader.size - 128, 3) == b"TAG":
+        audio_bytes -= 128
+    if frames:
+        duration = frames * frame["samples"] / frame["sample_rate"]
+        bitrate = int(audio_bytes * 8 / duration) if duration else bitrate
+    else:
+        duration = audio_bytes * 8 / bitrate
+    return AudioInfo(
+        container="mp3",
+        codec=f"mp{frame['layer']}",
+        sample_rate=frame["sample_rate"],
+        channels=frame["channels"],
+        duration=duration,
+        bitrate=bitrate
+    )
+
+# 讀取檔尾的長度，用來找最後一頁的 granule position
+OGG_TAIL_BYTES = 64 * 1024
+OPUS_GRANULE_RATE = 48000
+
+def _probe_ogg(reader: _Reader) -> AudioInfo:
+    header = reader.read(0, 27)
+    if len(header) < 27 or header[4] != 0:
+        raise _invalid("Unsupported Ogg page version")
+    serial = header[14:18]
+    segments = header[26]
+    packet = reader.read(27 + segments, 64)
+    if packet.startswith(b"\x01vorbis") and len(packet) >= 28:
+        channels, sample_rate, _, nominal = struct.unpack("<BIiI", packet[11:24])
+        codec, granule_rate, pre_skip, bitrate = "vorbis", sample_rate, 0, nominal or None
+    elif packet.startswith(b"OpusHead") and len(packet) >= 16:
+        channels, pre_skip, sample_rate = struct.unpack("<BHI", packet[9:16])
+        # Opus 一律以 48 kHz 解碼，檔頭的取樣率只是原始輸入的參考值
+        codec, granule_rate, bitrate = "opus", OPUS_GRANULE_RATE, None
+        sample_rate = sample_rate or OPUS_GRANULE_RATE
+    else:
+        raise _invalid("Unsupported Ogg codec")
+    if not channels or not sample_rate:
+        raise _invalid("Ogg stream has no channels or sample rate")
+
+    duration = None
+    tail_start = max(0, reader.size - OGG_TAIL_BYTES)
+    tail = reader.read(tail_start, reader.size - tail_start)
+    position = tail.rfind(b"OggS")
+    while position >= 0:
+        page = tail[position:position + 27]
+        if len(page) == 27 and page[14:18] == serial:
+            granule = struct.unpack("<q", page[6:14])[0]
+            if granule >= 0:
+                duration = max(0, granule - pre_skip) / granule_rate
+                break
+        position = tail.rfind(b"OggS", 0, position)
+    if duration and bitrate is None:
+        bitrate = int(reader.size * 8 / duration)
+    return AudioInfo(
+        container="ogg",
+        codec=codec,
+        sample_rate=sample_rate,
+        channels=channels,
+        duration=duration,
+        bitrate=bitrate
+    )
+
+def probe_stream(f: BinaryIO) -> AudioInfo:
+    """依檔頭判斷音訊格式，無法辨識時拋出 FileValidationError；結束後將檔案指標移回開頭
+
+    只讀取開頭 ``AUDIO_PROBE_BYTES`` 位元組，必要時再跳讀 ID3 標籤之後、過長的
+    WAV 區塊之後或 Ogg 檔尾，不會解碼音訊。
+    """
+    reader = _Reader(f)
+    try:
+        magic = reader.head[:4]
+        if magic == b"RIFF":
+            return _probe_wav(reader)
+        if magic == b"OggS":
+            return _probe_ogg(reader)
+        if magic[:3] == b"ID3" or (len(magic) >= 2 and magic[0] == 0xFF and magic[1] & 0xE0 == 0xE0):
+            return _probe_mp3(reader)
+        raise _invalid("Unrecognized audio format", header=reader.head[:16].hex())
+    except struct.error:
+        raise _invalid("Truncated audio header")
+    finally:
+        f.seek(0)
+
+def probe_file(file_path: str) -> AudioInfo:
+    """依檔頭判斷磁碟上音訊檔的格式"""
+    with open(file_path, "rb") as f:
+        try:
+            return probe_stream(f)
+        except FileValidationError as e:
+            e.context["file_path"] = file_path
+            raise
@@ -4,11 +4,11 @@ from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 import logging
 from typing import Dict, Any, Optional, List, Tuple
-import yaml
 from dataclasses import dataclass
 from enum import Enum
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -16,7 +16,11 @@ from datetime import datetime
 from src.config.logging import logger
 from src.services.error_correction_executor import ErrorCorrectionExecutor
 from src.utils.exceptions import VoiceCloneError, FileValidationError, ProcessingError, OptimizationError
-from src.models.error_history import ErrorHistory, CorrectionHistory, engine
+from src.models.error_history import (
+    ErrorHistory, CorrectionHistory, ErrorStatsRollup, STATS_BUCKET_SECONDS, stats_bucket, engine
+)
+from src.models.base import ensure_indexes
+from src.utils.pagination import keyset_paginate
 
 # 建立 Session 工廠
 SessionLocal = sessionmaker(bind=engine)
@@ -24,6 +28,50 @@ SessionLocal = sessionmaker(bind=engine)
 # 建立 Base 類別
 Base = declarative_base()
 
+# 視為修正成功／失敗的 correction_status 值
+CORRECTION_SUCCESS_STATUSES = {"completed", "成功"}
+CORRECTION_FAILED_STATUSES = {"failed"}
+
+# 歷史列表頁只需要的欄位，堆疊追蹤與 JSON 詳細資料改由單筆查詢取得
+ERROR_LIST_COLUMNS = (
+    ErrorHistory.id,
+    ErrorHistory.file_path,
+    ErrorHistory.error_type,
+    ErrorHistory.error_message,
+    ErrorHistory.correction_status,
+    ErrorHistory.created_at,
+)
+
+CORRECTION_LIST_COLUMNS = (
+    CorrectionHistory.id,
+    CorrectionHistory.error_id,
+    CorrectionHistory.success,
+    CorrectionHistory.created_at,
+    ErrorHistory.file_path,
+    ErrorHistory.error_type,
+    func.coalesce(func.json_array_length(CorrectionHistory.applied_fixes), 0).label("applied_fix_count"),
+    func.coalesce(func.json_array_length(CorrectionHistory.remaining_issues), 0).label("remaining_issue_count"),
+    CorrectionHistory.verification_result["success"].as_boolean().label("verified"),
+)
+
+_history_engine = None
+
+def get_history_engine():
+    """共用的錯誤歷史資料庫引擎，第一次呼叫時建立並確保資料表與索引存在"""
+    global _history_engine
+    if _history_engine is None:
+        engine = create_engine(
+            'sqlite:///error_history.db',
+            connect_args={'check_same_thread': False}
+        )
+        Base.metadata.create_all(engine)
+        # 歷史頁面依 created_at 排序，確保資料表與索引存在
+        history_tables = [ErrorHistory.__table__, CorrectionHistory.__table__, ErrorStatsRollup.__table__]
+        ErrorHistory.metadata.create_all(engine, tables=history_tables)
+        ensure_indexes(engine, tables=history_tables)
+        _history_engine = engine
+    return _history_engine
+
 class ErrorType(Enum):
     """錯誤類型枚舉"""
     SYNTAX = "syntax"           # 語法錯誤
@@ -46,12 +94,32 @@ class ErrorHandler:
     """錯誤處理器"""
     
     def __init__(self):
-        self.engine = create_engine(
-            'sqlite:///error_history.db',
-            connect_args={'check_same_thread': False}
-        )
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        # 資料庫連線延後到第一次使用時才建立，建立處理器本身不做任何 I/O
+        self._engine = None
+        self._session_factory = None
+
+    @property
+    def engine(self):
+        """錯誤歷史資料庫（預設為所有處理器共用的引擎）"""
+        if self._engine is None:
+            self._engine = get_history_engine()
+        return self._engine
+
+    @engine.setter
+    def engine(self, value):
+        self._engine = value
+        self._session_factory = None
+
+    @property
+    def Session(self):
+        """綁定到 engine 的 Session 工廠"""
+        if self._session_factory is None:
+            self._session_factory = sessionmaker(bind=self.engine)
+        return self._session_factory
+
+    @Session.setter
+    def Session(self, value):
+        self._session_factory = value
         
     def detect_error(self, error: Exception) -> ErrorContext:
         """檢測錯誤並返回錯誤上下文"""
@@ -268,6 +336,8 @@ class ErrorHandler:
                 created_at=datetime.utcnow()
             )
             session.add(error)
+            # 與錯誤記錄同一個交易內更新統計彙總
+            self._bump_error_stats(session, error.created_at, error_type, correction_status, 1)
             session.commit()
             session.close()
         except Exception as e:
@@ -295,12 +365,149 @@ class ErrorHandler:
             print(f"Error getting correction history: {str(e)}")
             return []
     
+    def get_error_history_page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """分頁獲取錯誤歷史列表，只查詢列表顯示的欄位"""
+        session = self.Session()
+        try:
+            query = session.query(*ERROR_LIST_COLUMNS)
+            rows, next_cursor = keyset_paginate(query, ErrorHistory, limit, cursor)
+            return [dict(row._mapping) for row in rows], next_cursor
+        finally:
+            session.close()
+    
+    def get_correction_history_page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """分頁獲取修正歷史列表，JSON 欄位只取摘要"""
+        session = self.Session()
+        try:
+            query = session.query(*CORRECTION_LIST_COLUMNS).outerjoin(
+                ErrorHistory, CorrectionHistory.error_id == ErrorHistory.id
+            )
+            rows, next_cursor = keyset_paginate(query, CorrectionHistory, limit, cursor)
+            return [dict(row._mapping) for row in rows], next_cursor
+        finally:
+            session.close()
+    
+    def get_error_detail(self, error_id: int) -> Optional[Dict[str, Any]]:
+        """依 ID 獲取單筆錯誤的完整內容（含堆疊追蹤）"""
+        session = self.Session()
+        try:
+            error = session.get(ErrorHistory, error_id)
+            if not error:
+                return None
+            return {
+                "id": error.id,
+                "error_location": error.error_location,
+                "error_code": error.error_code,
+                "stack_trace": error.stack_trace,
+                "additional_info": error.additional_info
+            }
+        finally:
+            session.close()
+    
+    def get_correction_detail(self, correction_id: int) -> Optional[Dict[str, Any]]:
+        """依 ID 獲取單筆修正的完整 JSON 內容"""
+        session = self.Session()
+        try:
+            correction = session.get(CorrectionHistory, correction_id)
+            if not correction:
+                return None
+            return {
+                "id": correction.id,
+                "error_id": correction.error_id,
+                "applied_fixes": correction.applied_fixes,
+                "remaining_issues": correction.remaining_issues,
+                "verification_result": correction.verification_result
+            }
+        finally:
+            session.close()
+    
+    def _bump_error_stats(self, session: Session, created_at: datetime, error_type: str, correction_status: Optional[str], delta: int) -> None:
+        """增量更新錯誤統計彙總"""
+        stmt = sqlite_insert(ErrorStatsRollup).values(
+            bucket_start=stats_bucket(created_at),
+            error_type=error_type,
+            correction_status=correction_status or "",
+            error_count=delta
+        )
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=["bucket_start", "error_type", "correction_status"],
+            set_={"error_count": ErrorStatsRollup.error_count + stmt.excluded.error_count}
+        ))
+    
+    def _drop_error_stats(self, session: Session, created_at: datetime, error_type: str, correction_status: Optional[str]) -> None:
+        """自既有的統計彙總扣除一筆；列不存在或已為 0（彙總建立前的錯誤、被清理的桶）時不動作"""
+        session.query(ErrorStatsRollup).filter(
+            ErrorStatsRollup.bucket_start == stats_bucket(created_at),
+            ErrorStatsRollup.error_type == error_type,
+            ErrorStatsRollup.correction_status == (correction_status or ""),
+            ErrorStatsRollup.error_count > 0
+        ).update({ErrorStatsRollup.error_count: ErrorStatsRollup.error_count - 1}, synchronize_session=False)
+    
+    def rebuild_error_stats(self) -> None:
+        """由錯誤歷史全表重建統計彙總，用於首次啟用或資料修復"""
+        session = self.Session()
+        try:
+            session.query(ErrorStatsRollup).delete()
+            counts: Dict[Tuple[datetime, str, str], int] = {}
+            rows = session.query(
+                ErrorHistory.created_at, ErrorHistory.error_type, ErrorHistory.correction_status
+            ).yield_per(1000)
+            for created_at, error_type, correction_status in rows:
+                key = (stats_bucket(created_at), error_type, correction_status or "")
+                counts[key] = counts.get(key, 0) + 1
+            session.bulk_insert_mappings(ErrorStatsRollup, [
+                {"bucket_start": bucket, "error_type": error_type, "correction_status": status, "error_count": count}
+                for (bucket, error_type, status), count in counts.items()
+            ])
+            session.commit()
+        finally:
+            session.close()
+    
+    def get_error_stats(self, since: datetime, error_type: Optional[str] = None) -> Dict[str, Any]:
+        """從統計彙總表獲取各時間桶的錯誤數量與修正成功率"""
+        session = self.Session()
+        try:
+            query = session.query(
+                ErrorStatsRollup.bucket_start,
+                ErrorStatsRollup.error_type,
+                ErrorStatsRollup.correction_status,
+                ErrorStatsRollup.error_count
+            ).filter(
+                ErrorStatsRollup.bucket_start >= stats_bucket(since),
+                ErrorStatsRollup.error_count > 0
+            )
+            if error_type:
+                query = query.filter(ErrorStatsRollup.error_type == error_type)
+            rows = query.order_by(ErrorStatsRollup.bucket_start).all()
+        finally:
+            session.close()
+        
+        by_type: Dict[str, int] = {}
+        succeeded = failed = 0
+        for row in rows:
+            by_type[row.error_type] = by_type.get(row.error_type, 0) + row.error_count
+            if row.correction_status in CORRECTION_SUCCESS_STATUSES:
+                succeeded += row.error_count
+            elif row.correction_status in CORRECTION_FAILED_STATUSES:
+                failed += row.error_count
+        
+        return {
+            "bucket_seconds": STATS_BUCKET_SECONDS,
+            "buckets": [dict(row._mapping) for row in rows],
+            "by_type": by_type,
+            "correction_success_rate": succeeded / (succeeded + failed) if succeeded + failed else None
+        }
+    
     def update_correction_status(self, error_id: int, status: str, message: str = None):
         """更新修正狀態"""
         try:
             session = self.Session()
             error = session.query(ErrorHistory).filter(ErrorHistory.id == error_id).first()
             if error:
+                if error.correction_status != status:
+                    # 將統計從舊狀態移到新狀態
+                    self._drop_error_stats(session, error.created_at, error.error_type, error.correction_status)
+                    self._bump_error_stats(session, error.created_at, error.error_type, status, 1)
                 error.correction_status = status
                 if message:
                     error.correction_message = message
@@ -1,12 +1,14 @@
+import asyncio
 import os
 import shutil
 import uuid
 from pathlib import Path
-from typing import List, Optional
+from typing import BinaryIO, List, Optional
 from fastapi import UploadFile, Response
 from fastapi.responses import FileResponse
 
 from src.core.config import settings
+from src.utils.audio_probe import AudioInfo, probe_stream
 from src.utils.error_handler import FileValidationError
 from src.config.logging import logger
 
@@ -25,19 +27,19 @@ class FileManager:
             os.makedirs(directory, exist_ok=True)
     
     @staticmethod
-    def validate_file(file: UploadFile) -> None:
-        """Validate uploaded file"""
+    def validate_file(file: UploadFile) -> AudioInfo:
+        """Validate uploaded file and return its audio format, read from the header"""
         # Check file size
         file.file.seek(0, os.SEEK_END)
         size = file.file.tell()
         file.file.seek(0)
         
-        if size > settings.MAX_UPLOAD_SIZE:
+        if size > settings.MAX_FILE_SIZE:
             raise FileValidationError(
-                f"File size exceeds maximum allowed size of {settings.MAX_UPLOAD_SIZE} bytes",
+                f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE} bytes",
                 context={
                     "file_size": size,
-                    "max_size": settings.MAX_UPLOAD_SIZE,
+                    "max_size": settings.MAX_FILE_SIZE,
                     "file_name": file.filename
                 }
             )
@@ -53,25 +55,62 @@ class FileManager:
                     "file_name": file.filename
                 }
             )
+        
+        # Check the content really is audio; renamed files fail here instead of during processing
+        try:
+            return probe_stream(file.file)
+        except FileValidationError as e:
+            e.context["file_name"] = file.filename
+            raise
     
-    async def save_upload_file(self, file: UploadFile) -> str:
-        """保存上傳的文件"""
+    @staticmethod
+    def _sync_to_disk(f: Optional[BinaryIO], directory: str) -> None:
+        """依 FILE_FSYNC_POLICY 將剛寫入的檔案（及其目錄項目）落盤"""
+        policy = settings.FILE_FSYNC_POLICY
+        if policy == "none":
+            return
+        if f is not None:
+            f.flush()
+            os.fsync(f.fileno())
+        if policy == "dir":
+            # 新檔名記錄在目錄中，目錄也 fsync 後斷電才不會遺失檔案
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                return  # 無法開啟目錄的平台（如 Windows）
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def _copy(self, source: BinaryIO, file_path: str) -> str:
+        """以大區塊將 source 從頭複製到 file_path（同步，供背景執行緒呼叫）"""
+        source.seek(0)
         try:
-            # 生成唯一文件名
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(self.upload_dir, unique_filename)
-            
-            # 保存文件
-            with open(file_path, "wb") as f:
-                while chunk := await file.read(8192):
-                    f.write(chunk)
-            
-            return file_path
-            
+            # 緩衝區與複製區塊同大小，每個區塊一次送出；BufferedWriter 會重試部分寫入，不會截斷檔案
+            with open(file_path, "wb", buffering=settings.FILE_WRITE_BUFFER_SIZE) as f:
+                shutil.copyfileobj(source, f, settings.FILE_WRITE_BUFFER_SIZE)
+                self._sync_to_disk(f, os.path.dirname(file_path) or ".")
         except Exception as e:
             logger.error(f"Error saving file: {str(e)}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
             raise
+        return file_path
+    
+    def store_upload(self, source: BinaryIO, filename: str) -> str:
+        """將上傳內容以唯一檔名存入上傳目錄並回傳路徑（同步，供背景執行緒呼叫）"""
+        file_extension = os.path.splitext(filename)[1]
+        return self._copy(source, os.path.join(self.upload_dir, f"{uuid.uuid4()}{file_extension}"))
+    
+    async def save_upload_file(self, file: UploadFile) -> str:
+        """保存上傳的文件"""
+        # 寫檔在執行緒中進行，慢速磁碟不會卡住事件迴圈上的其他請求
+        return await asyncio.to_thread(self.store_upload, file.file, file.filename)
+    
+    async def save_upload_to(self, file: UploadFile, file_path: str) -> str:
+        """將上傳的文件保存到指定路徑"""
+        return await asyncio.to_thread(self._copy, file.file, file_path)
     
     async def generate_preview_url(self, file: UploadFile) -> str:
         """生成文件預覽URL"""
@@ -82,9 +121,7 @@ class FileManager:
             preview_path = os.path.join(self.preview_dir, preview_filename)
             
             # 保存預覽文件
-            with open(preview_path, "wb") as f:
-                while chunk := await file.read(8192):
-                    f.write(chunk)
+            await asyncio.to_thread(self._copy, file.file, preview_path)
             
             # 生成預覽URL
             preview_url = f"{settings.BASE_URL}/preview/{preview_filename}"
@@ -94,20 +131,24 @@ class FileManager:
             logger.error(f"Error generating preview: {str(e)}")
             raise
     
+    def _link_batch(self, batch_dir: str, paths: List[str]) -> None:
+        """在批次目錄中建立輸出檔的硬連結（同步，供背景執行緒呼叫）"""
+        os.makedirs(batch_dir, exist_ok=True)
+        for path in paths:
+            if os.path.exists(path):
+                os.link(path, os.path.join(batch_dir, os.path.basename(path)))
+        self._sync_to_disk(None, batch_dir)
+    
     async def generate_batch_download_url(self, tasks: list) -> str:
         """生成批次下載URL"""
         try:
             # 創建批次下載目錄
             batch_id = str(uuid.uuid4())
             batch_dir = os.path.join(self.download_dir, batch_id)
-            os.makedirs(batch_dir, exist_ok=True)
             
-            # 複製所有處理完成的文件到批次目錄
-            for task in tasks:
-                if task.output_file and os.path.exists(task.output_file):
-                    filename = os.path.basename(task.output_file)
-                    new_path = os.path.join(batch_dir, filename)
-                    os.link(task.output_file, new_path)
+            # 連結所有處理完成的文件到批次目錄；任務屬性先在此讀出，執行緒中不碰資料庫連線
+            paths = [task.output_file for task in tasks if task.output_file]
+            await asyncio.to_thread(self._link_batch, batch_dir, paths)
             
             # 生成下載URL
             download_url = f"{settings.BASE_URL}/download/batch/{batch_id}"
@@ -0,0 +1,26 @@
+from typing import Dict, Iterable
+import importlib
+import time
+
+from src.config.logging import get_logger
+
+logger = get_logger(__name__)
+
+def warm_up(modules: Iterable[str]) -> Dict[str, float]:
+    """Import modules eagerly, e.g. in a worker startup hook
+
+    Returns the seconds spent per module. Modules that fail to import are
+    logged and skipped so that one missing optional dependency does not
+    stop the worker.
+    """
+    timings: Dict[str, float] = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {str(e)}")
+            continue
+        timings[name] = time.perf_counter() - start
+        logger.info(f"Preloaded {name} in {timings[name]:.3f}s")
+    return timings
@@ -1,15 +1,27 @@
 from typing import Dict, Any, List, Optional
 import json
+import time
+import uuid
 from datetime import datetime
 
 from src.config.logging import logger
 from src.utils.error_handler import VoiceCloneError
+from src.utils.shared_state import SharedStateBackend, shared_state
+
+CONVERSATION_NAMESPACE = "conversations"
+MESSAGE_NAMESPACE = "conversation_messages"
 
 class NLInterface:
-    """Natural Language Interface for user interactions"""
+    """Natural Language Interface for user interactions
+
+    Conversations are kept in the shared state backend so that any worker can
+    continue a conversation started on another one. Each message is a key of
+    its own, ordered by the time it was added, so workers adding messages to
+    the same conversation never overwrite each other.
+    """
     
-    def __init__(self):
-        self._conversations: Dict[str, List[Dict[str, Any]]] = {}
+    def __init__(self, state: Optional[SharedStateBackend] = None):
+        self._state = state if state is not None else shared_state
         self._system_prompts: Dict[str, str] = {
             "default": """You are a helpful assistant for the VoiceClone Optimizer application.
 Your role is to help users optimize their voice cloning process.
@@ -40,11 +52,12 @@ Consider:
     def start_conversation(self, user_id: str, context: str = "default") -> str:
         """Start a new conversation"""
         conversation_id = f"{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        self._conversations[conversation_id] = [{
-            "role": "system",
-            "content": self._system_prompts.get(context, self._system_prompts["default"]),
-            "timestamp": datetime.now().isoformat()
-        }]
+        self._state.set(CONVERSATION_NAMESPACE, conversation_id, {
+            "user_id": user_id,
+            "context": context,
+            "started_at": datetime.now().isoformat()
+        })
+        self.add_message(conversation_id, "system", self._system_prompts.get(context, self._system_prompts["default"]))
         logger.info(f"Started conversation {conversation_id} for user {user_id}")
         return conversation_id
     
@@ -56,7 +69,7 @@ Consider:
         metadata: Optional[Dict[str, Any]] = None
     ) -> None:
         """Add a message to the conversation"""
-        if conversation_id not in self._conversations:
+        if self._state.get(CONVERSATION_NAMESPACE, conversation_id) is None:
             raise VoiceCloneError(f"Conversation {conversation_id} not found")
         
         message = {
@@ -68,7 +81,9 @@ Consider:
         if metadata:
             message["metadata"] = metadata
         
-        self._conversations[conversation_id].append(message)
+        # Time first so keys sort in the order messages were added; the suffix keeps keys written by different workers at once apart
+        key = f"{self._message_prefix(conversation_id)}{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        self._state.set(MESSAGE_NAMESPACE, key, message)
         logger.info(f"Added {role} message to conversation {conversation_id}")
     
     def get_conversation_history(
@@ -77,10 +92,7 @@ Consider:
         max_messages: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """Get conversation history"""
-        if conversation_id not in self._conversations:
-            raise VoiceCloneError(f"Conversation {conversation_id} not found")
-        
-        history = self._conversations[conversation_id]
+        history = self._get_history(conversation_id)
         if max_messages:
             history = history[-max_messages:]
         
@@ -160,15 +172,25 @@ Consider:
     
     def end_conversation(self, conversation_id: str) -> None:
         """End a conversation and save its history"""
-        if conversation_id not in self._conversations:
-            raise VoiceCloneError(f"Conversation {conversation_id} not found")
-        
         # Save conversation history (placeholder)
-        history = self._conversations[conversation_id]
+        history = self._get_history(conversation_id)
         logger.info(f"Ended conversation {conversation_id} with {len(history)} messages")
         
         # Remove from active conversations
-        del self._conversations[conversation_id]
+        for key in self._state.items(MESSAGE_NAMESPACE, self._message_prefix(conversation_id)):
+            self._state.delete(MESSAGE_NAMESPACE, key)
+        self._state.delete(CONVERSATION_NAMESPACE, conversation_id)
+    
+    @staticmethod
+    def _message_prefix(conversation_id: str) -> str:
+        return f"{conversation_id}/"
+    
+    def _get_history(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Get the stored messages of a conversation in the order they were added"""
+        if self._state.get(CONVERSATION_NAMESPACE, conversation_id) is None:
+            raise VoiceCloneError(f"Conversation {conversation_id} not found")
+        messages = self._state.items(MESSAGE_NAMESPACE, self._message_prefix(conversation_id))
+        return [messages[key] for key in sorted(messages)]
 
 # Create global instance
 nl_interface = NLInterface()
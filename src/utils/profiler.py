@@ -0,0 +1,179 @@
+from typing import Any, Dict, List, Optional
+from collections import Counter
+import itertools
+import sys
+import threading
+import time
+import tracemalloc
+
+from src.core.config import settings
+from src.config.logging import get_logger
+
+logger = get_logger(__name__)
+
+class ProfilerBusyError(Exception):
+    """Raised when starting a profiler that is already running"""
+    pass
+
+def _folded_stack(frame) -> str:
+    """Frame chain as ``outer;inner`` function names, root first"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    """Samples the stacks of every thread from a background thread
+
+    Nothing is installed while idle: no trace or profile hook, no thread.
+    While running, a daemon thread wakes every ``interval`` seconds, reads
+    ``sys._current_frames()`` and counts identical stacks. The result is in
+    the folded format (``frame;frame;frame count``) read by flamegraph.pl,
+    speedscope and similar tools. The event loop thread is sampled like any
+    other, so time spent in coroutines shows up under ``run_forever``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.interval = 0.0
+        self.started: Optional[float] = None
+        self.stopped: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: Optional[float] = None) -> None:
+        """Sample for ``seconds`` (capped by PROFILE_MAX_SECONDS), then stop by itself"""
+        with self._lock:
+            if self.running:
+                raise ProfilerBusyError("Sampling profiler is already running")
+            self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL
+            self._stacks = Counter()
+            self.samples = 0
+            self.started, self.stopped = time.time(), None
+            self._stop.clear()
+            duration = min(seconds, settings.PROFILE_MAX_SECONDS)
+            self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"Sampling profiler started for {duration}s every {self.interval}s")
+
+    def stop(self) -> None:
+        """Stop sampling early and wait for the sampler thread"""
+        thread = self._thread
+        self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self, duration: float) -> None:
+        me = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != me:
+                    self._stacks[_folded_stack(frame)] += 1
+            self.samples += 1
+        self.stopped = time.time()
+        logger.info(f"Sampling profiler stopped after {self.samples} samples")
+
+    def folded(self) -> str:
+        """Collected stacks in the folded flamegraph format"""
+        stacks = list(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks))
+
+    def status(self, top: int = 20) -> Dict[str, Any]:
+        """Whether it is running, and the hottest leaf functions so far"""
+        leaves: Counter = Counter()
+        for stack, count in list(self._stacks.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "running": self.running,
+            "started": self.started,
+            "stopped": self.stopped,
+            "interval": self.interval,
+            "samples": self.samples,
+            "top": [{"function": name, "samples": count} for name, count in leaves.most_common(top)]
+        }
+
+class MemoryProfiler:
+    """tracemalloc snapshots and diffs, enabled only while profiling
+
+    tracemalloc slows every allocation while tracing, so it is started on
+    demand and stopped again when done; snapshots are kept until then.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[int, tracemalloc.Snapshot] = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: Optional[int] = None) -> None:
+        if self.running:
+            raise ProfilerBusyError("tracemalloc is already tracing")
+        tracemalloc.start(frames or settings.PROFILE_TRACEMALLOC_FRAMES)
+        logger.info("tracemalloc started")
+
+    def stop(self) -> None:
+        """Stop tracing and forget the snapshots"""
+        tracemalloc.stop()
+        self._snapshots.clear()
+        logger.info("tracemalloc stopped")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Take a snapshot, keeping at most PROFILE_MAX_SNAPSHOTS"""
+        if not self.running:
+            raise RuntimeError("tracemalloc is not tracing; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        snapshot_id = next(self._ids)
+        self._snapshots[snapshot_id] = snapshot
+        while len(self._snapshots) > settings.PROFILE_MAX_SNAPSHOTS:
+            del self._snapshots[min(self._snapshots)]
+        current, peak = tracemalloc.get_traced_memory()
+        return {"snapshot_id": snapshot_id, "current_bytes": current, "peak_bytes": peak}
+
+    def snapshots(self) -> List[int]:
+        return sorted(self._snapshots)
+
+    def _get(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        try:
+            return self._snapshots[snapshot_id]
+        except KeyError:
+            raise KeyError(f"Snapshot {snapshot_id} not found")
+
+    def top(self, snapshot_id: int, limit: int = 20, key_type: str = "lineno") -> List[Dict[str, Any]]:
+        """Largest allocation sites in one snapshot"""
+        stats = self._get(snapshot_id).statistics(key_type)[:limit]
+        return [
+            {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+            for stat in stats
+        ]
+
+    def diff(self, from_id: int, to_id: int, limit: int = 20, key_type: str = "lineno") -> List[Dict[str, Any]]:
+        """Allocation sites that grew the most between two snapshots"""
+        stats = self._get(to_id).compare_to(self._get(from_id), key_type)[:limit]
+        return [
+            {
+                "location": str(stat.traceback),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff
+            }
+            for stat in stats
+        ]
+
+# Create global instances
+sampling_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,112 @@
+from typing import Any, Dict, List, Optional, Set
+from collections import defaultdict
+import asyncio
+import json
+import time
+
+from src.config.logging import get_logger
+from src.utils.progress_codec import encode_progress
+from src.utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+FANOUT_SECONDS = metrics.histogram("progress_fanout_seconds", "Time to deliver one progress message to all subscribers")
+FANOUT_SUBSCRIBERS = metrics.counter("progress_fanout_deliveries_total", "Progress messages delivered to subscribers")
+
+def task_topic(task_id: Any) -> str:
+    """Topic name for progress of a single task"""
+    return f"task:{task_id}"
+
+def user_topic(user_id: Any) -> str:
+    """Topic name for progress of all tasks owned by a user"""
+    return f"user:{user_id}"
+
+class ProgressBus:
+    """Topic-based publish/subscribe bus for progress messages
+
+    A subscriber is any object with an async ``send_text`` method, such as a
+    WebSocket or a queued ``ClientConnection``. Any number of subscribers may
+    attach to the same topic. Subscribers with a true ``compact`` attribute
+    receive progress messages through ``send_progress`` as packed binary
+    instead of JSON.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Any]] = defaultdict(set)
+
+    def subscribe(self, topic: str, subscriber: Any) -> None:
+        """Attach a subscriber to a topic"""
+        self._subscribers[topic].add(subscriber)
+        logger.debug(f"Subscribed to {topic} ({len(self._subscribers[topic])} subscribers)")
+
+    def unsubscribe(self, topic: str, subscriber: Any) -> None:
+        """Detach a subscriber from a topic"""
+        subscribers = self._subscribers.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[topic]
+
+    def unsubscribe_all(self, subscriber: Any) -> None:
+        """Detach a subscriber from every topic, e.g. when its socket closes"""
+        for topic in list(self._subscribers):
+            self.unsubscribe(topic, subscriber)
+
+    def subscribers(self, topic: str) -> List[Any]:
+        """Subscribers currently attached to a topic"""
+        return list(self._subscribers.get(topic, ()))
+
+    def subscriber_count(self, topic: str) -> int:
+        """Number of subscribers attached to a topic"""
+        return len(self._subscribers.get(topic, ()))
+
+    def has_subscribers(self, *topics: str) -> bool:
+        """Whether any of the given topics has a subscriber"""
+        return any(self._subscribers.get(topic) for topic in topics)
+
+    async def publish(self, message: Dict[str, Any], *topics: str) -> None:
+        """Send a message to every subscriber of the given topics concurrently
+
+        The message is serialized at most once per encoding for all
+        subscribers. A subscriber attached to several of the topics receives
+        it once. Subscribers whose send fails are pruned from all topics.
+        """
+        targets = set()
+        for topic in topics:
+            targets.update(self._subscribers.get(topic, ()))
+        if not targets:
+            return
+
+        targets = list(targets)
+        encoded: Dict[str, Any] = {}
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(deliver(subscriber, message, encoded) for subscriber in targets),
+            return_exceptions=True
+        )
+        FANOUT_SECONDS.observe(time.perf_counter() - start)
+        FANOUT_SUBSCRIBERS.inc(len(targets))
+        for subscriber, result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error sending progress update: {str(result)}")
+                self.unsubscribe_all(subscriber)
+
+async def deliver(subscriber: Any, message: Dict[str, Any], encoded: Optional[Dict[str, Any]] = None) -> None:
+    """Send one message to one subscriber in the encoding it negotiated
+
+    ``encoded`` caches the serialized forms so that publishing to many
+    subscribers encodes the message once per encoding.
+    """
+    encoded = encoded if encoded is not None else {}
+    if getattr(subscriber, "compact", False) and "task_id" in message:
+        if "compact" not in encoded:
+            encoded["compact"] = encode_progress(message)
+        await subscriber.send_progress(message["task_id"], encoded["compact"])
+    else:
+        if "json" not in encoded:
+            encoded["json"] = json.dumps(message)
+        await subscriber.send_text(encoded["json"])
+
+# Create global instance
+progress_bus = ProgressBus()
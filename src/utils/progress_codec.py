@@ -0,0 +1,179 @@
+from typing import Any, Dict, List
+from datetime import datetime
+import json
+import struct
+
+# WebSocket subprotocol clients request to receive compact progress frames
+COMPACT_SUBPROTOCOL = "progress.compact.v1"
+
+# Record types; a binary WebSocket message is one or more records back to back
+RECORD_RESET = 0x00     # forget all interned task ids
+RECORD_DEFINE = 0x01    # <H index><I length><task id utf-8>
+RECORD_PROGRESS = 0x02  # <H index><I seq><H flags> then the flagged fields in bit order
+
+FLAG_FULL = 0x01
+FLAG_PROGRESS = 0x02      # <f>
+FLAG_CURRENT_STEP = 0x04  # <I>
+FLAG_TOTAL_STEPS = 0x08   # <I>
+FLAG_STATUS = 0x10        # <B code>, code 255 is followed by a length-prefixed string
+FLAG_DETAILS = 0x20       # length-prefixed JSON
+FLAG_START_TIME = 0x40    # <d> epoch seconds
+FLAG_END_TIME = 0x80      # <d> epoch seconds
+FLAG_THROUGHPUT = 0x100   # <f> steps per second
+FLAG_ETA = 0x200          # <f> seconds
+FLAG_CLEARED = 0x400      # <H mask> of the field flags above whose value became null
+
+# Fields that may go back to null, e.g. end_time or throughput of a restarted task
+CLEARABLE_FIELDS = {
+    "details": FLAG_DETAILS,
+    "start_time": FLAG_START_TIME,
+    "end_time": FLAG_END_TIME,
+    "throughput": FLAG_THROUGHPUT,
+    "eta_seconds": FLAG_ETA
+}
+
+STATUS_CODES = ("pending", "in_progress", "completed", "failed", "cancelled")
+OTHER_STATUS = 255
+MAX_INTERNED = 0xFFFF
+
+def _pack_str(value: str) -> bytes:
+    """Length-prefixed UTF-8 string; details and error messages may exceed 64 KiB"""
+    data = value.encode("utf-8")
+    return struct.pack("<I", len(data)) + data
+
+def _unpack_str(data: bytes, offset: int):
+    """Read a length-prefixed UTF-8 string, returning it and the new offset"""
+    (length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+def encode_progress(message: Dict[str, Any]) -> bytes:
+    """Encode a progress message without its task id
+
+    The result is shared by every compact subscriber; each connection
+    prefixes it with its own interned index (see ``progress_record``).
+    """
+    flags = FLAG_FULL if message.get("full") else 0
+    fields = []
+    if "progress" in message:
+        flags |= FLAG_PROGRESS
+        fields.append(struct.pack("<f", message["progress"]))
+    if "current_step" in message:
+        flags |= FLAG_CURRENT_STEP
+        fields.append(struct.pack("<I", message["current_step"]))
+    if "total_steps" in message:
+        flags |= FLAG_TOTAL_STEPS
+        fields.append(struct.pack("<I", message["total_steps"]))
+    if "status" in message:
+        flags |= FLAG_STATUS
+        status = message["status"]
+        if status in STATUS_CODES:
+            fields.append(struct.pack("<B", STATUS_CODES.index(status)))
+        else:
+            fields.append(struct.pack("<B", OTHER_STATUS) + _pack_str(str(status)))
+    if message.get("details") is not None:
+        flags |= FLAG_DETAILS
+        fields.append(_pack_str(json.dumps(message["details"], default=str)))
+    if message.get("start_time"):
+        flags |= FLAG_START_TIME
+        fields.append(struct.pack("<d", datetime.fromisoformat(message["start_time"]).timestamp()))
+    if message.get("end_time"):
+        flags |= FLAG_END_TIME
+        fields.append(struct.pack("<d", datetime.fromisoformat(message["end_time"]).timestamp()))
+    if message.get("throughput") is not None:
+        flags |= FLAG_THROUGHPUT
+        fields.append(struct.pack("<f", message["throughput"]))
+    if message.get("eta_seconds") is not None:
+        flags |= FLAG_ETA
+        fields.append(struct.pack("<f", message["eta_seconds"]))
+    cleared = 0
+    for field, flag in CLEARABLE_FIELDS.items():
+        if field in message and message[field] is None:
+            cleared |= flag
+    if cleared:
+        flags |= FLAG_CLEARED
+        fields.append(struct.pack("<H", cleared))
+    return struct.pack("<IH", message.get("seq", 0), flags) + b"".join(fields)
+
+def define_record(index: int, task_id: str) -> bytes:
+    """Record binding an interned index to a task id"""
+    return struct.pack("<BH", RECORD_DEFINE, index) + _pack_str(str(task_id))
+
+def reset_record() -> bytes:
+    """Record telling the client to forget all interned task ids"""
+    return struct.pack("<B", RECORD_RESET)
+
+def progress_record(index: int, body: bytes) -> bytes:
+    """Record carrying an encoded progress message for an interned task"""
+    return struct.pack("<BH", RECORD_PROGRESS, index) + body
+
+def decode_frames(data: bytes, task_ids: Dict[int, str]) -> List[Dict[str, Any]]:
+    """Decode a binary message into JSON-shaped progress messages
+
+    ``task_ids`` is the client's intern table and is updated in place. This
+    is the reference decoder for clients and tests.
+    """
+    messages = []
+    offset = 0
+    while offset < len(data):
+        record = data[offset]
+        offset += 1
+        if record == RECORD_RESET:
+            task_ids.clear()
+            continue
+
+        (index,) = struct.unpack_from("<H", data, offset)
+        offset += 2
+        if record == RECORD_DEFINE:
+            task_ids[index], offset = _unpack_str(data, offset)
+            continue
+
+        seq, flags = struct.unpack_from("<IH", data, offset)
+        offset += 6
+        message: Dict[str, Any] = {
+            "type": "progress",
+            "task_id": task_ids[index],
+            "full": bool(flags & FLAG_FULL),
+            "seq": seq
+        }
+        if flags & FLAG_PROGRESS:
+            (message["progress"],) = struct.unpack_from("<f", data, offset)
+            offset += 4
+        if flags & FLAG_CURRENT_STEP:
+            (message["current_step"],) = struct.unpack_from("<I", data, offset)
+            offset += 4
+        if flags & FLAG_TOTAL_STEPS:
+            (message["total_steps"],) = struct.unpack_from("<I", data, offset)
+            offset += 4
+        if flags & FLAG_STATUS:
+            code = data[offset]
+            offset += 1
+            if code == OTHER_STATUS:
+                message["status"], offset = _unpack_str(data, offset)
+            else:
+                message["status"] = STATUS_CODES[code]
+        if flags & FLAG_DETAILS:
+            details, offset = _unpack_str(data, offset)
+            message["details"] = json.loads(details)
+        if flags & FLAG_START_TIME:
+            (timestamp,) = struct.unpack_from("<d", data, offset)
+            message["start_time"] = datetime.fromtimestamp(timestamp).isoformat()
+            offset += 8
+        if flags & FLAG_END_TIME:
+            (timestamp,) = struct.unpack_from("<d", data, offset)
+            message["end_time"] = datetime.fromtimestamp(timestamp).isoformat()
+            offset += 8
+        if flags & FLAG_THROUGHPUT:
+            (message["throughput"],) = struct.unpack_from("<f", data, offset)
+            offset += 4
+        if flags & FLAG_ETA:
+            (message["eta_seconds"],) = struct.unpack_from("<f", data, offset)
+            offset += 4
+        if flags & FLAG_CLEARED:
+            (cleared,) = struct.unpack_from("<H", data, offset)
+            offset += 2
+            for field, flag in CLEARABLE_FIELDS.items():
+                if cleared & flag:
+                    message[field] = None
+        messages.append(message)
+    return messages
@@ -1,29 +1,198 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
 from datetime import datetime
-import json
+import time
 from fastapi import WebSocket
 import asyncio
 
-from src.config.logging import logger
+from src.core.config import settings
+from src.config.logging import get_logger
+from src.utils.progress_bus import deliver, progress_bus, task_topic, user_topic
+from src.utils.shared_state import SharedStateBackend, shared_state
 
-class ProgressTracker:
-    """Utility class for tracking task progress"""
-    
-    def __init__(self):
-        self._tasks: Dict[str, Dict[str, Any]] = {}
-        self._websockets: Dict[str, WebSocket] = {}
-    
-    async def create_task(self, task_id: str, total_steps: int) -> None:
-        """Create a new task with progress tracking"""
-        self._tasks[task_id] = {
-            "total_steps": total_steps,
-            "current_step": 0,
-            "status": "pending",
-            "start_time": datetime.now().isoformat(),
-            "end_time": None,
-            "progress": 0.0,
-            "details": {}
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+TASK_NAMESPACE = "tasks"
+PROGRESS_CHANNEL = "progress"
+DEFAULT_KIND = "default"
+
+class TaskProgress:
+    """Progress state of one task
+
+    Slotted to keep per-task overhead small when tracking many tasks. Times
+    are ``time.monotonic()`` values; wall-clock start and end times are
+    derived from a single anchor taken at creation. ``steps`` is a bounded
+    ring buffer of recent ``(time, step)`` events over which throughput is
+    measured, and ``details`` keeps at most ``PROGRESS_MAX_DETAILS`` keys.
+
+    The ETA uses an exponentially weighted average of step durations,
+    blended early on with ``expected_step_seconds`` learned from completed
+    tasks of the same kind. The remaining slots hold the tracker's per-task
+    publish bookkeeping.
+    """
+    
+    __slots__ = (
+        "user_id", "kind", "total_steps", "current_step", "status", "details",
+        "started", "wall_started", "ended", "steps", "step_seconds", "expected_step_seconds",
+        "seq", "events", "last_sent", "last_publish", "last_log"
+    )
+    
+    def __init__(
+        self,
+        total_steps: int,
+        user_id: Optional[Any] = None,
+        kind: str = DEFAULT_KIND,
+        expected_step_seconds: Optional[float] = None
+    ):
+        self.user_id = user_id
+        self.kind = kind
+        self.total_steps = total_steps
+        self.current_step = 0
+        self.status = "pending"
+        self.details: Optional[Dict[str, Any]] = None
+        self.started = time.monotonic()
+        self.wall_started = time.time()
+        self.ended: Optional[float] = None
+        self.steps: Optional[deque] = None
+        self.step_seconds: Optional[float] = None
+        self.expected_step_seconds = expected_step_seconds
+        self.seq = 0
+        self.events: Optional[deque] = None
+        self.last_sent: Optional[Dict[str, Any]] = None
+        self.last_publish = float("-inf")
+        self.last_log = float("-inf")
+    
+    @property
+    def progress(self) -> float:
+        """Percentage of steps done"""
+        if not self.total_steps:
+            return 0.0
+        return (self.current_step / self.total_steps) * 100
+    
+    def record_step(self, step: int, now: Optional[float] = None) -> None:
+        """Move to ``step``, remembering when it was reached"""
+        now = now if now is not None else time.monotonic()
+        if self.steps is None:
+            self.steps = deque([(self.started, 0)], maxlen=settings.PROGRESS_HISTORY_SIZE)
+        if step > self.current_step:
+            duration = (now - self.steps[-1][0]) / (step - self.current_step)
+            if self.step_seconds is None:
+                self.step_seconds = duration
+            else:
+                alpha = settings.PROGRESS_EWMA_ALPHA
+                self.step_seconds = alpha * duration + (1 - alpha) * self.step_seconds
+        if step != self.current_step:
+            self.steps.append((now, step))
+        self.current_step = step
+    
+    def update_details(self, details: Dict[str, Any]) -> None:
+        """Merge details, dropping the oldest keys beyond ``PROGRESS_MAX_DETAILS``"""
+        if self.details is None:
+            self.details = {}
+        self.details.update(details)
+        while len(self.details) > settings.PROGRESS_MAX_DETAILS:
+            del self.details[next(iter(self.details))]
+    
+    def throughput(self) -> Optional[float]:
+        """Steps per second over the buffered step events"""
+        if not self.steps or len(self.steps) < 2:
+            return None
+        (first_time, first_step), (last_time, last_step) = self.steps[0], self.steps[-1]
+        if last_time <= first_time or last_step <= first_step:
+            return None
+        return (last_step - first_step) / (last_time - first_time)
+    
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated seconds until the last step
+
+        The observed step duration is trusted in proportion to the share of
+        steps already done; the rest of the weight goes to the historical
+        duration for this kind of task.
+        """
+        if self.status in TERMINAL_STATUSES:
+            return 0.0
+        per_step = self.step_seconds
+        if self.expected_step_seconds is not None:
+            if per_step is None:
+                per_step = self.expected_step_seconds
+            else:
+                weight = min(self.current_step / self.total_steps, 1.0) if self.total_steps else 1.0
+                per_step = weight * per_step + (1 - weight) * self.expected_step_seconds
+        if per_step is None:
+            return None
+        return max(self.total_steps - self.current_step, 0) * per_step
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready view in the shape progress clients consume"""
+        end_time = None
+        if self.ended is not None:
+            end_time = datetime.fromtimestamp(self.wall_started + self.ended - self.started).isoformat()
+        rate = self.throughput()
+        eta = self.eta_seconds()
+        return {
+            "user_id": self.user_id,
+            "total_steps": self.total_steps,
+            "current_step": self.current_step,
+            "status": self.status,
+            "start_time": datetime.fromtimestamp(self.wall_started).isoformat(),
+            "end_time": end_time,
+            "progress": self.progress,
+            "details": dict(self.details) if self.details else {},
+            "throughput": round(rate, 3) if rate is not None else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None
         }
+
+class ProgressTracker:
+    """Utility class for tracking task progress
+
+    Updates are coalesced per task: at most one message per
+    ``PROGRESS_MIN_INTERVAL`` seconds is published, always carrying the latest
+    state, and terminal states are published immediately. Messages after the
+    first only carry the fields that changed since the previous one. Every
+    published message carries a per-task ``seq`` and the last few are kept in
+    a ring buffer, so a reconnecting client can resume from the last ``seq``
+    it saw. Each task is a slotted ``TaskProgress`` record; status queries
+    return plain dict snapshots of it.
+
+    With a shared state backend, each published state is mirrored to the
+    backend and forwarded to the other workers, so a client connected to any
+    worker can follow a task running on another one.
+    """
+    
+    def __init__(self, state: Optional[SharedStateBackend] = None):
+        self._state = state if state is not None else shared_state
+        self._state.subscribe(PROGRESS_CHANNEL, self._on_remote_progress)
+        self._tasks: Dict[str, TaskProgress] = {}
+        self._pending_flush: Dict[str, asyncio.Task] = {}
+        # Task kind -> EWMA of (seconds per step, seconds per task) over completed tasks
+        self._history: Dict[str, Tuple[float, float]] = {}
+    
+    async def create_task(
+        self,
+        task_id: str,
+        total_steps: int,
+        user_id: Optional[Any] = None,
+        kind: str = DEFAULT_KIND
+    ) -> None:
+        """Create a new task with progress tracking
+
+        ``kind`` groups tasks whose durations are comparable; completed tasks
+        of the same kind seed the ETA of new ones. Subscribers of another user
+        that attached before the task existed are detached.
+        """
+        self._cancel_flush(task_id)
+        if user_id is not None:
+            for subscriber in progress_bus.subscribers(task_topic(task_id)):
+                if not self.may_follow(user_id, getattr(subscriber, "user_id", user_id)):
+                    progress_bus.unsubscribe(task_topic(task_id), subscriber)
+        history = self._history.get(kind)
+        self._tasks[task_id] = TaskProgress(
+            total_steps, user_id, kind=kind,
+            expected_step_seconds=history[0] if history else None
+        )
+        if self._state.shared:
+            self._state.set(TASK_NAMESPACE, task_id, self._tasks[task_id].to_dict())
         logger.info(f"Created task {task_id} with {total_steps} steps")
     
     async def update_progress(
@@ -38,18 +207,22 @@ class ProgressTracker:
             raise KeyError(f"Task {task_id} not found")
         
         task = self._tasks[task_id]
-        task["current_step"] = step
-        task["status"] = status
-        task["progress"] = (step / task["total_steps"]) * 100
+        task.record_step(step)
+        task.status = status
+        terminal = status in TERMINAL_STATUSES
+        if terminal:
+            task.ended = time.monotonic()
+            self._record_history(task)
         
         if details:
-            task["details"].update(details)
+            task.update_details(details)
         
-        # Notify websocket clients if connected
-        if task_id in self._websockets:
-            await self._notify_progress(task_id)
+        await self._notify_progress(task_id, force=terminal)
         
-        logger.info(f"Updated progress for task {task_id}: {task['progress']}%")
+        if terminal or self._should_log(task):
+            logger.info(f"Updated progress for task {task_id}: {task.progress}%")
+        else:
+            logger.debug(f"Updated progress for task {task_id}: {task.progress}%")
     
     async def complete_task(
         self,
@@ -62,69 +235,253 @@ class ProgressTracker:
             raise KeyError(f"Task {task_id} not found")
         
         task = self._tasks[task_id]
-        task["status"] = status
-        task["current_step"] = task["total_steps"]
-        task["progress"] = 100.0
-        task["end_time"] = datetime.now().isoformat()
+        task.record_step(task.total_steps)
+        task.status = status
+        task.ended = time.monotonic()
+        self._record_history(task)
         
         if details:
-            task["details"].update(details)
+            task.update_details(details)
         
-        # Notify websocket clients if connected
-        if task_id in self._websockets:
-            await self._notify_progress(task_id)
+        await self._notify_progress(task_id, force=True)
         
         logger.info(f"Completed task {task_id} with status: {status}")
     
+    def _record_history(self, task: TaskProgress) -> None:
+        """Fold a successfully completed task's duration into its kind's history"""
+        if task.status != "completed" or not task.total_steps or task.ended is None:
+            return
+        duration = task.ended - task.started
+        if duration <= 0:
+            return
+        sample = (duration / task.total_steps, duration)
+        previous = self._history.get(task.kind)
+        if previous is None:
+            self._history[task.kind] = sample
+        else:
+            alpha = settings.PROGRESS_HISTORY_ALPHA
+            self._history[task.kind] = (
+                alpha * sample[0] + (1 - alpha) * previous[0],
+                alpha * sample[1] + (1 - alpha) * previous[1]
+            )
+    
+    def expected_seconds(self, kind: str = DEFAULT_KIND) -> Optional[float]:
+        """Typical duration of a task of ``kind``, e.g. to order queues shortest job first"""
+        history = self._history.get(kind)
+        return history[1] if history else None
+    
+    async def estimate(self, task_id: str, kind: str = DEFAULT_KIND) -> Dict[str, Optional[float]]:
+        """ETA and throughput of a task
+
+        Tasks that are not being tracked (e.g. still queued) get the typical
+        duration of their kind as ETA.
+        """
+        try:
+            status = await self.get_task_status(task_id)
+        except KeyError:
+            expected = self.expected_seconds(kind)
+            return {"eta_seconds": round(expected, 1) if expected is not None else None, "throughput": None}
+        return {"eta_seconds": status.get("eta_seconds"), "throughput": status.get("throughput")}
+    
+    async def owner(self, task_id: str) -> Optional[Any]:
+        """User that owns a tracked task, or None if unknown or unowned"""
+        try:
+            return (await self.get_task_status(task_id)).get("user_id")
+        except KeyError:
+            return None
+    
+    @staticmethod
+    def may_follow(owner: Optional[Any], user_id: Any) -> bool:
+        """Whether ``user_id`` may receive progress of a task owned by ``owner``"""
+        return owner is None or str(owner) == str(user_id)
+    
     async def register_websocket(self, task_id: str, websocket: WebSocket) -> None:
-        """Register websocket for real-time progress updates"""
-        self._websockets[task_id] = websocket
+        """Register websocket for real-time progress updates
+
+        The subscriber first receives the full current state, since later
+        messages only carry changed fields.
+        """
+        progress_bus.subscribe(task_topic(task_id), websocket)
+        try:
+            await deliver(websocket, await self.full_payload(task_id))
+        except KeyError:
+            # Not created yet; the first published message will be a full one
+            pass
         logger.info(f"Registered websocket for task {task_id}")
     
-    async def unregister_websocket(self, task_id: str) -> None:
-        """Unregister websocket"""
-        if task_id in self._websockets:
-            del self._websockets[task_id]
-            logger.info(f"Unregistered websocket for task {task_id}")
+    async def register_user_websocket(self, user_id: Any, websocket: WebSocket) -> None:
+        """Register websocket for progress of all tasks owned by a user"""
+        progress_bus.subscribe(user_topic(user_id), websocket)
+        task_ids = [task_id for task_id, task in self._tasks.items() if task.user_id == user_id]
+        if self._state.shared:
+            task_ids += [
+                task_id for task_id, task in (await self._state.aitems(TASK_NAMESPACE)).items()
+                if task_id not in self._tasks and task.get("user_id") == user_id
+            ]
+        for task_id in task_ids:
+            await deliver(websocket, await self.full_payload(task_id))
+        logger.info(f"Registered websocket for user {user_id}")
     
-    async def _notify_progress(self, task_id: str) -> None:
-        """Send progress update to websocket client"""
-        if task_id not in self._websockets:
-            return
+    async def unregister_websocket(self, task_id: str, websocket: WebSocket) -> None:
+        """Unregister websocket from a task's updates"""
+        progress_bus.unsubscribe(task_topic(task_id), websocket)
+        logger.info(f"Unregistered websocket for task {task_id}")
+    
+    async def _notify_progress(self, task_id: str, force: bool = False) -> None:
+        """Publish now, or schedule one coalesced publish if rate limited"""
+        wait = self._tasks[task_id].last_publish + settings.PROGRESS_MIN_INTERVAL - time.monotonic()
+        if force or wait <= 0:
+            self._cancel_flush(task_id)
+            await self._publish(task_id)
+        elif task_id not in self._pending_flush:
+            self._pending_flush[task_id] = asyncio.create_task(self._flush_later(task_id, wait))
+    
+    async def _flush_later(self, task_id: str, delay: float) -> None:
+        """Publish the latest state once the rate limit window has passed"""
+        await asyncio.sleep(delay)
+        self._pending_flush.pop(task_id, None)
+        if task_id in self._tasks:
+            await self._publish(task_id)
+    
+    def _cancel_flush(self, task_id: str) -> None:
+        """Cancel a scheduled publish that is about to be superseded"""
+        pending = self._pending_flush.pop(task_id, None)
+        if pending and pending is not asyncio.current_task():
+            pending.cancel()
+    
+    async def _publish(self, task_id: str) -> None:
+        """Publish progress update to the task's and its owner's subscribers"""
+        task = self._tasks[task_id]
+        task.last_publish = time.monotonic()
+        topics = [task_topic(task_id)]
+        if task.user_id is not None:
+            topics.append(user_topic(task.user_id))
         
-        websocket = self._websockets[task_id]
-        try:
-            await websocket.send_json(self._tasks[task_id])
-        except Exception as e:
-            logger.error(f"Error sending progress update: {str(e)}")
-            await self.unregister_websocket(task_id)
+        payload = self._delta_payload(task_id)
+        self._record_event(task, payload)
+        if self._state.shared:
+            self._state.set(TASK_NAMESPACE, task_id, {**task.last_sent, "seq": task.seq})
+            self._state.publish(PROGRESS_CHANNEL, {"topics": topics, "message": payload})
+        
+        if progress_bus.has_subscribers(*topics):
+            await progress_bus.publish(payload, *topics)
     
-    def get_task_status(self, task_id: str) -> Dict[str, Any]:
-        """Get current task status"""
-        if task_id not in self._tasks:
+    def _record_event(self, task: TaskProgress, payload: Dict[str, Any]) -> None:
+        """Number a published message and keep it in the task's ring buffer"""
+        task.seq += 1
+        payload["seq"] = task.seq
+        if task.events is None:
+            task.events = deque(maxlen=settings.PROGRESS_EVENT_BUFFER_SIZE)
+        task.events.append(payload)
+    
+    def events_since(self, task_id: str, last_seq: int) -> Optional[List[Dict[str, Any]]]:
+        """Messages published after ``last_seq``
+
+        Returns None when some of them are no longer buffered (or the task is
+        not owned by this worker); the caller should then send a full
+        snapshot instead.
+        """
+        task = self._tasks.get(task_id)
+        if task is None or task.events is None or last_seq > task.seq:
+            return None
+        if last_seq == task.seq:
+            return []
+        if task.events[0]["seq"] > last_seq + 1:
+            return None
+        return [payload for payload in task.events if payload["seq"] > last_seq]
+    
+    async def _on_remote_progress(self, message: Dict[str, Any]) -> None:
+        """Deliver a progress message published by another worker to local subscribers"""
+        await progress_bus.publish(message["message"], *message["topics"])
+    
+    async def _remote_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """State of a task owned by another worker, if the backend is shared"""
+        if not self._state.shared:
+            return None
+        return await self._state.aget(TASK_NAMESPACE, task_id)
+    
+    async def full_payload(self, task_id: str) -> Dict[str, Any]:
+        """Message carrying the complete task state as of the latest published ``seq``
+
+        Later deltas are relative to that state, so state not yet published
+        (a pending coalesced update) is left for the next delta.
+        """
+        if task_id in self._tasks:
+            record = self._tasks[task_id]
+            task = record.last_sent or record.to_dict()
+            seq = record.seq
+        else:
+            task = await self._remote_task(task_id)
+            if task is None:
+                raise KeyError(f"Task {task_id} not found")
+            seq = task.get("seq", 0)
+        return {"type": "progress", "task_id": task_id, "full": True, **task, "seq": seq}
+    
+    def _delta_payload(self, task_id: str) -> Dict[str, Any]:
+        """Message carrying only fields changed since the last published one"""
+        task = self._tasks[task_id]
+        snapshot = task.to_dict()
+        previous = task.last_sent
+        task.last_sent = snapshot
+        if previous is None:
+            return {"type": "progress", "task_id": task_id, "full": True, **snapshot}
+        
+        changed = {key: value for key, value in snapshot.items() if previous.get(key) != value}
+        return {"type": "progress", "task_id": task_id, "full": False, **changed}
+    
+    def _should_log(self, task: TaskProgress) -> bool:
+        """Sample INFO progress logs to one per PROGRESS_LOG_INTERVAL per task"""
+        now = time.monotonic()
+        if now - task.last_log < settings.PROGRESS_LOG_INTERVAL:
+            return False
+        task.last_log = now
+        return True
+    
+    async def get_task_status(self, task_id: str) -> Dict[str, Any]:
+        """Get a snapshot of the current task status"""
+        if task_id in self._tasks:
+            return self._tasks[task_id].to_dict()
+        task = await self._remote_task(task_id)
+        if task is None:
             raise KeyError(f"Task {task_id} not found")
-        return self._tasks[task_id]
+        return task
+    
+    async def get_all_tasks(self) -> Dict[str, Dict[str, Any]]:
+        """Get snapshots of all tasks, including those owned by other workers"""
+        tasks = {task_id: task.to_dict() for task_id, task in self._tasks.items()}
+        if not self._state.shared:
+            return tasks
+        return {**(await self._state.aitems(TASK_NAMESPACE)), **tasks}
     
-    def get_all_tasks(self) -> Dict[str, Dict[str, Any]]:
-        """Get status of all tasks"""
-        return self._tasks
+    def task_count(self) -> int:
+        """Number of tasks tracked by this worker"""
+        return len(self._tasks)
     
-    def clear_completed_tasks(self, max_age_hours: int = 24) -> None:
-        """Clear completed tasks older than max_age_hours"""
-        current_time = datetime.now()
-        tasks_to_remove = []
+    async def clear_completed_tasks(self, max_age_hours: int = 24) -> int:
+        """Clear completed tasks older than max_age_hours; returns the number cleared"""
+        max_age = max_age_hours * 3600
+        now = time.monotonic()
+        tasks_to_remove = [
+            task_id for task_id, task in self._tasks.items()
+            if task.status in TERMINAL_STATUSES and task.ended is not None and now - task.ended > max_age
+        ]
         
-        for task_id, task in self._tasks.items():
-            if task["status"] in ["completed", "failed"]:
-                end_time = datetime.fromisoformat(task["end_time"])
-                age_hours = (current_time - end_time).total_seconds() / 3600
-                
-                if age_hours > max_age_hours:
+        if self._state.shared:
+            # Tasks left behind by workers that have gone away
+            current_time = datetime.now()
+            for task_id, task in (await self._state.aitems(TASK_NAMESPACE)).items():
+                if task_id in self._tasks or task["status"] not in TERMINAL_STATUSES or not task["end_time"]:
+                    continue
+                if (current_time - datetime.fromisoformat(task["end_time"])).total_seconds() > max_age:
                     tasks_to_remove.append(task_id)
         
         for task_id in tasks_to_remove:
-            del self._tasks[task_id]
+            self._tasks.pop(task_id, None)
+            self._cancel_flush(task_id)
+            if self._state.shared:
+                self._state.delete(TASK_NAMESPACE, task_id)
             logger.info(f"Cleared completed task {task_id}")
+        return len(tasks_to_remove)
 
 # Create global instance
 progress_tracker = ProgressTracker()
@@ -0,0 +1,378 @@
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from src.core.config import settings
+from src.config.logging import logger
+
+Handler = Callable[[Any], Awaitable[None]]
+
+# Overlay marker for a key deleted but not yet flushed
+_DELETED = object()
+
+class SharedStateBackend(ABC):
+    """Key/value state plus pub/sub shared between the workers of one deployment
+
+    Values live in namespaces (``tasks``, ``connections``, ``conversations``).
+    ``publish`` notifies the *other* workers on a channel; delivery to local
+    subscribers stays with the caller, so a worker never receives its own
+    messages back.
+    """
+
+    # Whether state and messages actually reach other worker processes
+    shared = False
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Get a value, or ``default`` if it does not exist"""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Create or replace a value"""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove a value if it exists"""
+
+    @abstractmethod
+    def items(self, namespace: str, prefix: str = "") -> Dict[str, Any]:
+        """All values in a namespace, or those whose key starts with ``prefix``"""
+
+    @abstractmethod
+    def publish(self, channel: str, message: Any) -> None:
+        """Notify the other workers on a channel"""
+
+    async def aget(self, namespace: str, key: str, default: Any = None) -> Any:
+        """``get`` for callers on the event loop"""
+        return self.get(namespace, key, default)
+
+    async def aitems(self, namespace: str, prefix: str = "") -> Dict[str, Any]:
+        """``items`` for callers on the event loop"""
+        return self.items(namespace, prefix)
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        """Call ``handler`` for every message other workers publish on a channel"""
+        self._handlers[channel].append(handler)
+
+    async def _dispatch(self, channel: str, message: Any) -> None:
+        """Run the local handlers for a message received from another worker"""
+        for handler in list(self._handlers.get(channel, ())):
+            try:
+                await handler(message)
+            except Exception as e:
+                logger.error(f"Error handling shared state message on {channel}: {str(e)}")
+
+    async def start(self) -> None:
+        """Start receiving messages from other workers"""
+        pass
+
+    async def stop(self) -> None:
+        """Stop receiving messages from other workers"""
+        pass
+
+class InMemorySharedState(SharedStateBackend):
+    """Process-local backend for a single worker"""
+
+    def __init__(self):
+        super().__init__()
+        self._data: Dict[str, Dict[str, Any]] = defaultdict(dict)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        return self._data[namespace].get(key, default)
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        self._data[namespace][key] = value
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._data[namespace].pop(key, None)
+
+    def items(self, namespace: str, prefix: str = "") -> Dict[str, Any]:
+        return {key: value for key, value in self._data[namespace].items() if key.startswith(prefix)}
+
+    def publish(self, channel: str, message: Any) -> None:
+        # There are no other workers to notify
+        pass
+
+class SQLiteSharedState(SharedStateBackend):
+    """Backend for several workers on one host, using a WAL-mode SQLite file
+
+    State is a key/value table. Messages are appended to an event table that
+    every worker polls for rows written by other workers; old events are
+    pruned after ``SHARED_STATE_EVENT_TTL_SECONDS``. No external service is
+    needed.
+
+    Writes never touch the database on the event loop: ``set``, ``delete``
+    and ``publish`` queue the statement and a background flush writes
+    everything queued so far in one transaction from a worker thread, on a
+    connection of its own. Until then, this worker's reads see its queued
+    values. Reads use a separate connection and, in WAL mode, never wait for
+    a writer. ``get`` and ``items`` still query the database, so code on the
+    event loop uses ``aget`` and ``aitems``, which answer from the queued
+    values or query from a worker thread. Without a running event loop
+    (scripts, tools) writes are flushed immediately.
+    """
+
+    shared = True
+
+    # Consecutive failed flushes before queued writes are given up
+    FLUSH_ATTEMPTS = 3
+
+    def __init__(self, path: str, poll_interval: Optional[float] = None, event_ttl: Optional[float] = None):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval if poll_interval is not None else settings.SHARED_STATE_POLL_INTERVAL
+        self.event_ttl = event_ttl if event_ttl is not None else settings.SHARED_STATE_EVENT_TTL_SECONDS
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        # Queued (statement, params, key, version) writes; version ties a write to its overlay entry
+        self._pending: deque = deque()
+        # (namespace, key) -> (version, value) for values written but not yet flushed
+        self._overlay: Dict[Tuple[str, str], Tuple[int, Any]] = {}
+        self._versions = itertools.count(1)
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_event_id = 0
+        self._last_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _open(self) -> sqlite3.Connection:
+        """Open a connection, creating the tables if needed"""
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, channel TEXT NOT NULL, "
+            "message TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_shared_events_created_at ON shared_events (created_at)")
+        return conn
+
+    def _execute(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """Run one read statement under the reader connection lock"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._open()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _queue_write(self, sql: str, params: Tuple, key: Optional[Tuple[str, str]] = None, value: Any = _DELETED) -> None:
+        """Queue a write for the background flush, exposing its value to local reads meanwhile"""
+        version = next(self._versions)
+        if key is not None:
+            self._overlay[key] = (version, value)
+        self._pending.append((sql, params, key, version))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            try:
+                self._forget(self.flush())
+            except Exception:
+                self._discard()
+                raise
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        """Flush queued writes from a worker thread, including those queued while flushing
+
+        A failed flush is retried after ``poll_interval``. After
+        ``FLUSH_ATTEMPTS`` failures in a row the queued writes are dropped
+        along with their overlay entries, so this worker goes back to serving
+        what the other workers see.
+        """
+        failures = 0
+        while self._pending:
+            try:
+                self._forget(await asyncio.to_thread(self.flush))
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures >= self.FLUSH_ATTEMPTS:
+                    logger.error(f"Dropping {len(self._pending)} shared state writes after {failures} failed flushes: {str(e)}")
+                    self._discard()
+                    return
+                logger.error(f"Error flushing shared state writes, retrying: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    def flush(self) -> List[Tuple[Tuple[str, str], int]]:
+        """Write every queued statement in one transaction; returns the flushed ``(key, version)`` pairs
+
+        If the transaction fails, the batch goes back to the front of the
+        queue, ahead of writes queued meanwhile, and the error is raised.
+        """
+        with self._write_lock:
+            batch = []
+            while self._pending:
+                batch.append(self._pending.popleft())
+            if not batch:
+                return []
+            try:
+                with self._transaction() as writer:
+                    for sql, params, _, _ in batch:
+                        writer.execute(sql, params)
+            except Exception:
+                self._pending.extendleft(reversed(batch))
+                raise
+            return [(key, version) for _, _, key, version in batch if key is not None]
+
+    def _discard(self) -> None:
+        """Drop every queued write and the overlay entries that exposed them"""
+        with self._write_lock:
+            batch = list(self._pending)
+            self._pending.clear()
+        self._forget([(key, version) for _, _, key, version in batch if key is not None])
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transaction on the writer connection; the caller holds the write lock"""
+        if self._writer is None:
+            self._writer = self._open()
+        self._writer.execute("BEGIN")
+        try:
+            yield self._writer
+            self._writer.execute("COMMIT")
+        except BaseException:
+            if self._writer.in_transaction:
+                self._writer.execute("ROLLBACK")
+            raise
+
+    def _forget(self, flushed: List[Tuple[Tuple[str, str], int]]) -> None:
+        """Drop overlay entries that are now in the database, unless rewritten meanwhile"""
+        for key, version in flushed:
+            entry = self._overlay.get(key)
+            if entry is not None and entry[0] == version:
+                del self._overlay[key]
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        entry = self._overlay.get((namespace, str(key)))
+        if entry is not None:
+            return default if entry[1] is _DELETED else entry[1]
+        rows = self._execute("SELECT value FROM shared_state WHERE namespace = ? AND key = ?", (namespace, str(key)))
+        return json.loads(rows[0][0]) if rows else default
+
+    async def aget(self, namespace: str, key: str, default: Any = None) -> Any:
+        entry = self._overlay.get((namespace, str(key)))
+        if entry is not None:
+            return default if entry[1] is _DELETED else entry[1]
+        return await asyncio.to_thread(self.get, namespace, key, default)
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        self._queue_write(
+            "INSERT INTO shared_state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (namespace, str(key), json.dumps(value, default=str), time.time()),
+            key=(namespace, str(key)), value=value
+        )
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._queue_write(
+            "DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, str(key)),
+            key=(namespace, str(key))
+        )
+
+    def items(self, namespace: str, prefix: str = "") -> Dict[str, Any]:
+        if prefix:
+            # Keys in [prefix, prefix with its last character incremented) start with prefix
+            rows = self._execute(
+                "SELECT key, value FROM shared_state WHERE namespace = ? AND key >= ? AND key < ?",
+                (namespace, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            )
+        else:
+            rows = self._execute("SELECT key, value FROM shared_state WHERE namespace = ?", (namespace,))
+        values = {key: json.loads(value) for key, value in rows}
+        for (entry_namespace, key), (_, value) in list(self._overlay.items()):
+            if entry_namespace != namespace or not key.startswith(prefix):
+                continue
+            if value is _DELETED:
+                values.pop(key, None)
+            else:
+                values[key] = value
+        return values
+
+    async def aitems(self, namespace: str, prefix: str = "") -> Dict[str, Any]:
+        return await asyncio.to_thread(self.items, namespace, prefix)
+
+    def publish(self, channel: str, message: Any) -> None:
+        self._queue_write(
+            "INSERT INTO shared_events (origin, channel, message, created_at) VALUES (?, ?, ?, ?)",
+            (self.worker_id, channel, json.dumps(message, default=str), time.time())
+        )
+
+    def poll(self) -> List[Tuple[str, Any]]:
+        """Fetch messages other workers published since the last poll"""
+        rows = self._execute(
+            "SELECT id, channel, message FROM shared_events WHERE id > ? AND origin != ? ORDER BY id",
+            (self._last_event_id, self.worker_id)
+        )
+        if rows:
+            self._last_event_id = rows[-1][0]
+
+        now = time.time()
+        if now - self._last_prune >= self.event_ttl:
+            with self._write_lock, self._transaction() as writer:
+                writer.execute("DELETE FROM shared_events WHERE created_at < ?", (now - self.event_ttl,))
+            self._last_prune = now
+
+        return [(channel, json.loads(message)) for _, channel, message in rows]
+
+    async def _poll_loop(self) -> None:
+        """Deliver messages from other workers to local handlers"""
+        while True:
+            try:
+                for channel, message in await asyncio.to_thread(self.poll):
+                    await self._dispatch(channel, message)
+            except Exception as e:
+                logger.error(f"Error polling shared state events: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self) -> None:
+        """Start polling, skipping events published before this worker started"""
+        if self._task is not None and not self._task.done():
+            return
+        rows = await asyncio.to_thread(self._execute, "SELECT COALESCE(MAX(id), 0) FROM shared_events")
+        self._last_event_id = rows[0][0]
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info(f"Shared state worker {self.worker_id} listening on {self.path}")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Write out whatever is still queued
+        self._forget(await asyncio.to_thread(self.flush))
+
+def create_shared_state(backend: Optional[str] = None) -> SharedStateBackend:
+    """Create the backend selected by ``SHARED_STATE_BACKEND``"""
+    backend = backend or settings.SHARED_STATE_BACKEND
+    if backend == "memory":
+        return InMemorySharedState()
+    if backend == "sqlite":
+        return SQLiteSharedState(settings.SHARED_STATE_PATH)
+    raise ValueError(f"Unknown shared state backend: {backend}")
+
+# Create global instance
+shared_state = create_shared_state()
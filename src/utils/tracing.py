@@ -0,0 +1,235 @@
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import asyncio
+import functools
+import itertools
+import json
+import os
+import re
+import threading
+import time
+
+from src.core.config import settings
+from src.config.logging import get_logger
+from src.utils.metrics import STAGE_SECONDS
+
+logger = get_logger(__name__)
+
+class Span:
+    """One timed stage of a task"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "duration", "attributes", "status", "thread_id")
+
+    def __init__(self, trace_id: str, span_id: int, parent_id: Optional[int], name: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.thread_id = threading.get_ident()
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        """Span relative to ``origin`` (the start of the trace), in milliseconds"""
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+    def to_trace_event(self) -> Dict[str, Any]:
+        """Span as a complete event of the Chrome/Perfetto Trace Event Format"""
+        return {
+            "name": self.name,
+            "cat": self.trace_id,
+            "ph": "X",
+            "ts": int(self.start * 1e6),
+            "dur": int((self.duration or 0) * 1e6),
+            "pid": os.getpid(),
+            "tid": self.thread_id,
+            "args": {**self.attributes, "status": self.status, "span_id": self.span_id, "parent_id": self.parent_id}
+        }
+
+# 目前的任務與 span；asyncio 任務與執行緒池會複製這些值，所以會沿著呼叫鏈傳遞
+_current_trace: ContextVar[Optional[str]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class Tracer:
+    """Records spans per task, keyed by task id
+
+    A trace is opened with ``trace(task_id)`` (usually in the request
+    handler) and stages inside it call ``span(name)``. Outside a trace,
+    ``span`` does nothing, so instrumented code costs one context-var lookup
+    when nobody is tracing it. Only the most recent tasks and spans are kept.
+    """
+
+    def __init__(self):
+        self._traces: "OrderedDict[str, deque]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, task_id: Any, name: Optional[str] = None, **attributes: Any):
+        """Make ``task_id`` the current trace, optionally inside a root span"""
+        token = _current_trace.set(str(task_id))
+        try:
+            if name is None:
+                yield
+            else:
+                with self.span(name, **attributes) as span:
+                    yield span
+        finally:
+            _current_trace.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        """Time the ``with`` block as a stage of the current trace"""
+        trace_id = _current_trace.get()
+        if trace_id is None or not settings.TRACING_ENABLED:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(trace_id, next(self._ids), parent.span_id if parent and parent.trace_id == trace_id else None, name, attributes)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            span.attributes["error"] = repr(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._record(span)
+            if span.parent_id is None and settings.TRACE_EXPORT_DIR:
+                self._schedule_export(trace_id)
+
+    def record(self, task_id: Any, name: str, start: float, duration: float, **attributes: Any) -> None:
+        """Record a span measured elsewhere, e.g. time spent waiting in a queue"""
+        if not settings.TRACING_ENABLED:
+            return
+        trace_id = str(task_id)
+        parent = _current_span.get()
+        span = Span(trace_id, next(self._ids), parent.span_id if parent and parent.trace_id == trace_id else None, name, attributes)
+        span.start = start
+        span.duration = duration
+        self._record(span)
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = deque(maxlen=settings.TRACE_MAX_SPANS_PER_TASK)
+                while len(self._traces) > settings.TRACE_MAX_TASKS:
+                    self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(span.trace_id)
+            spans.append(span)
+
+    def spans(self, task_id: Any) -> List[Span]:
+        """Finished spans of a task in start order"""
+        with self._lock:
+            spans = list(self._traces.get(str(task_id), ()))
+        return sorted(spans, key=lambda span: (span.start, span.span_id))
+
+    def timeline(self, task_id: Any) -> Optional[Dict[str, Any]]:
+        """Stage timeline of a task, or None if nothing was traced for it"""
+        spans = self.spans(task_id)
+        if not spans:
+            return None
+        origin = spans[0].start
+        end = max(span.start + (span.duration or 0) for span in spans)
+        return {
+            "task_id": str(task_id),
+            "start_time": origin,
+            "duration_ms": round((end - origin) * 1000, 3),
+            "spans": [span.to_dict(origin) for span in spans]
+        }
+
+    def trace_events(self, task_id: Any) -> Dict[str, Any]:
+        """Spans of a task in the Trace Event Format (chrome://tracing, Perfetto)"""
+        return {
+            "traceEvents": [span.to_trace_event() for span in self.spans(task_id)],
+            "displayTimeUnit": "ms"
+        }
+
+    def export(self, task_id: Any, directory: Optional[str] = None) -> str:
+        """Write a task's trace to ``<directory>/<task_id>.trace.json``"""
+        directory = directory or settings.TRACE_EXPORT_DIR
+        os.makedirs(directory, exist_ok=True)
+        # 任務 ID 可能來自客戶端，只保留安全字元避免寫到目錄之外
+        filename = re.sub(r"[^A-Za-z0-9_-]", "_", str(task_id))
+        path = os.path.join(directory, f"{filename}.trace.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace_events(task_id), f, default=str)
+        return path
+
+    def _export_quietly(self, task_id: str) -> None:
+        try:
+            self.export(task_id)
+        except OSError as e:
+            logger.error(f"Error exporting trace for {task_id}: {str(e)}")
+
+    def _schedule_export(self, task_id: str) -> None:
+        """Export off the event loop when one is running"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._export_quietly(task_id)
+            return
+        loop.run_in_executor(None, self._export_quietly, task_id)
+
+    def clear(self, task_id: Any) -> None:
+        with self._lock:
+            self._traces.pop(str(task_id), None)
+
+def current_trace() -> Optional[str]:
+    """Task id of the current trace, if any"""
+    return _current_trace.get()
+
+def propagate(func: Callable, task_id: Any = None) -> Callable:
+    """Carry the current trace into work that runs later, e.g. a background task
+
+    The returned callable re-enters the trace (or ``task_id``) when it runs
+    and records the wait between hand-off and start as a ``queue`` span.
+    """
+    trace_id = str(task_id) if task_id is not None else _current_trace.get()
+    if trace_id is None:
+        return func
+    enqueued = time.time()
+
+    def _enter():
+        tracer.record(trace_id, "queue", enqueued, time.time() - enqueued)
+        return tracer.trace(trace_id, getattr(func, "__name__", "job"))
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def run_async(*args, **kwargs):
+            with _enter():
+                return await func(*args, **kwargs)
+        return run_async
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with _enter():
+            return func(*args, **kwargs)
+    return run
+
+# Create global instance
+tracer = Tracer()
+
+@contextmanager
+def stage(name: str, **attributes: Any):
+    """Processing stage: a span in the current trace and a stage duration metric"""
+    with STAGE_SECONDS.time(stage=name), tracer.span(name, **attributes) as span:
+        yield span
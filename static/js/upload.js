@@ -130,11 +130,12 @@ uploadButton.addEventListener('click', function() {
     const formData = new FormData();
     formData.append('file', file);
     formData.append('task_id', task_id);
-    // 發送上傳請求
-    fetch('/api/upload', {
+    // 先訂閱進度推送再發送上傳請求，避免錯過早期的進度訊息
+    watchProgress(task_id)
+    .then(() => fetch('/api/upload', {
         method: 'POST',
         body: formData
-    })
+    }))
     .then(res => res.json())
     .then(data => {
         if (data.success) {
@@ -0,0 +1,34 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+
+class FakeWebSocket:
+    """可模擬慢速客戶端的假 WebSocket"""
+    def __init__(self, delay: float = 0.0, subprotocols=(), host: str = "127.0.0.1"):
+        self.delay = delay
+        self.client = SimpleNamespace(host=host)
+        self.sent = []
+        self.binary = []
+        self.closed_with = None
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.accepted_subprotocol = None
+
+    async def accept(self, subprotocol=None):
+        self.accepted_subprotocol = subprotocol
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await asyncio.sleep(self.delay)
+        self.binary.append(data)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+@pytest.fixture
+def fake_websocket():
+    """回傳建立假 WebSocket 的工廠，參數同 FakeWebSocket"""
+    return FakeWebSocket
@@ -0,0 +1,86 @@
+import io
+import struct
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from src.core.config import settings
+from src.models.base import ensure_columns
+from src.models.task import Task
+from src.utils.audio_probe import probe_stream
+from src.utils.error_handler import FileValidationError
+
+def _wav(sample_rate=22050, channels=2, bits=16, seconds=1.5, extra_chunk=b""):
+    data_size = int(sample_rate * seconds) * channels * bits // 8
+    block = channels * bits // 8
+    fmt = b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * block, block, bits)
+    body = b"WAVE" + fmt + extra_chunk + b"data" + struct.pack("<I", data_size) + bytes(data_size)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+def _mp3(frames=100, id3_size=0, xing_frames=None):
+    # MPEG-1 Layer III、128 kbit/s、44.1 kHz、立體聲：每框 417 位元組
+    header = b"\xff\xfb\x90\x00"
+    frame = header + bytes(413)
+    audio = frame * frames
+    if xing_frames is not None:
+        audio = header + bytes(32) + b"Xing" + struct.pack(">II", 1, xing_frames) + bytes(413 - 44) + audio
+    tag = b""
+    if id3_size:
+        size = bytes([(id3_size >> 21) & 0x7F, (id3_size >> 14) & 0x7F, (id3_size >> 7) & 0x7F, id3_size & 0x7F])
+        tag = b"ID3\x04\x00\x00" + size + bytes(id3_size)
+    return tag + audio
+
+def _ogg_page(granule, packet, serial=7):
+    return (b"OggS\x00\x02" + struct.pack("<qIII", granule, serial, 0, 0)
+            + bytes([1, len(packet)]) + packet)
+
+def test_probe_wav():
+    """測試 WAV 由 fmt 與 data 區塊取得格式與長度，可跳過中間的其他區塊"""
+    info = probe_stream(io.BytesIO(_wav(extra_chunk=b"LIST" + struct.pack("<I", 20000) + bytes(20000))))
+    assert (info.container, info.codec, info.sample_rate, info.channels, info.bits_per_sample) == ("wav", "pcm", 22050, 2, 16)
+    assert info.duration == pytest.approx(1.5)
+
+def test_probe_mp3_cbr_and_vbr():
+    """測試 MP3 跳過 ID3 標籤後找到框同步，CBR 以檔案大小、VBR 以 Xing 框數估計長度"""
+    info = probe_stream(io.BytesIO(_mp3(frames=100, id3_size=20000)))
+    assert (info.container, info.codec, info.sample_rate, info.channels, info.bitrate) == ("mp3", "mp3", 44100, 2, 128000)
+    assert info.duration == pytest.approx(100 * 417 * 8 / 128000)
+
+    info = probe_stream(io.BytesIO(_mp3(frames=10, xing_frames=1000)))
+    assert info.duration == pytest.approx(1000 * 1152 / 44100)
+
+def test_probe_ogg_vorbis_and_opus():
+    """測試 Ogg 由識別標頭取得編碼，並以最後一頁的 granule position 計算長度"""
+    vorbis = b"\x01vorbis" + struct.pack("<IBIiIi", 0, 1, 48000, 0, 96000, 0) + b"\x01"
+    data = _ogg_page(0, vorbis) + bytes(5000) + _ogg_page(48000 * 3, b"x")
+    info = probe_stream(io.BytesIO(data))
+    assert (info.codec, info.sample_rate, info.channels, info.bitrate) == ("vorbis", 48000, 1, 96000)
+    assert info.duration == pytest.approx(3.0)
+
+    opus = b"OpusHead" + struct.pack("<BBHIhB", 1, 2, 312, 16000, 0, 0)
+    info = probe_stream(io.BytesIO(_ogg_page(0, opus) + _ogg_page(312 + 48000 * 2, b"x")))
+    assert (info.codec, info.sample_rate, info.channels) == ("opus", 16000, 2)
+    assert info.duration == pytest.approx(2.0)
+
+@pytest.mark.parametrize("data", [b"not audio at all, just renamed text", b"RIFF....WAVEfmt ", b"ID3" + bytes(200), b""])
+def test_probe_rejects_non_audio(data):
+    """測試改副檔名的檔案、截斷的檔頭與找不到 MPEG 框的檔案都被拒絕，且檔案指標移回開頭"""
+    stream = io.BytesIO(data)
+    with pytest.raises(FileValidationError):
+        probe_stream(stream)
+    assert stream.tell() == 0
+
+def test_probe_wav_chunk_limit(monkeypatch):
+    """測試 data 區塊前的區塊數超過上限時直接拒絕，不再逐一走訪"""
+    monkeypatch.setattr(settings, "AUDIO_PROBE_MAX_CHUNKS", 16)
+    assert probe_stream(io.BytesIO(_wav(extra_chunk=b"JUNK" + bytes(4)))).channels == 2
+    with pytest.raises(FileValidationError) as excinfo:
+        probe_stream(io.BytesIO(_wav(extra_chunk=(b"JUNK" + bytes(4)) * 100000)))
+    assert excinfo.value.context["max_chunks"] == 16
+
+def test_ensure_columns_adds_missing_nullable_column(tmp_path):
+    """測試既有資料表缺少的可為空欄位會被補上"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE tasks (id INTEGER PRIMARY KEY, input_file VARCHAR NOT NULL)"))
+    ensure_columns(engine, tables=[Task.__table__])
+    assert "audio_info" in {column["name"] for column in inspect(engine).get_columns("tasks")}
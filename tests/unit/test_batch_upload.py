@@ -0,0 +1,66 @@
+import asyncio
+import os
+import pytest
+from sqlalchemy import event
+
+from benchmarks.harness import local_app, payload
+from src.services.voice_service import PROCESSING_KIND, voice_service
+from src.utils.progress_tracker import progress_tracker
+
+@pytest.fixture
+def client(monkeypatch):
+    async def skip_processing(*args, **kwargs):
+        return None
+    # TestClient 會同步執行背景工作，這裡只驗證上傳本身
+    monkeypatch.setattr(voice_service, "process_audio", skip_processing)
+    with local_app() as client:
+        yield client
+
+def _files(count, start=0):
+    return [("files", (f"clip_{i}.wav", payload(4096, seed=i), "audio/wav")) for i in range(start, start + count)]
+
+def test_batch_upload_single_insert(client):
+    """測試所有任務以一個 INSERT 寫入，且回傳的任務與儲存的檔案一一對應"""
+    statements = []
+    engine = client.bench_session.kw["bind"]
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    response = client.post("/api/upload/batch", files=_files(20))
+    assert response.status_code == 200
+    tasks = response.json()
+    assert len({task["id"] for task in tasks}) == 20
+    assert [s.split()[0] for s in statements].count("INSERT") == 1
+    for i, task in enumerate(tasks):
+        with open(task["input_file"], "rb") as f:
+            assert f.read() == payload(4096, seed=i)
+        assert task["audio_info"]["container"] == "wav"
+
+def test_batch_upload_partial_success(client):
+    """測試個別檔案失敗不影響其他檔案，全部失敗時回傳 400"""
+    bad = [("files", ("renamed.wav", b"plain text", "audio/wav")), ("files", ("notes.txt", b"x", "text/plain"))]
+    response = client.post("/api/upload/batch", files=_files(3) + bad)
+    assert response.status_code == 207
+    body = response.json()
+    assert len(body["tasks"]) == 3
+    assert [failure["filename"] for failure in body["failed"]] == ["renamed.wav", "notes.txt"]
+    assert len(os.listdir(os.path.join(client.bench_root, "upload_dir"))) == 3
+
+    response = client.post("/api/upload/batch", files=bad)
+    assert response.status_code == 400
+    assert len(os.listdir(os.path.join(client.bench_root, "upload_dir"))) == 3
+
+def test_task_list_eta_for_processing_tasks(monkeypatch):
+    """測試批次任務以 DB 任務 ID 追蹤處理進度，任務列表由同類歷史得到 ETA"""
+    monkeypatch.setattr(voice_service, "step_seconds", 0.05)
+    with local_app() as client:
+        # 第一批實際處理完成，留下處理耗時的歷史
+        done = client.post("/api/upload/batch", files=_files(1)).json()[0]
+        assert asyncio.run(progress_tracker.get_task_status(str(done["id"])))["status"] == "completed"
+        assert progress_tracker.expected_seconds(PROCESSING_KIND) > 0
+
+        async def skip_processing(*args, **kwargs):
+            return None
+        monkeypatch.setattr(voice_service, "process_audio", skip_processing)
+        queued = client.post("/api/upload/batch", files=_files(1, start=1)).json()[0]
+        tasks = {task["id"]: task for task in client.get("/api/tasks").json()}
+        assert tasks[queued["id"]]["eta_seconds"] > 0
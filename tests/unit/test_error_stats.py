@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models.base import Base
+from src.models.error_history import ErrorHistory, ErrorStatsRollup, stats_bucket
+from src.utils.error_handler import ErrorHandler
+
+@pytest.fixture
+def handler():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    handler = ErrorHandler()
+    handler.engine = engine
+    handler.Session = sessionmaker(bind=engine)
+    return handler
+
+def test_stats_bucket():
+    """測試時間對齊到整點"""
+    assert stats_bucket(datetime(2024, 1, 1, 13, 59, 59, 999)) == datetime(2024, 1, 1, 13)
+
+def test_record_error_updates_rollup(handler):
+    """測試寫入錯誤時增量更新統計"""
+    handler.record_error("a.wav", "upload", "檔案上傳成功", correction_status="成功")
+    handler.record_error("b.wav", "upload", "檔案大小超過限制", correction_status="failed")
+    handler.record_error("c.wav", "upload", "檔案大小超過限制", correction_status="failed")
+    handler.record_error("", "runtime", "boom")
+
+    stats = handler.get_error_stats(datetime.utcnow() - timedelta(hours=1))
+    assert stats["by_type"] == {"upload": 3, "runtime": 1}
+    assert stats["correction_success_rate"] == pytest.approx(1 / 3)
+
+def test_status_change_moves_count(handler):
+    """測試修正狀態變更時統計跟著移動"""
+    handler.record_error("", "runtime", "boom")
+    session = handler.Session()
+    error_id = session.query(ErrorHistory.id).scalar()
+    session.close()
+
+    handler.update_correction_status(error_id, "completed")
+    stats = handler.get_error_stats(datetime.utcnow() - timedelta(hours=1))
+    statuses = {row["correction_status"]: row["error_count"] for row in stats["buckets"]}
+    assert statuses == {"completed": 1}
+    assert stats["correction_success_rate"] == 1.0
+
+def test_status_change_without_rollup_row_stays_non_negative(handler):
+    """測試舊狀態沒有彙總列（彙總建立前的錯誤或已清理的桶）時不會出現負數"""
+    handler.record_error("", "runtime", "boom")
+    session = handler.Session()
+    error_id = session.query(ErrorHistory.id).scalar()
+    session.query(ErrorStatsRollup).delete()
+    session.commit()
+    session.close()
+
+    handler.update_correction_status(error_id, "completed")
+    session = handler.Session()
+    counts = {row.correction_status: row.error_count for row in session.query(ErrorStatsRollup)}
+    session.close()
+    assert counts == {"completed": 1}
+
+def test_rebuild_matches_incremental(handler):
+    """測試重建結果與增量維護一致"""
+    for i in range(5):
+        handler.record_error(f"{i}.wav", "upload", "x", correction_status="failed" if i % 2 else "成功")
+    before = handler.get_error_stats(datetime.utcnow() - timedelta(hours=1))
+
+    handler.rebuild_error_stats()
+    after = handler.get_error_stats(datetime.utcnow() - timedelta(hours=1))
+    assert after["buckets"] == before["buckets"]
+
+    session = handler.Session()
+    assert session.query(ErrorStatsRollup).count() == 2
+    session.close()
@@ -0,0 +1,91 @@
+import io
+import os
+import threading
+import pytest
+from fastapi import UploadFile
+from pydantic import ValidationError
+
+from src.core.config import Settings, settings
+from src.utils.file_manager import FileManager
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    for name in ("UPLOAD_DIR", "PREVIEW_DIR", "DOWNLOAD_DIR"):
+        monkeypatch.setattr(settings, name, str(tmp_path / name.lower()))
+    return FileManager()
+
+def _upload(data, filename="clip.wav"):
+    return UploadFile(io.BytesIO(data), filename=filename)
+
+@pytest.mark.asyncio
+async def test_save_runs_off_event_loop(manager, monkeypatch):
+    """測試寫檔在其他執行緒中以設定的區塊大小進行，內容完整"""
+    monkeypatch.setattr(settings, "FILE_WRITE_BUFFER_SIZE", 4096)
+    threads = []
+    copy = manager._copy
+    def recording_copy(source, file_path):
+        threads.append(threading.get_ident())
+        return copy(source, file_path)
+    monkeypatch.setattr(manager, "_copy", recording_copy)
+
+    data = os.urandom(10000)
+    file = _upload(data)
+    await file.read(100)  # 指標不在開頭也要從頭保存
+    path = await manager.save_upload_file(file)
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert path.startswith(manager.upload_dir)
+    assert threads and threads[0] != threading.get_ident()
+
+def test_copy_writes_through_buffered_writer(manager, monkeypatch, tmp_path):
+    """測試寫檔經過 BufferedWriter，原始 write 的部分寫入會被補齊而不截斷"""
+    from src.utils import file_manager as file_manager_module
+    opened = []
+    def recording_open(*args, **kwargs):
+        f = open(*args, **kwargs)
+        opened.append(f)
+        return f
+    monkeypatch.setattr(file_manager_module, "open", recording_open, raising=False)
+
+    data = os.urandom(10000)
+    path = manager._copy(io.BytesIO(data), str(tmp_path / "out.bin"))
+    assert isinstance(opened[0], io.BufferedWriter)
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+def test_write_buffer_setting_accepts_old_name(monkeypatch):
+    """測試寫入區塊大小仍可用舊名 UPLOAD_WRITE_BUFFER_SIZE 設定"""
+    monkeypatch.setenv("UPLOAD_WRITE_BUFFER_SIZE", "8192")
+    assert Settings().FILE_WRITE_BUFFER_SIZE == 8192
+    monkeypatch.setenv("FILE_WRITE_BUFFER_SIZE", "16384")
+    assert Settings().FILE_WRITE_BUFFER_SIZE == 16384
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("policy,expected", [("none", 0), ("file", 1), ("dir", 2)])
+async def test_fsync_policy(manager, monkeypatch, policy, expected):
+    """測試 fsync 策略：none 不落盤，file 落盤檔案，dir 再加上目錄"""
+    monkeypatch.setattr(settings, "FILE_FSYNC_POLICY", policy)
+    calls = []
+    monkeypatch.setattr(os, "fsync", calls.append)
+    await manager.generate_preview_url(_upload(b"RIFF"))
+    assert len(calls) == expected
+
+def test_fsync_policy_rejects_unknown_value(monkeypatch):
+    """測試拼錯的 fsync 策略在載入設定時就被拒絕，而不是默默不落盤"""
+    monkeypatch.setenv("FILE_FSYNC_POLICY", "always")
+    with pytest.raises(ValidationError):
+        Settings()
+
+@pytest.mark.asyncio
+async def test_batch_download_links_outputs(manager, tmp_path):
+    """測試批次下載目錄以硬連結放入已完成任務的輸出檔，略過不存在的檔案"""
+    output = tmp_path / "out.wav"
+    output.write_bytes(b"data")
+    class DoneTask:
+        output_file = str(output)
+    class MissingTask:
+        output_file = str(tmp_path / "missing.wav")
+    url = await manager.generate_batch_download_url([DoneTask(), MissingTask()])
+    batch_dir = os.path.join(manager.download_dir, url.rsplit("/", 1)[1])
+    assert os.listdir(batch_dir) == ["out.wav"]
+    assert os.path.samefile(os.path.join(batch_dir, "out.wav"), output)
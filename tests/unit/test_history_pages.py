@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models.base import Base
+from src.models.error_history import ErrorHistory, CorrectionHistory
+from src.utils.error_handler import ErrorHandler
+
+@pytest.fixture
+def handler():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    handler = ErrorHandler()
+    handler.engine = engine
+    handler.Session = sessionmaker(bind=engine)
+
+    session = handler.Session()
+    for i in range(5):
+        error = ErrorHistory(
+            file_path=f"uploads/{i}.wav",
+            error_type="upload",
+            error_message=f"error {i}",
+            stack_trace="Traceback ..." * 100,
+            additional_info={"index": i}
+        )
+        session.add(error)
+        session.flush()
+        session.add(CorrectionHistory(
+            error_id=error.id,
+            success=1,
+            applied_fixes=[{"type": "syntax_fix"}, {"type": "runtime_fix"}],
+            remaining_issues=[],
+            verification_result={"success": True, "message": "修正驗證通過"}
+        ))
+    session.commit()
+    session.close()
+    return handler
+
+def test_error_history_page_excludes_detail_columns(handler):
+    """測試錯誤歷史列表不包含堆疊追蹤"""
+    errors, next_cursor = handler.get_error_history_page(limit=3)
+    assert len(errors) == 3
+    assert next_cursor is not None
+    assert "stack_trace" not in errors[0]
+    assert "additional_info" not in errors[0]
+
+    rest, next_cursor = handler.get_error_history_page(limit=3, cursor=next_cursor)
+    assert len(rest) == 2
+    assert next_cursor is None
+
+def test_correction_history_page_summaries(handler):
+    """測試修正歷史列表只回傳 JSON 摘要"""
+    corrections, _ = handler.get_correction_history_page(limit=10)
+    assert len(corrections) == 5
+    first = corrections[0]
+    assert first["applied_fix_count"] == 2
+    assert first["remaining_issue_count"] == 0
+    assert first["verified"] is True
+    assert first["error_type"] == "upload"
+    assert "applied_fixes" not in first
+
+def test_detail_lookup(handler):
+    """測試依 ID 取得完整詳細資料"""
+    errors, _ = handler.get_error_history_page(limit=1)
+    detail = handler.get_error_detail(errors[0]["id"])
+    assert detail["stack_trace"].startswith("Traceback")
+
+    corrections, _ = handler.get_correction_history_page(limit=1)
+    detail = handler.get_correction_detail(corrections[0]["id"])
+    assert len(detail["applied_fixes"]) == 2
+    assert handler.get_correction_detail(9999) is None
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+from src.utils.error_handler import ErrorHandler
+from src.utils.lazy_import import warm_up
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def test_config_import_has_no_side_effects(tmp_path):
+    """測試匯入設定不會建立目錄"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", "import src.core.config"], cwd=tmp_path, env=env, check=True)
+    assert os.listdir(tmp_path) == []
+
+def test_error_handler_connects_on_first_use():
+    """測試建立錯誤處理器時不連線資料庫"""
+    handler = ErrorHandler()
+    assert handler._engine is None
+    assert handler.engine is ErrorHandler().engine
+
+def test_warm_up_skips_missing_modules():
+    """測試預先載入時缺少的選用模組會被略過"""
+    sys.modules.pop("colorsys", None)
+    timings = warm_up(["colorsys", "no_such_module_for_warm_up"])
+    assert list(timings) == ["colorsys"]
+    assert "colorsys" in sys.modules
+
+def test_logging_import_has_no_side_effects(tmp_path):
+    """測試匯入日誌模組不會建立日誌目錄或啟動寫入執行緒"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    code = "import threading, src.config.logging; assert threading.active_count() == 1"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, check=True)
+    assert os.listdir(tmp_path) == []
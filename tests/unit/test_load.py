@@ -0,0 +1,28 @@
+import argparse
+import pytest
+
+from benchmarks.load import _parse_mix, find_saturation, percentile
+
+def _level(users, rps, p95=100.0, error_rate=0.0):
+    return {"users": users, "throughput_rps": rps, "p95_ms": p95, "error_rate": error_rate}
+
+def test_percentile_uses_nearest_rank():
+    """測試百分位數取排序後的對應樣本，空樣本回傳 None"""
+    ordered = [float(i) for i in range(1, 101)]
+    assert percentile(ordered, 0.5) == 51.0
+    assert percentile(ordered, 0.99) == 100.0
+    assert percentile([], 0.5) is None
+
+def test_find_saturation_reasons():
+    """測試飽和點依錯誤率、p95 與吞吐量停滯判定"""
+    growing = [_level(1, 10), _level(3, 30), _level(5, 50)]
+    assert find_saturation(growing, slo_ms=1000, max_error_rate=0.01) is None
+    assert find_saturation(growing + [_level(10, 51)], 1000, 0.01)["users"] == 10
+    assert find_saturation([_level(1, 10), _level(3, 30, p95=1500)], 1000, 0.01)["reason"].startswith("p95")
+    assert find_saturation([_level(1, 10, error_rate=0.2)], 1000, 0.01)["users"] == 1
+
+def test_parse_mix():
+    """測試情境權重解析，未知情境會被拒絕"""
+    assert _parse_mix("poll=5,upload") == {"poll": 5.0, "upload": 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        _parse_mix("poll=1,nope=2")
@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+
+from src.core.config import settings
+from src.config.logging import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, setup_logging, stop_logging
+
+def _record(name, level=logging.INFO, msg="hello"):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+def test_sampling_filter():
+    """測試依 logger 取樣，子 logger 沿用設定，警告以上不取樣"""
+    sampler = SamplingFilter({"src.utils.progress_tracker": 0.25, "noisy": 0})
+    kept = [sampler.filter(_record("src.utils.progress_tracker")) for _ in range(8)]
+    assert kept.count(True) == 2
+    child = [sampler.filter(_record("src.utils.progress_tracker.child")) for _ in range(4)]
+    assert child.count(True) == 1
+    assert sampler.filter(_record("src.utils.progress_tracker", logging.WARNING)) is True
+    assert sampler.filter(_record("noisy")) is False
+    assert sampler.filter(_record("src.api")) is True
+
+def test_json_formatter():
+    """測試 JSON 格式輸出"""
+    entry = json.loads(JsonFormatter().format(_record("src.api", msg="上傳完成")))
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "src.api"
+    assert entry["message"] == "上傳完成"
+
+def test_full_queue_drops_instead_of_blocking():
+    """測試佇列已滿時丟棄紀錄而不阻塞"""
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    handler.handle(_record("src"))
+    handler.handle(_record("src"))
+    assert handler.dropped == 1
+
+def test_single_attachment_point(tmp_path, monkeypatch):
+    """測試重複設定後只有根 logger 掛載一個佇列處理器"""
+    monkeypatch.setattr(settings, "LOG_FILE", str(tmp_path / "logs" / "app.log"))
+    setup_logging()
+    root = setup_logging()
+    assert [type(h) for h in root.handlers].count(NonBlockingQueueHandler) == 1
+    assert logging.getLogger("src").handlers == []
+    assert logging.getLogger("uvicorn.access").propagate is True
+    stop_logging()
+    assert NonBlockingQueueHandler not in [type(h) for h in root.handlers]
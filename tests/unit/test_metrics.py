@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.api.metrics import REQUEST_SECONDS, MetricsMiddleware
+from src.models.base import COMMIT_SECONDS
+from src.utils.metrics import MetricsRegistry
+
+def test_histogram_exposition():
+    """測試直方圖以累計桶輸出"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2):
+        histogram.observe(value, stage="denoise")
+
+    text = registry.render()
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="denoise",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="denoise",le="1"} 2' in text
+    assert 'stage_seconds_bucket{stage="denoise",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="denoise"} 3' in text
+
+def test_counter_labels_and_registry():
+    """測試計數器標籤與重複註冊"""
+    registry = MetricsRegistry()
+    counter = registry.counter("bytes_total", "Bytes", ("endpoint",))
+    counter.inc(10, endpoint="upload")
+    counter.inc(5, endpoint="upload")
+    assert registry.counter("bytes_total", "Bytes", ("endpoint",)) is counter
+    assert 'bytes_total{endpoint="upload"} 15' in registry.render()
+    with pytest.raises(ValueError):
+        registry.gauge("bytes_total", "Bytes")
+    with pytest.raises(ValueError):
+        counter.inc(1)
+
+def test_request_latency_labelled_by_route():
+    """測試請求延遲以路由樣板而非實際網址標記"""
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    before = REQUEST_SECONDS.count(method="GET", route="/items/{item_id}", status="200")
+    client.get("/items/1")
+    client.get("/items/2")
+    assert REQUEST_SECONDS.count(method="GET", route="/items/{item_id}", status="200") == before + 2
+
+def test_commit_latency_recorded():
+    """測試資料庫提交延遲會被記錄"""
+    session = sessionmaker(bind=create_engine("sqlite://"))()
+    before = COMMIT_SECONDS.count()
+    session.commit()
+    session.close()
+    assert COMMIT_SECONDS.count() == before + 1
@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from src.models.base import Base, ensure_indexes
+from src.models.task import Task
+from src.models.user import User
+from src.utils.pagination import encode_cursor, decode_cursor, keyset_paginate
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def _add_tasks(db, count, user_id=1, status="pending"):
+    base_time = datetime(2024, 1, 1)
+    for i in range(count):
+        db.add(Task(
+            user_id=user_id,
+            status=status,
+            input_file=f"uploads/{i}.wav",
+            # 每兩筆共用同一個時間，驗證 id 作為次排序鍵
+            created_at=base_time + timedelta(seconds=i // 2)
+        ))
+    db.commit()
+
+def test_cursor_roundtrip():
+    """測試游標編碼與解碼"""
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+def test_invalid_cursor():
+    """測試無效游標"""
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_keyset_pagination_walks_all_rows(db):
+    """測試 keyset 分頁能完整且不重複地走訪所有資料"""
+    _add_tasks(db, 25)
+    _add_tasks(db, 5, user_id=2)
+
+    seen = []
+    cursor = None
+    while True:
+        query = db.query(Task).filter(Task.user_id == 1)
+        page, cursor = keyset_paginate(query, Task, 10, cursor)
+        seen.extend(task.id for task in page)
+        if not cursor:
+            break
+
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
+    expected = [t.id for t in db.query(Task).filter(Task.user_id == 1)
+                .order_by(Task.created_at.desc(), Task.id.desc())]
+    assert seen == expected
+
+def test_offset_fallback(db):
+    """測試未提供游標時仍支援 offset 分頁"""
+    _add_tasks(db, 6)
+    query = db.query(Task).filter(Task.user_id == 1)
+    first, _ = keyset_paginate(query, Task, 3)
+    second, next_cursor = keyset_paginate(query, Task, 3, offset=3)
+    assert {t.id for t in first}.isdisjoint({t.id for t in second})
+    assert next_cursor is None
+
+def test_ensure_indexes_on_existing_table():
+    """測試既有資料表補建索引"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_tasks_user_status_created")
+    ensure_indexes(engine)
+    names = {index["name"] for index in inspect(engine).get_indexes("tasks")}
+    assert "ix_tasks_user_status_created" in names
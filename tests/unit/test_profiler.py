@@ -0,0 +1,88 @@
+import asyncio
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.config import settings
+from src.api.routes.profiling import router
+from src.utils import profiler as profiler_module
+from src.utils.profiler import MemoryProfiler, ProfilerBusyError, SamplingProfiler
+
+def _busy_work(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(100))
+
+def test_sampling_profiler_collects_folded_stacks():
+    """測試取樣剖析輸出 folded stack 並可提前停止"""
+    profiler = SamplingProfiler()
+    profiler.start(5, interval=0.001)
+    with pytest.raises(ProfilerBusyError):
+        profiler.start(5)
+    _busy_work(0.05)
+    profiler.stop()
+
+    assert not profiler.running
+    assert profiler.samples > 0
+    lines = profiler.folded().splitlines()
+    assert any("_busy_work" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+def test_memory_snapshot_diff():
+    """測試 tracemalloc 快照差異會指出新增配置的位置"""
+    profiler = MemoryProfiler()
+    profiler.start(frames=1)
+    try:
+        first = profiler.snapshot()["snapshot_id"]
+        retained = [bytearray(1024) for _ in range(200)]
+        second = profiler.snapshot()["snapshot_id"]
+        diff = profiler.diff(first, second)
+        assert any("test_profiler.py" in entry["location"] and entry["size_diff_bytes"] > 100_000 for entry in diff)
+        assert len(retained) == 200
+    finally:
+        profiler.stop()
+    assert not profiler.running
+    assert profiler.snapshots() == []
+
+def test_profiling_requires_admin_token(monkeypatch):
+    """測試未設定或未帶管理員權杖時無法使用剖析介面"""
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    assert client.get("/api/admin/profile/cpu").status_code == 404
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/admin/profile/cpu").status_code == 403
+    response = client.get("/api/admin/profile/cpu", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["running"] is False
+
+def test_heavy_profiling_routes_run_off_event_loop(monkeypatch):
+    """測試擷取與比較快照、停止取樣都在執行緒池執行，不佔用事件迴圈"""
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app, headers={"X-Admin-Token": "secret"})
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    on_loop = []
+
+    def recording(result):
+        def call(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return result
+        return call
+    monkeypatch.setattr(profiler_module.memory_profiler, "snapshot", recording({"snapshot_id": 1}))
+    monkeypatch.setattr(profiler_module.memory_profiler, "top", recording([]))
+    monkeypatch.setattr(profiler_module.memory_profiler, "diff", recording([]))
+    monkeypatch.setattr(profiler_module.sampling_profiler, "stop", recording(None))
+
+    assert client.post("/api/admin/profile/memory/snapshot").status_code == 200
+    assert client.get("/api/admin/profile/memory/snapshots/1").status_code == 200
+    assert client.get("/api/admin/profile/memory/diff", params={"from": 1, "to": 1}).status_code == 200
+    assert client.post("/api/admin/profile/cpu/stop").status_code == 200
+    assert on_loop == [False] * 4
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import pytest
+
+from src.core.config import settings
+
+from src.utils.progress_bus import ProgressBus, task_topic, user_topic
+from src.utils.progress_tracker import ProgressTracker
+
+class FakeSocket:
+    """記錄收到訊息的假 WebSocket"""
+    def __init__(self, fail: bool = False):
+        self.messages = []
+        self.fail = fail
+
+    async def send_text(self, text):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        self.messages.append(json.loads(text))
+
+@pytest.mark.asyncio
+async def test_multiple_subscribers_per_topic():
+    """測試同一任務可有多個訂閱者"""
+    bus = ProgressBus()
+    tab1, tab2 = FakeSocket(), FakeSocket()
+    bus.subscribe(task_topic(1), tab1)
+    bus.subscribe(task_topic(1), tab2)
+
+    await bus.publish({"progress": 50}, task_topic(1))
+    assert tab1.messages == [{"progress": 50}]
+    assert tab2.messages == [{"progress": 50}]
+
+@pytest.mark.asyncio
+async def test_dead_subscriber_pruned():
+    """測試傳送失敗的訂閱者會被移除"""
+    bus = ProgressBus()
+    alive, dead = FakeSocket(), FakeSocket(fail=True)
+    for topic in (task_topic(1), user_topic(7)):
+        bus.subscribe(topic, alive)
+        bus.subscribe(topic, dead)
+
+    await bus.publish({"progress": 10}, task_topic(1))
+    assert bus.subscriber_count(task_topic(1)) == 1
+    assert bus.subscriber_count(user_topic(7)) == 1
+    assert alive.messages == [{"progress": 10}]
+
+@pytest.mark.asyncio
+async def test_tracker_publishes_to_task_and_user_topics(monkeypatch):
+    """測試進度同時送往任務與使用者主題，且不重複傳送"""
+    bus = ProgressBus()
+    monkeypatch.setattr("src.utils.progress_tracker.progress_bus", bus)
+    tracker = ProgressTracker()
+    task_watcher, dashboard = FakeSocket(), FakeSocket()
+    bus.subscribe(task_topic("t1"), task_watcher)
+    bus.subscribe(task_topic("t1"), dashboard)
+    bus.subscribe(user_topic(7), dashboard)
+
+    await tracker.create_task("t1", total_steps=4, user_id=7)
+    await tracker.update_progress("t1", 2)
+
+    assert task_watcher.messages[-1]["progress"] == 50.0
+    assert len(dashboard.messages) == 1
+    assert dashboard.messages[0]["task_id"] == "t1"
+
+@pytest.mark.asyncio
+async def test_updates_are_coalesced_and_delta_encoded(monkeypatch):
+    """測試高頻更新被合併，且後續訊息只包含變更欄位"""
+    bus = ProgressBus()
+    monkeypatch.setattr("src.utils.progress_tracker.progress_bus", bus)
+    monkeypatch.setattr(settings, "PROGRESS_MIN_INTERVAL", 0.05)
+    tracker = ProgressTracker()
+    watcher = FakeSocket()
+    bus.subscribe(task_topic("t1"), watcher)
+
+    await tracker.create_task("t1", total_steps=100)
+    for step in range(1, 51):
+        await tracker.update_progress("t1", step)
+    # 第一筆立即送出，其餘合併為一筆延遲送出
+    assert len(watcher.messages) == 1
+    assert watcher.messages[0]["full"] is True
+
+    await asyncio.sleep(0.1)
+    assert len(watcher.messages) == 2
+    delta = watcher.messages[1]
+    assert delta["full"] is False
+    assert delta["current_step"] == 50
+    assert "total_steps" not in delta
+
+    # 終止狀態立即送出
+    await tracker.update_progress("t1", 60)
+    await tracker.complete_task("t1")
+    assert watcher.messages[-1]["status"] == "completed"
+    await asyncio.sleep(0.1)
+    assert watcher.messages[-1]["status"] == "completed"
+
+@pytest.mark.asyncio
+async def test_new_subscriber_receives_full_state(monkeypatch):
+    """測試新訂閱者先收到完整狀態"""
+    bus = ProgressBus()
+    monkeypatch.setattr("src.utils.progress_tracker.progress_bus", bus)
+    tracker = ProgressTracker()
+    await tracker.create_task("t1", total_steps=4, user_id=7)
+    await tracker.update_progress("t1", 1)
+
+    late = FakeSocket()
+    await tracker.register_websocket("t1", late)
+    assert late.messages[0]["full"] is True
+    assert late.messages[0]["current_step"] == 1
+
+    dashboard = FakeSocket()
+    await tracker.register_user_websocket(7, dashboard)
+    assert [m["task_id"] for m in dashboard.messages] == ["t1"]
+
+@pytest.mark.asyncio
+async def test_upload_progress_is_pushed(monkeypatch):
+    """測試上傳進度推送給訂閱者，且舊版查詢介面仍可用"""
+    from src.api.routes import upload
+
+    bus = ProgressBus()
+    tracker = ProgressTracker()
+    monkeypatch.setattr("src.utils.progress_tracker.progress_bus", bus)
+    monkeypatch.setattr(upload, "progress_tracker", tracker)
+    watcher = FakeSocket()
+    await tracker.register_websocket("u1", watcher)
+
+    await tracker.create_task("u1", total_steps=100)
+    await upload._set_upload_progress("u1", 0, "開始上傳…")
+    await upload._set_upload_progress("u1", 100, "處理完成！", final_status="completed")
+
+    assert watcher.messages[0]["details"] == {"message": "開始上傳…"}
+    assert watcher.messages[-1]["status"] == "completed"
+    response = await upload.upload_status(task_id="u1")
+    assert json.loads(response.body) == {"progress": 100.0, "status": "處理完成！"}
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import pytest
+
+from src.api.websocket import WebSocketManager
+from src.utils.progress_bus import ProgressBus, task_topic
+from src.utils.progress_codec import (
+    COMPACT_SUBPROTOCOL, decode_frames, define_record, encode_progress, progress_record
+)
+
+FULL = {
+    "type": "progress",
+    "task_id": "batch-1",
+    "full": True,
+    "seq": 3,
+    "total_steps": 10,
+    "current_step": 4,
+    "status": "in_progress",
+    "start_time": "2026-01-01T10:00:00",
+    "end_time": None,
+    "progress": 40.0,
+    "details": {"message": "處理中…"}
+}
+
+def test_compact_frame_is_smaller_than_json():
+    """測試精簡格式可還原且比 JSON 小"""
+    frame = define_record(0, "batch-1") + progress_record(0, encode_progress(FULL))
+    assert decode_frames(frame, {}) == [FULL]
+
+    delta = {"type": "progress", "task_id": "batch-1", "full": False, "seq": 4, "current_step": 5, "progress": 50.0}
+    assert len(progress_record(0, encode_progress(delta))) < len(json.dumps(delta)) / 4
+    assert decode_frames(progress_record(0, encode_progress(delta)), {0: "batch-1"}) == [delta]
+
+def test_compact_frame_long_strings_and_cleared_fields():
+    """測試超過 64 KiB 的 details 與狀態可編碼，變回 null 的欄位在差異訊息中清除"""
+    details = {"traceback": "x" * 70000}
+    message = {**FULL, "status": "s" * 70000, "details": details}
+    assert decode_frames(progress_record(0, encode_progress(message)), {0: "batch-1"}) == [message]
+
+    delta = {"type": "progress", "task_id": "batch-1", "full": False, "seq": 5, "end_time": None, "throughput": None}
+    assert decode_frames(progress_record(0, encode_progress(delta)), {0: "batch-1"}) == [delta]
+
+@pytest.mark.asyncio
+async def test_negotiated_compact_connection(fake_websocket):
+    """測試協商精簡子協定的連線收到二進位訊框，其他連線仍收到 JSON"""
+    manager = WebSocketManager()
+    mobile = fake_websocket(subprotocols=[COMPACT_SUBPROTOCOL])
+    browser = fake_websocket()
+    compact = await manager.connect(mobile, "mobile")
+    plain = await manager.connect(browser, "browser")
+    assert mobile.accepted_subprotocol == COMPACT_SUBPROTOCOL
+    assert compact.compact and not plain.compact
+
+    bus = ProgressBus()
+    for connection in (compact, plain):
+        bus.subscribe(task_topic("batch-1"), connection)
+    await bus.publish(FULL, task_topic("batch-1"))
+    await bus.publish({"type": "progress", "task_id": "batch-1", "full": False, "seq": 4, "current_step": 5}, task_topic("batch-1"))
+    await asyncio.sleep(0.01)
+
+    task_ids = {}
+    messages = [m for frame in mobile.binary for m in decode_frames(frame, task_ids)]
+    assert [m["seq"] for m in messages] == [3, 4]
+    assert task_ids == {0: "batch-1"}
+    # 第二個訊框不再重複 task id
+    assert b"batch-1" not in mobile.binary[1]
+    assert [m["seq"] for m in browser.sent] == [3, 4]
+
+    for connection in (compact, plain):
+        await connection.close()
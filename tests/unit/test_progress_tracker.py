@@ -0,0 +1,88 @@
+import pytest
+
+from src.core.config import settings
+from src.utils.progress_tracker import ProgressTracker, TaskProgress
+
+def test_task_progress_is_slotted_and_bounded(monkeypatch):
+    """測試任務紀錄不帶 __dict__，且步驟歷史與 details 都有上限"""
+    monkeypatch.setattr(settings, "PROGRESS_HISTORY_SIZE", 4)
+    monkeypatch.setattr(settings, "PROGRESS_MAX_DETAILS", 2)
+    task = TaskProgress(total_steps=100)
+    assert not hasattr(task, "__dict__")
+
+    for step in range(1, 11):
+        task.record_step(step, now=task.started + step)
+    assert len(task.steps) == 4
+    assert task.steps[-1] == (task.started + 10, 10)
+
+    task.update_details({"a": 1})
+    task.update_details({"b": 2, "c": 3})
+    assert task.details == {"b": 2, "c": 3}
+
+def test_throughput_and_eta():
+    """測試由步驟事件計算處理速率與剩餘時間"""
+    task = TaskProgress(total_steps=10)
+    assert task.throughput() is None
+    assert task.to_dict()["eta_seconds"] is None
+
+    task.record_step(2, now=task.started + 1)
+    task.record_step(4, now=task.started + 2)
+    assert task.throughput() == pytest.approx(2.0)
+    assert task.eta_seconds() == pytest.approx(3.0)
+
+    task.status = "completed"
+    assert task.eta_seconds() == 0.0
+
+@pytest.mark.asyncio
+async def test_status_snapshot_shape():
+    """測試狀態查詢回傳與原本相同欄位的快照"""
+    tracker = ProgressTracker()
+    await tracker.create_task("t1", total_steps=4, user_id=7)
+    await tracker.update_progress("t1", 1, details={"message": "處理中…"})
+    status = await tracker.get_task_status("t1")
+    assert status["progress"] == 25.0
+    assert status["details"] == {"message": "處理中…"}
+    assert status["end_time"] is None
+
+    await tracker.complete_task("t1")
+    status = await tracker.get_task_status("t1")
+    assert status["end_time"] >= status["start_time"]
+    assert await tracker.clear_completed_tasks(max_age_hours=0) == 1
+    assert tracker.task_count() == 0
+
+def test_eta_blends_history_with_observed_rate():
+    """測試 ETA 在初期參考同類任務的歷史耗時，後期以實際速率為主"""
+    task = TaskProgress(total_steps=10, expected_step_seconds=2.0)
+    assert task.eta_seconds() == pytest.approx(20.0)
+
+    task.record_step(5, now=task.started + 5)
+    # 已完成一半：實際每步 1 秒與歷史每步 2 秒各佔一半
+    assert task.step_seconds == pytest.approx(1.0)
+    assert task.eta_seconds() == pytest.approx(5 * 1.5)
+
+def test_step_duration_is_exponentially_weighted(monkeypatch):
+    """測試步驟耗時以指數加權平均更新"""
+    monkeypatch.setattr(settings, "PROGRESS_EWMA_ALPHA", 0.5)
+    task = TaskProgress(total_steps=10)
+    task.record_step(1, now=task.started + 1)
+    task.record_step(2, now=task.started + 4)
+    assert task.step_seconds == pytest.approx(2.0)
+
+@pytest.mark.asyncio
+async def test_history_from_completed_tasks(monkeypatch):
+    """測試已完成任務的耗時會用於同類新任務的預估"""
+    tracker = ProgressTracker()
+    assert (await tracker.estimate("queued", kind="upload")) == {"eta_seconds": None, "throughput": None}
+
+    await tracker.create_task("u1", total_steps=4, kind="upload")
+    tracker._tasks["u1"].started -= 8
+    await tracker.complete_task("u1")
+    assert tracker.expected_seconds("upload") == pytest.approx(8.0, abs=0.1)
+    assert (await tracker.estimate("queued", kind="upload"))["eta_seconds"] == pytest.approx(8.0, abs=0.1)
+
+    await tracker.create_task("u2", total_steps=4, kind="upload")
+    assert (await tracker.get_task_status("u2"))["eta_seconds"] == pytest.approx(8.0, abs=0.1)
+    # 失敗的任務與其他種類不影響歷史
+    await tracker.create_task("p1", total_steps=4)
+    await tracker.complete_task("p1", status="failed")
+    assert tracker.expected_seconds() is None
@@ -0,0 +1,92 @@
+import gzip
+import json
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.core.config import settings
+from src.models.base import Base
+from src.models.error_history import ErrorHistory, CorrectionHistory
+from src.services.retention_service import RetentionService
+from src.utils.progress_tracker import progress_tracker
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+def _add_errors(engine, count, age_days):
+    session = sessionmaker(bind=engine)()
+    created_at = datetime.utcnow() - timedelta(days=age_days)
+    for i in range(count):
+        error = ErrorHistory(error_type="upload", error_message=f"error {i}", created_at=created_at)
+        session.add(error)
+        session.flush()
+        session.add(CorrectionHistory(error_id=error.id, success=1, created_at=created_at))
+    session.commit()
+    session.close()
+
+def test_purge_in_chunks_with_archive(engine, tmp_path, monkeypatch):
+    """測試分批清除過期資料並封存"""
+    archive_dir = tmp_path / "archive"
+    monkeypatch.setattr(settings, "RETENTION_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "RETENTION_ARCHIVE_DIR", str(archive_dir))
+    monkeypatch.setattr(settings, "ERROR_HISTORY_RETENTION_DAYS", 30)
+    monkeypatch.setattr(settings, "CORRECTION_HISTORY_RETENTION_DAYS", 30)
+    _add_errors(engine, 5, age_days=40)
+    _add_errors(engine, 3, age_days=1)
+
+    result = RetentionService(engine).purge_history()
+    assert result["error_history"] == 5
+    assert result["correction_history"] == 5
+
+    session = sessionmaker(bind=engine)()
+    assert session.query(ErrorHistory).count() == 3
+    assert session.query(CorrectionHistory).count() == 3
+    session.close()
+
+    archives = list(archive_dir.glob("error_history-*.jsonl.gz"))
+    assert len(archives) == 1
+    with gzip.open(archives[0], "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert len(rows) == 5
+    assert rows[0]["error_type"] == "upload"
+
+def test_zero_days_disables_purge(engine, monkeypatch):
+    """測試保留天數為 0 時不清理"""
+    monkeypatch.setattr(settings, "ERROR_HISTORY_RETENTION_DAYS", 0)
+    _add_errors(engine, 2, age_days=400)
+    result = RetentionService(engine).purge_history()
+    assert "error_history" not in result
+
+@pytest.mark.asyncio
+async def test_compact_progress():
+    """測試清除過期的記憶體進度狀態"""
+    await progress_tracker.create_task("retention-old", 1)
+    await progress_tracker.complete_task("retention-old")
+    progress_tracker._tasks["retention-old"].ended -= 2 * 24 * 3600
+    await progress_tracker.create_task("retention-running", 1)
+
+    result = await RetentionService().compact_progress()
+    assert result["task_progress"] >= 1
+    assert "retention-running" in await progress_tracker.get_all_tasks()
+    assert "retention-old" not in await progress_tracker.get_all_tasks()
+
+def test_purged_errors_take_their_corrections(engine, monkeypatch):
+    """測試錯誤保留期限較短時，參照它的修正一併刪除，不留下懸空的外鍵"""
+    monkeypatch.setattr(settings, "ERROR_HISTORY_RETENTION_DAYS", 30)
+    monkeypatch.setattr(settings, "CORRECTION_HISTORY_RETENTION_DAYS", 90)
+    _add_errors(engine, 4, age_days=40)
+    _add_errors(engine, 2, age_days=1)
+
+    result = RetentionService(engine).purge_history()
+    assert (result["error_history"], result["correction_history"]) == (4, 4)
+
+    session = sessionmaker(bind=engine)()
+    error_ids = {error.id for error in session.query(ErrorHistory)}
+    corrections = session.query(CorrectionHistory).all()
+    assert len(corrections) == 2
+    assert all(correction.error_id in error_ids for correction in corrections)
+    session.close()
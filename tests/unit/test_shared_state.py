@@ -0,0 +1,216 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import pytest
+
+from src.api.websocket import WebSocketManager
+from src.utils.nl_interface import NLInterface
+from src.utils.progress_bus import ProgressBus, task_topic
+from src.utils.progress_tracker import ProgressTracker
+from src.utils.shared_state import SQLiteSharedState, SharedStateBackend, create_shared_state, InMemorySharedState
+
+class FakeSocket:
+    """記錄收到訊息的假 WebSocket"""
+    def __init__(self):
+        self.messages = []
+        self.scope = {}
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.messages.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+@pytest.fixture
+def workers(tmp_path):
+    """模擬同一主機上共用一個狀態檔的兩個 worker"""
+    path = str(tmp_path / "shared_state.db")
+    return SQLiteSharedState(path), SQLiteSharedState(path)
+
+async def _flushed(*states):
+    """等待背景寫入完成"""
+    for state in states:
+        if state._flusher is not None:
+            await state._flusher
+
+async def _deliver(state):
+    """執行一次輪詢，將其他 worker 的訊息交給本地處理器"""
+    for channel, message in state.poll():
+        await state._dispatch(channel, message)
+
+def test_create_backend():
+    """測試依設定建立後端"""
+    assert isinstance(create_shared_state("memory"), InMemorySharedState)
+    with pytest.raises(ValueError):
+        create_shared_state("redis")
+
+    class PartialBackend(SharedStateBackend):
+        def get(self, namespace, key, default=None):
+            return default
+    # 未實作全部方法的後端在建立時就失敗
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+def test_state_and_events_cross_workers(workers):
+    """測試狀態共享，且訊息只送給其他 worker"""
+    a, b = workers
+    a.set("tasks", "t1", {"progress": 10})
+    assert b.get("tasks", "t1") == {"progress": 10}
+    assert b.items("tasks") == {"t1": {"progress": 10}}
+
+    a.publish("progress", {"n": 1})
+    assert b.poll() == [("progress", {"n": 1})]
+    assert b.poll() == []
+    assert a.poll() == []
+
+    b.delete("tasks", "t1")
+    assert a.get("tasks", "t1") is None
+
+@pytest.mark.asyncio
+async def test_progress_reaches_other_worker(workers, monkeypatch):
+    """測試其他 worker 的訂閱者也能收到任務進度"""
+    a, b = workers
+    bus = ProgressBus()
+    monkeypatch.setattr("src.utils.progress_tracker.progress_bus", bus)
+    owner, other = ProgressTracker(a), ProgressTracker(b)
+
+    await owner.create_task("t1", total_steps=4)
+    await owner.update_progress("t1", 1)
+    await _flushed(a)
+    assert (await other.get_task_status("t1"))["current_step"] == 1
+
+    watcher = FakeSocket()
+    await other.register_websocket("t1", watcher)
+    assert watcher.messages[0]["full"] is True
+
+    await owner.complete_task("t1")
+    await _flushed(a)
+    await _deliver(b)
+    assert watcher.messages[-1]["status"] == "completed"
+    assert bus.subscriber_count(task_topic("t1")) == 1
+
+@pytest.mark.asyncio
+async def test_message_forwarded_to_worker_holding_client(workers):
+    """測試訊息會轉送到持有該連線的 worker"""
+    a, b = workers
+    holder, sender = WebSocketManager(a), WebSocketManager(b)
+    socket = FakeSocket()
+    connection = await holder.connect(socket, "c1")
+    await _flushed(a)
+    assert "c1" in await sender.connected_clients()
+
+    await sender.send_message("c1", {"type": "notice"})
+    await _flushed(b)
+    await _deliver(a)
+    await asyncio.sleep(0)
+    assert socket.messages == [{"type": "notice"}]
+
+    holder.disconnect("c1", connection)
+    await connection.close()
+    await _flushed(a)
+    assert await sender.connected_clients() == {}
+
+@pytest.mark.asyncio
+async def test_writes_do_not_block_event_loop(workers):
+    """測試另一個寫入者占住資料庫時，寫入不會卡住事件迴圈，且本 worker 立即讀到新值"""
+    a, b = workers
+    b.set("tasks", "t0", {})
+    await _flushed(b)
+    # 正式環境中 start() 已在背景執行緒開好連線
+    assert a.get("tasks", "t0") == {}
+    busy = sqlite3.connect(b.path, isolation_level=None)
+    busy.execute("BEGIN IMMEDIATE")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    a.set("tasks", "t1", {"progress": 10})
+    a.publish("progress", {"n": 1})
+    a.delete("tasks", "t0")
+    assert loop.time() - started < 0.05
+    assert a.get("tasks", "t1") == {"progress": 10}
+    assert a.get("tasks", "t0") is None
+    assert a.items("tasks") == {"t1": {"progress": 10}}
+
+    busy.execute("COMMIT")
+    await _flushed(a)
+    assert b.items("tasks") == {"t1": {"progress": 10}}
+    assert b.poll() == [("progress", {"n": 1})]
+    assert a._overlay == {}
+
+@pytest.mark.asyncio
+async def test_reads_run_off_event_loop(workers, monkeypatch):
+    """測試事件迴圈上的讀取在其他執行緒查詢資料庫，尚未寫入的值直接由本地回應"""
+    a, b = workers
+    b.set("tasks", "t1", {"progress": 10})
+    await _flushed(b)
+    threads = []
+    execute = a._execute
+
+    def recording_execute(*args):
+        threads.append(threading.get_ident())
+        return execute(*args)
+    monkeypatch.setattr(a, "_execute", recording_execute)
+    assert await a.aget("tasks", "t1") == {"progress": 10}
+    assert await a.aitems("tasks") == {"t1": {"progress": 10}}
+    assert threads and threading.get_ident() not in threads
+
+    threads.clear()
+    a.set("tasks", "t2", {})
+    assert await a.aget("tasks", "t2") == {}
+    assert threads == []
+    await _flushed(a)
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_retried_then_dropped(workers, monkeypatch):
+    """測試寫入失敗時整批重試，持續失敗則丟棄並移除本地尚未寫入的值"""
+    a, b = workers
+    a.poll_interval = 0.01
+    b.set("tasks", "t1", {"progress": 0})
+    await _flushed(b)
+    transaction = a._transaction
+    failures = [sqlite3.OperationalError("disk I/O error")]
+
+    def flaky_transaction():
+        if failures:
+            raise failures.pop()
+        return transaction()
+    monkeypatch.setattr(a, "_transaction", flaky_transaction)
+    a.set("tasks", "t1", {"progress": 10})
+    await _flushed(a)
+    assert b.get("tasks", "t1") == {"progress": 10}
+    assert a._overlay == {}
+
+    failures.extend([sqlite3.OperationalError("disk I/O error")] * a.FLUSH_ATTEMPTS)
+    a.set("tasks", "t1", {"progress": 20})
+    assert a.get("tasks", "t1") == {"progress": 20}
+    await _flushed(a)
+    assert a._overlay == {} and not a._pending
+    assert a.get("tasks", "t1") == b.get("tasks", "t1") == {"progress": 10}
+
+def test_conversation_shared_between_workers(workers):
+    """測試對話可在其他 worker 上繼續"""
+    a, b = workers
+    conversation_id = NLInterface(a).start_conversation("user1")
+    NLInterface(b).add_message(conversation_id, "user", "hello")
+    history = NLInterface(a).get_conversation_history(conversation_id)
+    assert [m["role"] for m in history] == ["system", "user"]
+
+@pytest.mark.asyncio
+async def test_concurrent_messages_are_all_kept(workers):
+    """測試兩個 worker 同時在同一對話加入訊息，彼此不會覆蓋"""
+    a, b = workers
+    conversation_id = NLInterface(a).start_conversation("user1")
+    await _flushed(a)
+    NLInterface(a).add_message(conversation_id, "user", "from a")
+    NLInterface(b).add_message(conversation_id, "user", "from b")
+    await _flushed(a, b)
+    history = NLInterface(a).get_conversation_history(conversation_id)
+    assert [m["content"] for m in history[1:]] == ["from a", "from b"]
+
+    NLInterface(b).end_conversation(conversation_id)
+    await _flushed(b)
+    assert a.items("conversation_messages") == {}
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import pytest
+
+from benchmarks.harness import local_app
+from src.core.config import settings
+from src.api import sse
+from src.utils.progress_bus import ProgressBus
+from src.utils.progress_tracker import ProgressTracker, progress_tracker
+
+@pytest.fixture
+def tracker(monkeypatch):
+    """每次更新都立即發佈的獨立進度追蹤器"""
+    bus = ProgressBus()
+    tracker = ProgressTracker()
+    monkeypatch.setattr(settings, "PROGRESS_MIN_INTERVAL", 0)
+    monkeypatch.setattr(settings, "PROGRESS_EVENT_BUFFER_SIZE", 3)
+    monkeypatch.setattr("src.utils.progress_tracker.progress_bus", bus)
+    monkeypatch.setattr(sse, "progress_bus", bus)
+    monkeypatch.setattr(sse, "progress_tracker", tracker)
+    return tracker
+
+def _parse(events):
+    """取出 SSE 事件的 id 與資料"""
+    parsed = []
+    for event in events:
+        lines = dict(line.split(": ", 1) for line in event.strip().split("\n"))
+        parsed.append((int(lines["id"]), json.loads(lines["data"])))
+    return parsed
+
+@pytest.mark.asyncio
+async def test_events_since_ring_buffer(tracker):
+    """測試只保留最近的訊息，過舊的 Last-Event-ID 需改送完整狀態"""
+    await tracker.create_task("t1", total_steps=10)
+    for step in range(1, 6):
+        await tracker.update_progress("t1", step)
+
+    assert [e["seq"] for e in tracker.events_since("t1", 3)] == [4, 5]
+    assert tracker.events_since("t1", 5) == []
+    assert tracker.events_since("t1", 1) is None
+    assert tracker.events_since("t1", 9) is None
+
+@pytest.mark.asyncio
+async def test_resume_sends_only_missed_events(tracker):
+    """測試斷線續傳只送出錯過的更新，任務結束後關閉串流"""
+    await tracker.create_task("t1", total_steps=10)
+    for step in range(1, 4):
+        await tracker.update_progress("t1", step)
+    await tracker.complete_task("t1")
+
+    events = _parse([event async for event in sse.progress_event_stream("t1", last_event_id=2)])
+    assert [seq for seq, _ in events] == [3, 4]
+    assert events[0][1]["full"] is False
+    assert events[-1][1]["status"] == "completed"
+
+@pytest.mark.asyncio
+async def test_live_stream(tracker):
+    """測試新連線先收到完整狀態，再收到即時更新"""
+    await tracker.create_task("t1", total_steps=4)
+    await tracker.update_progress("t1", 1)
+
+    async def collect():
+        return [event async for event in sse.progress_event_stream("t1")]
+
+    consumer = asyncio.create_task(collect())
+    await asyncio.sleep(0)
+    await tracker.update_progress("t1", 2)
+    await tracker.complete_task("t1")
+    events = _parse(await asyncio.wait_for(consumer, 1))
+
+    assert events[0][1]["full"] is True
+    assert events[0][1]["current_step"] == 1
+    assert [data["current_step"] for _, data in events[1:]] == [2, 4]
+    assert [seq for seq, _ in events] == [1, 2, 3]
+
+@pytest.mark.asyncio
+async def test_stream_ends_when_task_is_cleared(tracker, monkeypatch):
+    """測試任務被清除後串流結束，不再無限送出 keepalive"""
+    monkeypatch.setattr(settings, "SSE_KEEPALIVE_SECONDS", 0.01)
+    await tracker.create_task("t1", total_steps=4)
+    stream = sse.progress_event_stream("t1")
+    assert _parse([await stream.__anext__()])[0][1]["full"] is True
+    assert await stream.__anext__() == ": keepalive\n\n"
+
+    tracker._tasks.pop("t1")
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(stream.__anext__(), 1)
+
+def test_events_endpoint_unknown_task():
+    """測試追蹤器沒有的任務回傳 404"""
+    with local_app() as client:
+        assert client.get("/api/tasks/no-such-task/events").status_code == 404
+
+def test_events_endpoint_requires_ownership():
+    """測試其他使用者的任務回傳 404，自己的任務可以訂閱"""
+    with local_app() as client:
+        async def setup():
+            await progress_tracker.create_task("theirs", total_steps=2, user_id=2)
+            await progress_tracker.create_task("mine", total_steps=2, user_id=1)
+            for task_id in ("theirs", "mine"):
+                await progress_tracker.complete_task(task_id)
+        asyncio.run(setup())
+        try:
+            assert client.get("/api/tasks/theirs/events").status_code == 404
+            response = client.get("/api/tasks/mine/events")
+            assert response.status_code == 200
+            assert '"status": "completed"' in response.text
+        finally:
+            for task_id in ("theirs", "mine"):
+                progress_tracker._tasks.pop(task_id, None)
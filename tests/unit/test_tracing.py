@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+
+from benchmarks.harness import local_app, payload
+from src.core.config import settings
+from src.utils.progress_tracker import progress_tracker
+from src.utils.tracing import Tracer, propagate, stage, tracer
+
+@pytest.mark.asyncio
+async def test_spans_nest_and_follow_context():
+    """測試 span 依呼叫鏈巢狀記錄，並隨 asyncio 任務傳遞"""
+    local = Tracer()
+
+    async def extract():
+        with local.span("features"):
+            await asyncio.sleep(0)
+
+    with local.trace("t1", "upload"):
+        with local.span("preprocess"):
+            pass
+        await asyncio.create_task(extract())
+    with local.span("outside"):
+        pass
+
+    timeline = local.timeline("t1")
+    spans = {span["name"]: span for span in timeline["spans"]}
+    assert set(spans) == {"upload", "preprocess", "features"}
+    assert spans["upload"]["parent_id"] is None
+    assert spans["preprocess"]["parent_id"] == spans["upload"]["span_id"]
+    assert spans["features"]["parent_id"] == spans["upload"]["span_id"]
+    assert local.timeline("missing") is None
+
+def test_failed_span_marked():
+    """測試例外會標記在 span 上"""
+    local = Tracer()
+    with pytest.raises(ValueError):
+        with local.trace("t1", "score"):
+            raise ValueError("bad input")
+    span = local.timeline("t1")["spans"][0]
+    assert span["status"] == "error"
+    assert "bad input" in span["attributes"]["error"]
+
+@pytest.mark.asyncio
+async def test_propagate_into_background_job():
+    """測試追蹤延續到背景工作並記錄排隊時間"""
+    async def job():
+        with stage("optimize"):
+            pass
+
+    with tracer.trace("job-1"):
+        queued = propagate(job)
+    await queued()
+
+    names = [span["name"] for span in tracer.timeline("job-1")["spans"]]
+    assert names == ["queue", "job", "optimize"]
+    tracer.clear("job-1")
+
+def test_export_trace_event_format(tmp_path, monkeypatch):
+    """測試根 span 結束時輸出 Trace Event Format 檔案"""
+    monkeypatch.setattr(settings, "TRACE_EXPORT_DIR", str(tmp_path))
+    local = Tracer()
+    with local.trace("../t1", "upload"):
+        with local.span("save"):
+            pass
+
+    with open(tmp_path / "___t1.trace.json") as f:
+        events = json.load(f)["traceEvents"]
+    assert [event["name"] for event in events] == ["upload", "save"]
+    assert all(event["ph"] == "X" for event in events)
+
+def test_trace_endpoint_requires_ownership():
+    """測試只能讀取自己任務的追蹤紀錄"""
+    with local_app() as client:
+        response = client.post("/api/upload", files={"file": ("clip.wav", payload(4096), "audio/wav")}, data={"task_id": "traced"})
+        assert response.json()["success"]
+        asyncio.run(progress_tracker.create_task("theirs", total_steps=1, user_id=2))
+        with tracer.trace("theirs", "upload"), tracer.trace("untracked", "upload"):
+            pass
+        try:
+            assert client.get("/api/tasks/traced/trace").json()["spans"][0]["name"] == "upload"
+            assert client.get("/api/tasks/theirs/trace").status_code == 404
+            assert client.get("/api/tasks/untracked/trace").status_code == 404
+        finally:
+            for task_id in ("traced", "theirs", "untracked"):
+                tracer.clear(task_id)
+                progress_tracker._tasks.pop(task_id, None)
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import pytest
+
+from src.core.config import settings
+from src.api.websocket import ClientConnection, ConnectionClosedError, ConnectionLimitError, WebSocketManager
+from benchmarks.harness import local_app
+from src.utils.progress_bus import progress_bus, task_topic, user_topic
+from src.utils.progress_tracker import progress_tracker
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_delay_others(fake_websocket):
+    """測試慢速客戶端不會拖慢廣播"""
+    manager = WebSocketManager()
+    slow, fast = fake_websocket(delay=1.0), fake_websocket()
+    await manager.connect(slow, "slow")
+    await manager.connect(fast, "fast")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await manager.broadcast({"type": "progress", "value": 1})
+    assert loop.time() - started < 0.1
+
+    await asyncio.sleep(0.05)
+    assert fast.sent == [{"type": "progress", "value": 1}]
+    assert slow.sent == []
+
+    for connection in list(manager.active_connections.values()):
+        await connection.close()
+
+@pytest.mark.asyncio
+async def test_drop_oldest_policy(fake_websocket):
+    """測試佇列滿時丟棄最舊的訊息"""
+    websocket = fake_websocket(delay=10)
+    connection = ClientConnection(websocket, "c1", max_queue=2, policy="drop_oldest")
+    for i in range(5):
+        await connection.send_json({"seq": i})
+        # 讓寫入任務取出第一筆後卡在慢速傳送
+        await asyncio.sleep(0)
+    # 第 0 筆已被寫入任務取出，其餘只保留最新的兩筆
+    assert connection.dropped == 2
+    assert [json.loads(connection._queue.get_nowait())["seq"] for _ in range(2)] == [3, 4]
+    await connection.close()
+
+@pytest.mark.asyncio
+async def test_dropped_progress_is_resynced(monkeypatch, fake_websocket):
+    """測試佇列溢出丟掉進度差異後，客戶端仍能重建出最終狀態"""
+    monkeypatch.setattr(settings, "PROGRESS_MIN_INTERVAL", 0)
+    websocket = fake_websocket(delay=0.01)
+    connection = ClientConnection(websocket, "c1", max_queue=2, policy="drop_oldest")
+    await progress_tracker.create_task("resync-1", 20)
+    progress_bus.subscribe(task_topic("resync-1"), connection)
+    for step in range(1, 20):
+        await progress_tracker.update_progress("resync-1", step, details={"step": step})
+    await progress_tracker.complete_task("resync-1", details={"result": "ok"})
+    # 之後的訊息把帶有 completed 的差異擠出佇列
+    for _ in range(2):
+        await connection.send_json({"type": "ping"})
+    await asyncio.sleep(0.2)
+
+    assert connection.dropped > 0
+    state = {}
+    progress = [message for message in websocket.sent if message["type"] == "progress"]
+    for message in progress:
+        state = dict(message) if message["full"] else {**state, **message}
+    expected = await progress_tracker.full_payload("resync-1")
+    assert state["status"] == "completed"
+    assert {key: state[key] for key in expected if key != "full"} == {key: expected[key] for key in expected if key != "full"}
+    seqs = [message["seq"] for message in progress]
+    assert seqs == sorted(seqs)
+
+    await progress_tracker.clear_completed_tasks(max_age_hours=0)
+    await connection.close()
+
+@pytest.mark.asyncio
+async def test_disconnect_policy(fake_websocket):
+    """測試佇列滿時中斷慢速客戶端"""
+    websocket = fake_websocket(delay=10)
+    connection = ClientConnection(websocket, "c1", max_queue=1, policy="disconnect")
+    await connection.send_json({"seq": 0})
+    await asyncio.sleep(0)
+    await connection.send_json({"seq": 1})
+    with pytest.raises(ConnectionClosedError):
+        await connection.send_json({"seq": 2})
+    assert connection.closed
+    assert websocket.closed_with == 1008
+
+@pytest.mark.asyncio
+async def test_connection_caps(monkeypatch, fake_websocket):
+    """測試全域與每位使用者的連線上限；主機上限預設關閉，同一位址的不同使用者互不影響"""
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS", 3)
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS_PER_USER", 2)
+    manager = WebSocketManager()
+    await manager.connect(fake_websocket(), "a1", user_id=1)
+    await manager.connect(fake_websocket(), "a2", user_id=1)
+
+    rejected = fake_websocket()
+    with pytest.raises(ConnectionLimitError):
+        await manager.connect(rejected, "a3", user_id=1)
+    assert rejected.closed_with == 1013
+
+    # 同一使用者以同一 client_id 重新連線不重複計算
+    await manager.connect(fake_websocket(), "a2", user_id=1)
+    await manager.connect(fake_websocket(), "b1", user_id=2)
+    with pytest.raises(ConnectionLimitError):
+        await manager.connect(fake_websocket(), "c1", user_id=3)
+
+    metrics = manager.metrics()
+    assert metrics["open"] == 3
+    assert metrics["rejected"] == 2
+    assert metrics["users"] == 2
+    for connection in list(manager.active_connections.values()):
+        await connection.close()
+
+@pytest.mark.asyncio
+async def test_optional_host_cap(monkeypatch, fake_websocket):
+    """測試設定主機上限後，同一遠端主機的連線數受限"""
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS_PER_HOST", 1)
+    manager = WebSocketManager()
+    await manager.connect(fake_websocket(host="10.0.0.1"), "a1", user_id=1)
+    with pytest.raises(ConnectionLimitError):
+        await manager.connect(fake_websocket(host="10.0.0.1"), "b1", user_id=2)
+    await manager.connect(fake_websocket(host="10.0.0.2"), "b1", user_id=2)
+    assert manager.metrics()["hosts"] == 2
+    for connection in list(manager.active_connections.values()):
+        await connection.close()
+
+@pytest.mark.asyncio
+async def test_reconnect_closes_replaced_connection(monkeypatch, fake_websocket):
+    """測試沿用 client_id 會關閉被取代的連線，且不能藉此繞過其他使用者的上限"""
+    monkeypatch.setattr(settings, "WS_MAX_CONNECTIONS_PER_USER", 1)
+    manager = WebSocketManager()
+    old = fake_websocket()
+    old_connection = await manager.connect(old, "a1", user_id=1)
+    new_connection = await manager.connect(fake_websocket(), "a1", user_id=1)
+    assert old.closed_with == 1000 and old_connection.closed
+    assert manager.active_connections == {"a1": new_connection}
+
+    await manager.connect(fake_websocket(), "b1", user_id=2)
+    with pytest.raises(ConnectionLimitError):
+        await manager.connect(fake_websocket(), "a1", user_id=2)
+    assert manager.active_connections["a1"] is new_connection
+    for connection in list(manager.active_connections.values()):
+        await connection.close()
+
+@pytest.mark.asyncio
+async def test_heartbeat_reaps_idle_connections(monkeypatch, fake_websocket):
+    """測試心跳會中斷閒置連線並 ping 其他連線"""
+    monkeypatch.setattr(settings, "WS_IDLE_TIMEOUT", 30)
+    manager = WebSocketManager()
+    idle, alive = fake_websocket(), fake_websocket()
+    idle_connection = await manager.connect(idle, "idle")
+    await manager.connect(alive, "alive")
+    idle_connection.last_seen -= 60
+
+    assert await manager.check_connections() == 1
+    await asyncio.sleep(0.01)
+    assert idle.closed_with == 1001
+    assert alive.sent == [{"type": "ping"}]
+    assert list(manager.active_connections) == ["alive"]
+    assert manager.metrics()["reaped"] == 1
+    await manager.active_connections["alive"].close()
+
+def test_subscribe_user_only_to_own_tasks():
+    """測試連線只能訂閱自己使用者的任務進度"""
+    with local_app() as client:
+        with client.websocket_connect("/ws/owner-check") as ws:
+            ws.send_json({"type": "subscribe_user", "user_id": 2})
+            assert ws.receive_json()["type"] == "error"
+            ws.send_json({"type": "subscribe_user", "user_id": 1})
+            ws.send_json({"type": "ping"})
+            # 先收到使用者既有任務的完整狀態（若有），再收到 pong
+            while (message := ws.receive_json())["type"] == "progress":
+                assert message["user_id"] == 1
+            assert message == {"type": "pong"}
+            assert progress_bus.subscriber_count(user_topic(1)) == 1
+            assert progress_bus.subscriber_count(user_topic(2)) == 0
+
+def test_subscribe_task_only_to_own_tasks():
+    """測試連線不能訂閱其他使用者的任務；任務建立前的訂閱在任務屬於他人時被移除"""
+    asyncio.run(progress_tracker.create_task("their-task", total_steps=2, user_id=2))
+    try:
+        with local_app() as client:
+            with client.websocket_connect("/ws/task-owner-check") as ws:
+                ws.send_json({"type": "subscribe_task", "task_id": "their-task"})
+                assert ws.receive_json()["type"] == "error"
+                assert progress_bus.subscriber_count(task_topic("their-task")) == 0
+
+                ws.send_json({"type": "subscribe_task", "task_id": "future-task"})
+                ws.send_json({"type": "ping"})
+                assert ws.receive_json() == {"type": "pong"}
+                assert progress_bus.subscriber_count(task_topic("future-task")) == 1
+                asyncio.run(progress_tracker.create_task("future-task", total_steps=2, user_id=2))
+                assert progress_bus.subscriber_count(task_topic("future-task")) == 0
+    finally:
+        for task_id in ("their-task", "future-task"):
+            progress_tracker._tasks.pop(task_id, None)